@@ -1,4 +1,7 @@
 import pandas as pd
+from trading_calendar import valuation_dates, next_trading_day
+
+VALUATION_MODE = 'business'  # 'business' = NSE trading days only, 'calendar' = every day
 
 # Step 1: Load the spreadsheet
 df = pd.read_csv("/Users/in22417145/PycharmProjects/portfolio/data/sbi.csv")  # or pd.read_csv("your_file.csv") if it's a CSV
@@ -21,11 +24,16 @@ df_deduped = df_sorted.drop_duplicates(subset='Transaction Date', keep='last')
 # Step 5: Set Date as index
 df_deduped.set_index('Transaction Date', inplace=True)
 
-# Step 6: Create complete date range
-full_date_range = pd.date_range(start=df_deduped.index.min(), end=df_deduped.index.max(), freq='D')
+# Step 6: Create valuation date range (a closing balance on a holiday shows up on the next trading day)
+end_date = df_deduped.index.max()
+if VALUATION_MODE == 'business':
+    end_date = next_trading_day([end_date], 'NSE')[0]
+full_date_range = valuation_dates(df_deduped.index.min(), end_date, 'NSE', VALUATION_MODE)
 
-# Step 7: Reindex and forward-fill
-df_full = df_deduped.reindex(full_date_range).ffill()
+# Step 7: Reindex and forward-fill over every day, then keep the valuation dates
+# (balances set on non-trading days carry to the next trading day)
+calendar_range = pd.date_range(start=df_deduped.index.min(), end=end_date, freq='D')
+df_full = df_deduped.reindex(calendar_range).ffill().loc[full_date_range]
 
 # Step 8: Clean up and export
 df_full.reset_index(inplace=True)
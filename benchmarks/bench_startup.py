@@ -0,0 +1,57 @@
+'''
+Cold-start benchmark for query.py
+
+Runs each query command in a fresh interpreter with -X importtime and
+reports the import cost and wall time against the 100 ms target.
+
+    python benchmarks/bench_startup.py
+'''
+
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGET_MS = 100
+COMMANDS = ['holdings', 'positions', 'networth', 'alerts']
+HEAVY_MODULES = ('pandas', 'numpy', 'yfinance', 'requests')
+RUNS = 5
+
+
+def import_profile(command):
+    """Total import time (ms) and the top-level modules imported, from -X importtime."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', 'query.py', command],
+                            cwd=ROOT, capture_output=True, text=True)
+    total_us, modules = 0, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.add(name.strip().split('.')[0])
+        # Nested imports are indented; top-level cumulative times already include them
+        if not name.startswith('  '):
+            total_us += int(cumulative)
+    return total_us / 1000, modules
+
+
+def wall_time(command):
+    best = float('inf')
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, 'query.py', command], cwd=ROOT, capture_output=True)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+if __name__ == "__main__":
+    failed = False
+    print(f"{'command':<10} {'imports ms':>10} {'wall ms':>8}  heavy imports")
+    for command in COMMANDS:
+        import_ms, modules = import_profile(command)
+        wall_ms = wall_time(command)
+        heavy = sorted(m for m in modules if m in HEAVY_MODULES)
+        status = "✅" if wall_ms < TARGET_MS and not heavy else "❌"
+        failed |= status == "❌"
+        print(f"{command:<10} {import_ms:>10.1f} {wall_ms:>8.1f}  {', '.join(heavy) or '-'} {status}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,100 @@
+'''
+Per-symbol journals for resumable runs
+
+A fetch-heavy job appends one JSON line per symbol to
+data/checkpoints/<job>-<run key>.jsonl as soon as that symbol's work
+completes. The run key hashes the run date and the job's inputs, so a rerun
+with resume=True reads back what is done for the same date and inputs and
+only works on the rest. A run that finishes removes its journal; journals
+left from earlier days are removed by the job's next run.
+'''
+
+import glob
+import hashlib
+import json
+import os
+import threading
+from datetime import date, datetime
+
+import pandas as pd
+
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'checkpoints')
+
+
+def run_key(run_date, *inputs):
+    """Hash of the run date and inputs; inputs that are existing files contribute their contents."""
+    digest = hashlib.sha1(str(run_date).encode())
+    for item in inputs:
+        if isinstance(item, str) and os.path.isfile(item):
+            with open(item, 'rb') as f:
+                digest.update(f.read())
+        else:
+            digest.update(str(item).encode())
+    return digest.hexdigest()[:12]
+
+
+def series_record(series):
+    """JSON-ready {'dates': [...], 'values': [...]} of a date-indexed Series."""
+    return {'dates': [d.strftime('%Y-%m-%d') for d in pd.DatetimeIndex(series.index)],
+            'values': [None if pd.isna(v) else float(v) for v in series]}
+
+
+def record_series(record, name=None):
+    return pd.Series(record['values'], index=pd.DatetimeIndex(record['dates']), name=name, dtype=float)
+
+
+class Journal:
+    """
+    Append-only JSONL journal of one run. done holds {symbol: record} read back
+    on resume; record() is thread-safe and each line is flushed to disk before
+    it returns, so a killed process loses at most the symbol in flight.
+    """
+
+    def __init__(self, job, key, resume=False, checkpoint_dir=CHECKPOINT_DIR):
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        self.path = os.path.join(checkpoint_dir, f"{job}-{key}.jsonl")
+        # Journals of this job from an earlier day can never be resumed; today's
+        # may belong to a concurrent run with other inputs, so they are left alone
+        for stale in glob.glob(os.path.join(checkpoint_dir, f"{job}-*.jsonl")):
+            if stale != self.path and datetime.fromtimestamp(os.path.getmtime(stale)).date() < date.today():
+                os.remove(stale)
+
+        self.done = self._load() if resume else {}
+        if resume and self.done:
+            print(f"ℹ️ Resuming {job}: {len(self.done)} symbols already done in {self.path}")
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'a' if resume else 'w')
+
+    def _load(self):
+        """
+        Reads back the complete lines and truncates the journal after the last
+        one, so appends never continue a line cut short by a crash.
+        """
+        done = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            complete = data.rfind(b'\n') + 1
+            for line in data[:complete].splitlines():
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue   # a damaged line; its symbol is redone
+                done[entry.pop('symbol')] = entry
+            if complete < len(data):
+                f.truncate(complete)
+        return done
+
+    def record(self, symbol, payload):
+        line = json.dumps({'symbol': symbol, **payload}) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.done[symbol] = payload
+
+    def finish(self):
+        """Closes the journal and removes it; the run's outputs are complete."""
+        self._file.close()
+        os.remove(self.path)
@@ -0,0 +1,173 @@
+'''
+Corporate-action adjustment factors
+
+One table of splits and dividends per Yahoo ticker, cached as
+data/price-cache/actions/<ticker>.csv (Date,Dividends,Stock Splits).
+Yahoo reports bonus issues as splits (a 1:1 bonus is a 2.0 split).
+
+Yahoo's unadjusted history (auto_adjust=False) has Close already adjusted
+for splits but not for dividends. From that one series and the action table:
+
+    raw            Close x product of split ratios after each date (the traded price)
+    split_adjusted Close as fetched
+    total_return   Close x product of (1 - dividend / previous close) after each date
+
+The factors are built as dates x tickers matrices and applied to the whole
+close panel in one multiplication.
+to_traded_prices() applies the raw view to a valuation's Yahoo-sourced
+histories, using the actions that came with the same price fetch.
+'''
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from price_cache import cache_path, read_cache, read_index, write_cache
+
+ACTION_COLUMNS = ['Dividends', 'Stock Splits']
+SPLIT_ADJUSTED_PROVIDERS = ('cache', 'yfinance')      # Yahoo closes; manual CSVs hold traded prices
+
+
+def actions_from_history(hist):
+    """Action rows (Date index) carried in a Ticker.history() frame, or None when it has none."""
+    if not set(ACTION_COLUMNS) <= set(hist.columns):
+        return None
+    actions = hist[ACTION_COLUMNS]
+    return actions[(actions != 0).any(axis=1)]
+
+
+_actions_lock = threading.Lock()
+
+
+def _with_stored(ticker, actions, start_date):
+    """
+    The new actions joined with the stored table's older rows, and the start
+    they cover together. A stored table written on or after start_date
+    leaves no gap, so the wider of the two starts is kept; otherwise the new
+    fetch replaces it.
+    """
+    entry = read_index().get(f"actions/{ticker}")
+    start = pd.Timestamp(start_date).normalize()
+    path = cache_path('actions', ticker)
+    if not entry or pd.Timestamp(entry['written'][:10]) < start or not os.path.exists(path):
+        return actions, start_date
+    stored = pd.read_csv(path, parse_dates=['Date']).set_index('Date')
+    older = stored[stored.index < start]
+    covered = None if entry['from'] is None else min(pd.Timestamp(entry['from']), start)
+    return pd.concat([older, actions]), covered
+
+
+def cache_history_actions(ticker, hist, start_date):
+    """
+    Caches the actions carried in a history fetched from start_date, so no
+    second call is needed, and returns them (None when the history has no
+    action columns). Tables already stored for earlier dates are kept.
+    """
+    actions = actions_from_history(hist)
+    if actions is None:
+        return None
+    actions = actions.copy()
+    actions.index = pd.DatetimeIndex(actions.index).tz_localize(None).normalize()
+    with _actions_lock:
+        stored, covered = _with_stored(ticker, actions, start_date) if start_date is not None else (actions, None)
+        write_cache('actions', ticker, stored.rename_axis('Date').reset_index(), covered)
+    return actions
+
+
+def symbol_actions(symbols, start_date, fetched=None, exchange='NSE', suffixes=('.NS', '.BO')):
+    """
+    {symbol: action table, or None when unknown} for symbols Yahoo prices
+    under the given suffixes. `fetched` holds the {variant: table} a
+    YahooProvider attached to each symbol's price history (attrs['actions']);
+    symbols without one (prices from the cache, a resumed run) use their warm
+    cached tables. Nothing is fetched here.
+    """
+    fetched = fetched or {}
+
+    def lookup(symbol):
+        tables = fetched.get(symbol)
+        if tables:
+            tables = [t for t in tables.values() if t is not None]
+        else:
+            tables = [read_cache('actions', symbol + suffix, exchange, start_date) for suffix in suffixes]
+            tables = [t.set_index('Date') for t in tables if t is not None]
+        # Any variant with actions wins; an empty table means the symbol had none
+        return next((t for t in tables if not t.empty), tables[0] if tables else None)
+
+    return {symbol: lookup(symbol) for symbol in symbols}
+
+
+def _event_matrix(dates, columns, actions, column):
+    """Dates x tickers matrix of one action column, each ex-date on the first panel date at or after it."""
+    events = np.zeros((len(dates), len(columns)))
+    for j, ticker in enumerate(columns):
+        table = actions.get(ticker)
+        if table is None or table.empty:
+            continue
+        table = table[table[column] != 0]
+        rows = dates.searchsorted(pd.DatetimeIndex(table.index).normalize())
+        keep = rows < len(dates)
+        np.add.at(events[:, j], rows[keep], table[column].to_numpy(float)[keep])
+    return events
+
+
+def _product_after(factors):
+    """Product of each column's factors on rows strictly after every row."""
+    after = np.ones_like(factors)
+    after[:-1] = np.cumprod(factors[::-1], axis=0)[::-1][1:]
+    return after
+
+
+def adjustment_factors(closes, actions):
+    """
+    (split factor, dividend factor), dates x tickers, for a split-adjusted close
+    panel and {ticker: action table}. Tickers without a table get factors of 1.
+    """
+    dates = pd.DatetimeIndex(closes.index)
+    values = closes.to_numpy(float)
+
+    splits = _event_matrix(dates, closes.columns, actions, 'Stock Splits')
+    split_factor = _product_after(np.where(splits > 0, splits, 1.0))
+
+    dividends = _event_matrix(dates, closes.columns, actions, 'Dividends')
+    previous = np.full_like(values, np.nan)
+    previous[1:] = pd.DataFrame(values).ffill().to_numpy()[:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = 1 - dividends / previous
+    dividend_factor = _product_after(np.where((dividends > 0) & (ratio > 0), ratio, 1.0))
+    return split_factor, dividend_factor
+
+
+def price_views(closes, actions):
+    """{'raw', 'split_adjusted', 'total_return'} close panels from one split-adjusted panel."""
+    split_factor, dividend_factor = adjustment_factors(closes, actions)
+    return {
+        'raw': closes * split_factor,
+        'split_adjusted': closes,
+        'total_return': closes * dividend_factor,
+    }
+
+
+def to_traded_prices(price_histories, start_date):
+    """
+    Yahoo closes are split-adjusted, while the ledger's share counts are as
+    held on each day; undoes the splits and bonuses after each date for every
+    Yahoo-sourced symbol in one step over the close panel. The actions come
+    with the price fetch (or from the cache it warmed), so nothing is fetched again.
+    """
+    yahoo = {s: df for s, df in price_histories.items()
+             if df is not None and not df.empty and df.attrs.get('provider') in SPLIT_ADJUSTED_PROVIDERS}
+    if not yahoo:
+        return price_histories
+    closes = pd.DataFrame({s: df.set_index('Transaction Date')['Price'] for s, df in yahoo.items()})
+    actions = symbol_actions(list(yahoo), start_date, {s: df.attrs.get('actions') for s, df in yahoo.items()})
+    unknown = [s for s, table in actions.items() if table is None]
+    if unknown:
+        print(f"⚠️ No corporate actions for {', '.join(unknown)}; their prices stay split-adjusted.")
+    raw = price_views(closes, actions)['raw']
+    traded = dict(price_histories)
+    for symbol in yahoo:
+        traded[symbol] = raw[symbol].dropna().rename('Price').rename_axis('Transaction Date').reset_index()
+    return traded
@@ -1,5 +1,8 @@
 import pandas as pd
 from datetime import datetime
+from trading_calendar import valuation_dates, next_trading_day
+
+VALUATION_MODE = 'business'  # 'business' = NSE trading days only, 'calendar' = every day
 
 def process_csv(input_csv, output_csv):
     # Read CSV
@@ -8,14 +11,18 @@ def process_csv(input_csv, output_csv):
     # Ensure date is in datetime format
     df['date'] = pd.to_datetime(df['date'])
     
+    # Spends on non-trading days are booked on the next trading day
+    if VALUATION_MODE == 'business':
+        df['date'] = next_trading_day(df['date'], 'NSE')
+    
     # Step 1: Aggregate amounts by date
     df = df.groupby('date', as_index=False)['amount'].sum()
     
     # Step 2: Compute cumulative sum
     df['cumulative_amount'] = df['amount'].cumsum()
     
-    # Step 3: Create full date range from min to max
-    full_range = pd.date_range(start=df['date'].min(), end=df['date'].max(), freq='D')
+    # Step 3: Create valuation date range from min to max
+    full_range = valuation_dates(df['date'].min(), df['date'].max(), 'NSE', VALUATION_MODE)
     
     # Step 4: Reindex dataframe to include all dates
     df = df.set_index('date').reindex(full_range)
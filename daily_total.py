@@ -0,0 +1,34 @@
+'''
+Running portfolio total over a date index
+
+Valuation scripts stream their per-symbol frames to the output one at a time
+(see OutputManager.stream_csv) and add each one to a DailyTotal, so the
+portfolio-level series comes out without holding every symbol's rows.
+'''
+
+import numpy as np
+import pandas as pd
+
+
+class DailyTotal:
+    """
+    Running sum over a date index, filled in one frame at a time so a
+    portfolio total never needs every symbol's rows in memory at once.
+    Dates no frame has touched are left out of series().
+    """
+
+    def __init__(self, dates):
+        self.dates = pd.DatetimeIndex(dates)
+        self.total = np.zeros(len(self.dates))
+        self.touched = np.zeros(len(self.dates), bool)
+
+    def add(self, dates, values):
+        rows = self.dates.get_indexer(pd.DatetimeIndex(dates))
+        if (rows < 0).any():
+            raise ValueError("DailyTotal.add got dates outside its index")
+        # Like groupby().sum(), a missing value counts as 0
+        np.add.at(self.total, rows, np.nan_to_num(np.asarray(values, float)))
+        self.touched[rows] = True
+
+    def series(self, name=None):
+        return pd.Series(self.total[self.touched], index=self.dates[self.touched], name=name)
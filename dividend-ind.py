@@ -1,8 +1,10 @@
 import pandas as pd
 import yfinance as yf
 from datetime import datetime
+from output_manager import OutputManager
+from price_cache import cached_dividends
 
-def fetch_dividend_calendar(input_csv_path, output_csv_path):
+def fetch_dividend_calendar(input_csv_path, asset_class='dividends-ind'):
     df = pd.read_csv(input_csv_path)
     df['Transaction Date'] = pd.to_datetime(df['Transaction Date'], dayfirst=True)
     df['Symbol'] = df['Symbol'].astype(str)
@@ -32,8 +34,9 @@ def fetch_dividend_calendar(input_csv_path, output_csv_path):
         for suffix in [".NS", ".BO"]:
             try:
                 full_symbol = symbol + suffix
-                ticker = yf.Ticker(full_symbol)
-                dividends = ticker.dividends
+                dividends = cached_dividends(full_symbol, 'NSE')
+                if dividends is None:
+                    dividends = yf.Ticker(full_symbol).dividends
 
                 if not dividends.empty:
                     # Remove timezone and filter to financial year
@@ -63,12 +66,13 @@ def fetch_dividend_calendar(input_csv_path, output_csv_path):
         df_calendar.sort_values(by=['Month Number', 'Dividend Date', 'Symbol'], inplace=True)
         df_calendar.drop(columns='Month Number', inplace=True)
 
-        df_calendar.to_csv(output_csv_path, index=False)
+        outputs = OutputManager(asset_class)
+        output_csv_path = outputs.write_csv(df_calendar, 'dividend_calendar')
+        outputs.commit()
         print(f"✅ Dividend calendar written to {output_csv_path}")
     else:
         print("❌ No dividend data available for any symbols in FY 2024-25.")
 
 # Example usage
 input_csv = '/Users/in22417145/PycharmProjects/portfolio/data/ind-stocks.csv'
-output_csv = '/Users/in22417145/PycharmProjects/portfolio/data/dividend-calendar.csv'
-fetch_dividend_calendar(input_csv, output_csv)
+fetch_dividend_calendar(input_csv)
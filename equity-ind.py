@@ -2,102 +2,36 @@
 For Indian Stocks
 '''
 
-import os
+import argparse
 import pandas as pd
-import yfinance as yf
 from datetime import datetime, timedelta
+from trading_calendar import valuation_dates, expand_to_calendar_days
+from daily_total import DailyTotal
+from output_manager import OutputManager
+from shared_panel import value_holdings
+from price_providers import PROVIDER_ORDER, ProviderChain, YahooProvider, ManualCsvProvider
+from price_cache import CachedProvider
+from checkpoint import Journal, run_key, series_record, record_series
+from corporate_actions import to_traded_prices
 
 
-import os
+MANUAL_DATA_DIR = '/Users/in22417145/PycharmProjects/portfolio/data'
 
-def get_manual_price_history(symbol, start_date, end_date, manual_data_dir):
-    """
-    Fallback function: Reads manual CSV with Date and Price.
-    Assumes price=0 for dates beyond available range.
-    """
-    file_path = os.path.join(manual_data_dir, f"{symbol}.csv")
-    
-    if not os.path.exists(file_path):
-        return None
-    
-    try:
-        df = pd.read_csv(file_path)
-        df['Date'] = pd.to_datetime(df['Date'])
-        df = df.rename(columns={'Date': 'Transaction Date', 'Price': 'Price'})
-        df = df[['Transaction Date', 'Price']]
-        
-        # Ensure full date range with 0 for future dates
-        full_dates = pd.date_range(start=start_date, end=end_date)
-        full_df = pd.DataFrame({'Transaction Date': full_dates})
-        merged = pd.merge(full_df, df, on='Transaction Date', how='left')
-        
-        # Fill forward known values; then set any remaining (future) as 0
-        merged['Price'] = merged['Price'].ffill().fillna(0)
-        return merged
-    except Exception as e:
-        print(f"❌ Failed to load manual CSV for {symbol}: {str(e)}")
-        return None
-
-
-def get_best_price_history(symbol_base, start_date, end_date):
+
+def build_price_chain(manual_data_dir=MANUAL_DATA_DIR, order=PROVIDER_ORDER):
     """
-    Tries to fetch data for both NSE (.NS) and BSE (.BO) variants of a symbol.
-    Returns the DataFrame with the highest available closing price per day.
+    Closes prefetch.py cached after the last NSE close, then NSE/BSE prices
+    from yfinance (highest close of the two), falling back to manual
+    <symbol>.csv files that are loaded and indexed once.
     """
-    variants = [symbol_base + ".NS", symbol_base + ".BO"]
-    data_frames = []
-    
-    for variant in variants:
-        try:
-            ticker = yf.Ticker(variant)
-            hist = ticker.history(start=start_date, end=end_date, auto_adjust=False)
-            if hist.empty:
-                print(f"No data for {variant}")
-                continue
-            hist = hist.reset_index()
-            hist['Transaction Date'] = pd.to_datetime(hist['Date']).dt.date
-            hist = hist[['Transaction Date', 'Close']]
-            hist.rename(columns={'Close': f'Price_{variant[-2:]}'}, inplace=True)
-            data_frames.append(hist)
-        except Exception as e:
-            print(f"Error fetching {variant}: {str(e)}")
-            continue
-
-    if not data_frames:
-        return None
-
-    # Merge available data on Transaction Date
-    merged = data_frames[0]
-    for df in data_frames[1:]:
-        merged = pd.merge(merged, df, on='Transaction Date', how='outer')
-
-    # Replace NaN with 0 before max (we’ll re-mask later)
-    price_cols = [col for col in merged.columns if col.startswith("Price_")]
-    merged['Price'] = merged[price_cols].max(axis=1, skipna=True)
+    return ProviderChain([CachedProvider('NSE'), YahooProvider(suffixes=('.NS', '.BO')),
+                          ManualCsvProvider(manual_data_dir)],
+                         order=order)
 
-    # Keep only Transaction Date and final Price
-    final = merged[['Transaction Date', 'Price']].copy()
-    final['Transaction Date'] = pd.to_datetime(final['Transaction Date'])
-
-    # Forward fill price for holidays
-    final.sort_values('Transaction Date', inplace=True)
-    final['Price'].ffill(inplace=True)
-
-    return final
-
-def get_portfolio_values(input_csv_path, output_csv_path):
-    manual_data_dir = '/Users/in22417145/PycharmProjects/portfolio/data'
-    df_transactions = pd.read_csv(input_csv_path)
-    df_transactions['Symbol'] = df_transactions['Symbol'].astype(str)
-    df_transactions['Transaction Date'] = pd.to_datetime(df_transactions['Transaction Date'], dayfirst=True)
-    symbols = df_transactions['Symbol'].unique()
 
-    final_df = pd.DataFrame()
-    last_positions = pd.DataFrame()
-    
+def value_symbols(df_transactions, symbols, price_histories, end_date, valuation_mode, ignored_symbols):
+    """Yields one valued frame per symbol (shares held x price on each valuation day)."""
     for symbol in symbols:
-        ignored_symbols = []  # To store symbols not found in both NSE and BSE
-
         symbol_trans = (
         df_transactions[df_transactions['Symbol'] == symbol]
         .reset_index()
@@ -107,22 +41,14 @@ def get_portfolio_values(input_csv_path, output_csv_path):
         .drop(columns='index')
         )
 
-        # start_date = symbol_trans['Transaction Date'].min() - timedelta(days=1)
-        start_date = datetime.today() - timedelta(days=10)
-        end_date = datetime.today()
-
-        price_df = get_best_price_history(symbol, start_date, end_date)
-        if price_df is None or price_df.empty:
-            print(f"ℹ️ Trying manual CSV fallback for {symbol}...")
-            price_df = get_manual_price_history(symbol, start_date, end_date, manual_data_dir)
-
+        price_df = price_histories.get(symbol)
         if price_df is None or price_df.empty:
             print(f"⚠️ Skipping symbol {symbol} — no data from NSE, BSE or manual CSV.")
             ignored_symbols.append(symbol)
             continue
 
-        date_range = pd.date_range(start=symbol_trans['Transaction Date'].min(), 
-                                   end=end_date, freq='D')
+        date_range = valuation_dates(symbol_trans['Transaction Date'].min(), end_date,
+                                     'NSE', valuation_mode)
         date_df = pd.DataFrame({'Transaction Date': date_range})
         share_changes = symbol_trans.set_index('Transaction Date')['Total Shares']
         shares_ffilled = share_changes.reindex(date_range, method='ffill').fillna(0)
@@ -132,27 +58,83 @@ def get_portfolio_values(input_csv_path, output_csv_path):
         merged['Symbol'] = symbol
 
         merged = pd.merge(merged, price_df, on='Transaction Date', how='left')
-        merged['Price'].ffill(inplace=True)
+        merged['Price'] = merged['Price'].ffill()
         merged['Total value'] = merged['Total Shares'] * merged['Price']
+        yield merged
 
-        final_df = pd.concat([final_df, merged], ignore_index=True)
-        last_position = merged.iloc[-1].copy()
-        last_positions = pd.concat([last_positions, last_position.to_frame().T], ignore_index=True)
 
-    final_df = final_df[['Symbol', 'Transaction Date', 'Total Shares', 'Price', 'Total value']]
+def get_portfolio_values(input_csv_path, asset_class, valuation_mode='business', expand_calendar_days=False,
+                         price_chain=None, resume=False, workers=1):
+    """
+    Outputs are written under data/outputs/<asset_class>/<run>/ and published in the manifest.
+    valuation_mode='business' values only on NSE trading days; 'calendar' values every day.
+    expand_calendar_days forward-fills the written outputs onto every calendar day.
+    Each symbol's prices are journaled as they arrive; resume=True reuses those
+    from an interrupted run on the same day with the same ledger.
+    workers > 1 values the symbols in that many processes over shared price panels.
+    """
+    price_chain = price_chain or build_price_chain()
+    df_transactions = pd.read_csv(input_csv_path)
+    df_transactions['Symbol'] = df_transactions['Symbol'].astype(str)
+    df_transactions['Transaction Date'] = pd.to_datetime(df_transactions['Transaction Date'], dayfirst=True)
+    symbols = df_transactions['Symbol'].unique()
+
+    ignored_symbols = []  # To store symbols not found in both NSE and BSE
+
+    # start_date = symbol_trans['Transaction Date'].min() - timedelta(days=1)
+    start_date = datetime.today() - timedelta(days=10)
+    end_date = datetime.today()
+
+    # Fetch every symbol's prices up front, in parallel across providers, journaling each one
+    journal = Journal(asset_class, run_key(start_date.date(), input_csv_path), resume)
+    price_histories = {}
+    for s, r in journal.done.items():
+        price_histories[s] = record_series(r, 'Price').rename_axis('Transaction Date').reset_index()
+        price_histories[s].attrs['provider'] = r.get('provider')
+
+    def on_result(symbol, price_df):
+        if price_df is not None and not price_df.empty:
+            journal.record(symbol, {**series_record(price_df.set_index('Transaction Date')['Price']),
+                                    'provider': price_df.attrs.get('provider')})
+
+    remaining = [s for s in symbols if s not in price_histories]
+    price_histories.update(price_chain.history_many(remaining, start_date, end_date, on_result))
+    price_histories = to_traded_prices(price_histories, start_date)
+
+    # Each symbol's valued frame goes straight to the output file; only the
+    # running portfolio total and one row per symbol stay in memory
+    outputs = OutputManager(asset_class)
+    dates = valuation_dates(df_transactions['Transaction Date'].min(), end_date, 'NSE', valuation_mode)
+    portfolio_total = DailyTotal(dates)
+    if workers > 1:
+        valued = value_holdings(df_transactions, symbols, price_histories, dates, workers, ignored_symbols)
+    else:
+        valued = value_symbols(df_transactions, symbols, price_histories, end_date, valuation_mode,
+                               ignored_symbols)
+    last_positions = []
+    with outputs.stream_csv('per_symbol_values') as per_symbol_sink:
+        for merged in valued:
+            merged = merged[['Symbol', 'Transaction Date', 'Total Shares', 'Price', 'Total value']]
+            portfolio_total.add(merged['Transaction Date'], merged['Total value'])
+            last_positions.append(merged.iloc[-1].copy())
+            if expand_calendar_days:
+                merged = expand_to_calendar_days(merged, by='Symbol', end_date=end_date)
+            per_symbol_sink.write(merged)
+    print(f"✅ Per-symbol daily values saved to {per_symbol_sink.path}")
+
+    last_positions = pd.concat([row.to_frame().T for row in last_positions], ignore_index=True)
     last_positions = last_positions[['Symbol', 'Transaction Date', 'Price', 'Total Shares', 'Total value']]
     last_positions.columns = ['Symbol', 'As of Date', 'Last Price', 'Total Shares', 'Total Value']
 
-    portfolio_value = final_df.groupby('Transaction Date')['Total value'].sum().reset_index()
+    portfolio_value = portfolio_total.series().rename_axis('Transaction Date').reset_index()
     portfolio_value.columns = ['Transaction Date', 'Portfolio Value']
+    if expand_calendar_days:
+        portfolio_value = expand_to_calendar_days(portfolio_value, end_date=end_date)
 
-    final_df.to_csv('/Users/in22417145/PycharmProjects/portfolio/data/per_symbol_values.csv', index=False)
-    portfolio_value.to_csv(output_csv_path, index=False)
-    last_positions.to_csv('/Users/in22417145/PycharmProjects/portfolio/data/last_day_values.csv', index=False)
-
-    print("✅ Per-symbol daily values saved.")
-    print("✅ Aggregated portfolio values saved.")
-    print("✅ Last positions report saved.")
+    print(f"✅ Aggregated portfolio values saved to {outputs.write_csv(portfolio_value, 'portfolio_values')}")
+    print(f"✅ Last positions report saved to {outputs.write_csv(last_positions, 'last_day_values')}")
+    outputs.commit()
+    journal.finish()
 
     # Print ignored symbols if any
     if ignored_symbols:
@@ -163,6 +145,11 @@ def get_portfolio_values(input_csv_path, output_csv_path):
         print("\n✅ All symbols were successfully processed from either NSE or BSE.")
 
 # Example usage
-input_csv_path = '/Users/in22417145/PycharmProjects/portfolio/data/ind-stocks.csv'
-output_csv_path = '/Users/in22417145/PycharmProjects/portfolio/data/ind-stocks-output.csv'
-get_portfolio_values(input_csv_path, output_csv_path)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Value the Indian stock portfolio.")
+    parser.add_argument('--resume', action='store_true', help="Reuse prices journaled by an interrupted run today")
+    parser.add_argument('--workers', type=int, default=1, help="Processes valuing symbols over shared price panels")
+    args = parser.parse_args()
+
+    input_csv_path = '/Users/in22417145/PycharmProjects/portfolio/data/ind-stocks.csv'
+    get_portfolio_values(input_csv_path, 'ind-stocks', resume=args.resume, workers=args.workers)
@@ -3,27 +3,34 @@ For Mutual Funds
 '''
 
 
+import argparse
 import pandas as pd
-import yfinance as yf
 from datetime import datetime, timedelta
+from trading_calendar import valuation_dates, expand_to_calendar_days
+from daily_total import DailyTotal
+from output_manager import OutputManager
+from shared_panel import value_holdings
+from price_providers import ProviderChain, YahooProvider, BulkNavProvider
+from price_cache import CachedProvider
+from mf_bulk_nav import NAV_HISTORY_CSV, SCHEME_MAP_CSV
 
-def get_portfolio_values(input_csv_path, output_csv_path):
-    # Read the input CSV file
-    df_transactions = pd.read_csv(input_csv_path)
-    
-    # Ensure Symbol column is treated as string
-    df_transactions['Symbol'] = df_transactions['Symbol'].astype(str)
-    
-    # Convert Transaction Date to datetime
-    df_transactions['Transaction Date'] = pd.to_datetime(df_transactions['Transaction Date'], dayfirst=True)
-    
-    # Get unique symbols
-    symbols = df_transactions['Symbol'].unique()
-    
-    # Initialize DataFrames for outputs
-    final_df = pd.DataFrame()
-    last_positions = pd.DataFrame()
-    
+
+MF_PROVIDER_ORDER = ['cache', 'amfi', 'yfinance']     # Fallback order for NAV history
+
+
+def build_price_chain(history_csv=NAV_HISTORY_CSV, scheme_map_csv=SCHEME_MAP_CSV, order=MF_PROVIDER_ORDER):
+    """
+    NAVs prefetch.py cached after the last close, then the local AMFI
+    bulk-file history (see mf_bulk_nav.py), falling back to a yfinance call
+    per fund for schemes neither covers.
+    """
+    return ProviderChain([CachedProvider('NSE'), BulkNavProvider(history_csv, scheme_map_csv),
+                          YahooProvider(suffixes=('',), auto_adjust=True)],
+                         order=order)
+
+
+def value_symbols(df_transactions, symbols, price_histories, end_date, valuation_mode):
+    """Yields one valued frame per fund (units held x NAV on each valuation day)."""
     for symbol in symbols:
         # Get transactions for this symbol and keep only last transaction per date
         symbol_trans = (df_transactions[df_transactions['Symbol'] == symbol]
@@ -31,31 +38,15 @@ def get_portfolio_values(input_csv_path, output_csv_path):
                        .drop_duplicates('Transaction Date', keep='last')
                        .copy())
         
-        # Get historical prices for this symbol
-        start_date = symbol_trans['Transaction Date'].min() - timedelta(days=1)
-        end_date = datetime.today()
-        
         try:
-            # Download historical data
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(start=start_date, end=end_date)
-            
-            if hist.empty:
+            hist = price_histories.get(symbol)
+            if hist is None or hist.empty:
                 print(f"No data found for {symbol}")
                 continue
             
-            # Reset index and format date
-            hist = hist.reset_index()
-            hist['Date'] = pd.to_datetime(hist['Date']).dt.date
-            hist['Transaction Date'] = pd.to_datetime(hist['Date'])
-            
-            # Keep only Date and Close price
-            hist = hist[['Transaction Date', 'Close']]
-            hist.rename(columns={'Close': 'Price'}, inplace=True)
-            
-            # Create a date range from first transaction to today
-            date_range = pd.date_range(start=symbol_trans['Transaction Date'].min(), 
-                                     end=end_date, freq='D')
+            # Create a date range of valuation days from first transaction to today
+            date_range = valuation_dates(symbol_trans['Transaction Date'].min(), end_date,
+                                         'NSE', valuation_mode)
             date_df = pd.DataFrame({'Transaction Date': date_range})
             
             # Create a Series with all transaction dates and their share values
@@ -73,45 +64,92 @@ def get_portfolio_values(input_csv_path, output_csv_path):
             merged = pd.merge(merged, hist, on='Transaction Date', how='left')
             
             # Forward fill prices for bank holidays
-            merged['Price'].ffill(inplace=True)
+            merged['Price'] = merged['Price'].ffill()
             
             # Calculate total value
             merged['Total value'] = merged['Total Shares'] * merged['Price']
             
-            # Append to final DataFrame
-            final_df = pd.concat([final_df, merged], ignore_index=True)
-            
-            # Get last position for this symbol
-            last_position = merged.iloc[-1].copy()
-            last_positions = pd.concat([last_positions, last_position.to_frame().T], ignore_index=True)
-            
         except Exception as e:
             print(f"Error processing {symbol}: {str(e)}")
             continue
+
+        yield merged
+
+
+def get_portfolio_values(input_csv_path, asset_class, valuation_mode='business', expand_calendar_days=False,
+                         price_chain=None, workers=1):
+    """
+    Outputs are written under data/outputs/<asset_class>/<run>/ and published in the manifest.
+    valuation_mode='business' values only on NSE trading days; 'calendar' values every day.
+    expand_calendar_days forward-fills the written outputs onto every calendar day.
+    workers > 1 values the funds in that many processes over shared NAV panels.
+    """
+    price_chain = price_chain or build_price_chain()
+
+    # Read the input CSV file
+    df_transactions = pd.read_csv(input_csv_path)
     
-    # Reorder columns for daily values
-    final_df = final_df[['Symbol', 'Transaction Date', 'Total Shares', 'Price', 'Total value']]
+    # Ensure Symbol column is treated as string
+    df_transactions['Symbol'] = df_transactions['Symbol'].astype(str)
     
+    # Convert Transaction Date to datetime
+    df_transactions['Transaction Date'] = pd.to_datetime(df_transactions['Transaction Date'], dayfirst=True)
+    
+    # Get unique symbols
+    symbols = df_transactions['Symbol'].unique()
+    
+    # Fetch every fund's NAVs up front, each from its own first transaction, so the
+    # AMFI store serves every fund bought after its history begins
+    end_date = datetime.today()
+    starts = (df_transactions.groupby('Symbol')['Transaction Date'].min() - timedelta(days=1)).to_dict()
+    price_histories = price_chain.history_many(symbols, starts, end_date)
+    
+    # Each fund's valued frame goes straight to the output file; only the
+    # running portfolio total and one row per fund stay in memory
+    outputs = OutputManager(asset_class)
+    dates = valuation_dates(df_transactions['Transaction Date'].min(), end_date, 'NSE', valuation_mode)
+    portfolio_total = DailyTotal(dates)
+    if workers > 1:
+        valued = value_holdings(df_transactions, symbols, price_histories, dates, workers)
+    else:
+        valued = value_symbols(df_transactions, symbols, price_histories, end_date, valuation_mode)
+    last_positions = []
+    with outputs.stream_csv('per_symbol_values') as per_symbol_sink:
+        for merged in valued:
+            # Reorder columns for daily values
+            merged = merged[['Symbol', 'Transaction Date', 'Total Shares', 'Price', 'Total value']]
+            portfolio_total.add(merged['Transaction Date'], merged['Total value'])
+            last_positions.append(merged.iloc[-1].copy())
+
+            # Optional output step: one row per calendar day
+            if expand_calendar_days:
+                merged = expand_to_calendar_days(merged, by='Symbol', end_date=end_date)
+            per_symbol_sink.write(merged)
+    print(f"Per-symbol daily values saved to '{per_symbol_sink.path}'")
+
     # Prepare last positions report
+    last_positions = pd.concat([row.to_frame().T for row in last_positions], ignore_index=True)
     last_positions = last_positions[['Symbol', 'Transaction Date', 'Price', 'Total Shares', 'Total value']]
     last_positions.columns = ['Symbol', 'As of Date', 'Last Price', 'Total Shares', 'Total Value']
     
-    # Calculate aggregated portfolio value by date
-    portfolio_value = final_df.groupby('Transaction Date')['Total value'].sum().reset_index()
+    # Aggregated portfolio value by date, accumulated as each fund was valued
+    portfolio_value = portfolio_total.series().rename_axis('Transaction Date').reset_index()
     portfolio_value.columns = ['Transaction Date', 'Portfolio Value']
+    if expand_calendar_days:
+        portfolio_value = expand_to_calendar_days(portfolio_value, end_date=end_date)
     
-    # Save outputs to CSV files
-    final_df.to_csv('/Users/in22417145/PycharmProjects/portfolio/data/per_symbol_values.csv', index=False)
-    portfolio_value.to_csv(output_csv_path, index=False)
-    last_positions.to_csv('/Users/in22417145/PycharmProjects/portfolio/data/last_day_values.csv', index=False)
-    
-    print(f"Per-symbol daily values saved to 'per_symbol_daily_values.csv'")
-    print(f"Aggregated portfolio values saved to '{output_csv_path}'")
-    print(f"Last positions report saved to 'last_positions_report.csv'")
+    # Save outputs under this asset class and publish them once all are written
+    print(f"Aggregated portfolio values saved to '{outputs.write_csv(portfolio_value, 'portfolio_values')}'")
+    print(f"Last positions report saved to '{outputs.write_csv(last_positions, 'last_day_values')}'")
+    outputs.commit()
 
 # Example usage
-input_csv_path = '/Users/in22417145/PycharmProjects/portfolio/data/ind-mf.csv'
-output_csv_path = '/Users/in22417145/PycharmProjects/portfolio/data/ind-stocks-output.csv'
-get_portfolio_values(input_csv_path, output_csv_path)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Value the mutual fund portfolio.")
+    parser.add_argument('--workers', type=int, default=1, help="Processes valuing funds over shared NAV panels")
+    args = parser.parse_args()
+
+    input_csv_path = '/Users/in22417145/PycharmProjects/portfolio/data/ind-mf.csv'
+    get_portfolio_values(input_csv_path, 'ind-mf', workers=args.workers)
 
 
@@ -6,34 +6,14 @@ For US Stocks
 import pandas as pd
 import yfinance as yf
 from datetime import datetime, timedelta
+from trading_calendar import valuation_dates, expand_to_calendar_days
+from daily_total import DailyTotal
+from output_manager import OutputManager
+from price_cache import read_cache
 
-def get_portfolio_values(input_csv_path, output_csv_path):
-    # Read the input CSV file
-    df_transactions = pd.read_csv(input_csv_path)
-    
-    # Ensure Symbol column is treated as string
-    df_transactions['Symbol'] = df_transactions['Symbol'].astype(str)
-    
-    # Convert Transaction Date to datetime
-    df_transactions['Transaction Date'] = pd.to_datetime(df_transactions['Transaction Date'], dayfirst=True)
-    
-    # Get unique symbols
-    symbols = df_transactions['Symbol'].unique()
-    
-    # Initialize DataFrames for outputs
-    final_df = pd.DataFrame()
-    last_positions = pd.DataFrame()
-    
-    # Get USD/INR exchange rate data for all required dates
-    start_date = df_transactions['Transaction Date'].min() - timedelta(days=1)
-    end_date = datetime.today()
-    inr_rate = yf.Ticker("INR=X").history(start=start_date, end=end_date)
-    inr_rate = inr_rate.reset_index()
-    inr_rate['Date'] = pd.to_datetime(inr_rate['Date']).dt.date
-    inr_rate['Transaction Date'] = pd.to_datetime(inr_rate['Date'])
-    inr_rate = inr_rate[['Transaction Date', 'Close']]
-    inr_rate.rename(columns={'Close': 'USDINR'}, inplace=True)
-    
+
+def value_symbols(df_transactions, symbols, inr_rate, valuation_mode):
+    """Yields one valued frame per symbol (USD and INR value on each valuation day)."""
     for symbol in symbols:
         # Get transactions for this symbol and keep only last transaction per date
         symbol_trans = (df_transactions[df_transactions['Symbol'] == symbol]
@@ -46,26 +26,29 @@ def get_portfolio_values(input_csv_path, output_csv_path):
         end_date = datetime.today()
         
         try:
-            # Download historical data
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(start=start_date, end=end_date)
-            
-            if hist.empty:
-                print(f"No data found for {symbol}")
-                continue
-            
-            # Reset index and format date
-            hist = hist.reset_index()
-            hist['Date'] = pd.to_datetime(hist['Date']).dt.date
-            hist['Transaction Date'] = pd.to_datetime(hist['Date'])
+            hist = read_cache('prices-us', symbol, 'NYSE', start_date)
+            if hist is None:
+                # Download historical data
+                ticker = yf.Ticker(symbol)
+                # Split-adjusted closes, as prefetch.py caches them in prices-us
+                hist = ticker.history(start=start_date, end=end_date, auto_adjust=False)
+                
+                if hist.empty:
+                    print(f"No data found for {symbol}")
+                    continue
+                
+                # Reset index and format date
+                hist = hist.reset_index()
+                hist['Date'] = pd.to_datetime(hist['Date']).dt.date
+                hist['Transaction Date'] = pd.to_datetime(hist['Date'])
+                
+                # Keep only Date and Close price
+                hist = hist[['Transaction Date', 'Close']]
+                hist.rename(columns={'Close': 'Price'}, inplace=True)
             
-            # Keep only Date and Close price
-            hist = hist[['Transaction Date', 'Close']]
-            hist.rename(columns={'Close': 'Price'}, inplace=True)
-            
-            # Create a date range from first transaction to today
-            date_range = pd.date_range(start=symbol_trans['Transaction Date'].min(), 
-                                     end=end_date, freq='D')
+            # Create a date range of valuation days from first transaction to today
+            date_range = valuation_dates(symbol_trans['Transaction Date'].min(), end_date,
+                                         'NYSE', valuation_mode)
             date_df = pd.DataFrame({'Transaction Date': date_range})
             
             # Create a Series with all transaction dates and their share values
@@ -83,34 +66,80 @@ def get_portfolio_values(input_csv_path, output_csv_path):
             merged = pd.merge(merged, hist, on='Transaction Date', how='left')
             
             # Forward fill prices for bank holidays
-            merged['Price'].ffill(inplace=True)
+            merged['Price'] = merged['Price'].ffill()
             
             # Calculate total value in USD
             merged['Total value (USD)'] = merged['Total Shares'] * merged['Price']
             
             # Merge with INR exchange rates
             merged = pd.merge(merged, inr_rate, on='Transaction Date', how='left')
-            merged['USDINR'].ffill(inplace=True)
+            merged['USDINR'] = merged['USDINR'].ffill()
             
             # Calculate total value in INR
             merged['Total value (INR)'] = merged['Total value (USD)'] * merged['USDINR']
             
-            # Append to final DataFrame
-            final_df = pd.concat([final_df, merged], ignore_index=True)
-            
-            # Get last position for this symbol
-            last_position = merged.iloc[-1].copy()
-            last_positions = pd.concat([last_positions, last_position.to_frame().T], ignore_index=True)
-            
         except Exception as e:
             print(f"Error processing {symbol}: {str(e)}")
             continue
+
+        yield merged
+
+
+def get_portfolio_values(input_csv_path, asset_class, valuation_mode='business', expand_calendar_days=False):
+    """
+    Outputs are written under data/outputs/<asset_class>/<run>/ and published in the manifest.
+    valuation_mode='business' values only on NYSE trading days; 'calendar' values every day.
+    expand_calendar_days forward-fills the written outputs onto every calendar day.
+    """
+    # Read the input CSV file
+    df_transactions = pd.read_csv(input_csv_path)
     
-    # Reorder columns for daily values
-    final_df = final_df[['Symbol', 'Transaction Date', 'Total Shares', 'Price', 
-                        'USDINR', 'Total value (USD)', 'Total value (INR)']]
+    # Ensure Symbol column is treated as string
+    df_transactions['Symbol'] = df_transactions['Symbol'].astype(str)
+    
+    # Convert Transaction Date to datetime
+    df_transactions['Transaction Date'] = pd.to_datetime(df_transactions['Transaction Date'], dayfirst=True)
+    
+    # Get unique symbols
+    symbols = df_transactions['Symbol'].unique()
+    
+    # Get USD/INR exchange rate data for all required dates
+    start_date = df_transactions['Transaction Date'].min() - timedelta(days=1)
+    end_date = datetime.today()
+    # Prefer what prefetch.py cached after the last NYSE close
+    inr_rate = read_cache('prices-us', 'INR=X', 'NYSE', start_date)
+    if inr_rate is not None:
+        inr_rate = inr_rate.rename(columns={'Price': 'USDINR'})
+    else:
+        inr_rate = yf.Ticker("INR=X").history(start=start_date, end=end_date)
+        inr_rate = inr_rate.reset_index()
+        inr_rate['Date'] = pd.to_datetime(inr_rate['Date']).dt.date
+        inr_rate['Transaction Date'] = pd.to_datetime(inr_rate['Date'])
+        inr_rate = inr_rate[['Transaction Date', 'Close']]
+        inr_rate.rename(columns={'Close': 'USDINR'}, inplace=True)
+    
+    # Each symbol's valued frame goes straight to the output file; only the
+    # running portfolio total and one row per symbol stay in memory
+    outputs = OutputManager(asset_class)
+    portfolio_total = DailyTotal(valuation_dates(df_transactions['Transaction Date'].min(), end_date,
+                                                 'NYSE', valuation_mode))
+    last_positions = []
+    with outputs.stream_csv('per_symbol_values') as per_symbol_sink:
+        for merged in value_symbols(df_transactions, symbols, inr_rate, valuation_mode):
+            # Reorder columns for daily values
+            merged = merged[['Symbol', 'Transaction Date', 'Total Shares', 'Price',
+                             'USDINR', 'Total value (USD)', 'Total value (INR)']]
+            portfolio_total.add(merged['Transaction Date'], merged['Total value (INR)'])
+            last_positions.append(merged.iloc[-1].copy())
+
+            # Optional output step: one row per calendar day
+            if expand_calendar_days:
+                merged = expand_to_calendar_days(merged, by='Symbol', end_date=end_date)
+            per_symbol_sink.write(merged)
+    print(f"Per-symbol daily values saved to '{per_symbol_sink.path}'")
     
     # Prepare last positions report
+    last_positions = pd.concat([row.to_frame().T for row in last_positions], ignore_index=True)
     last_positions = last_positions[['Symbol', 'Transaction Date', 'Price', 
                                    'USDINR', 'Total Shares', 'Total value (USD)', 
                                    'Total value (INR)']]
@@ -118,20 +147,17 @@ def get_portfolio_values(input_csv_path, output_csv_path):
                              'USD/INR Rate', 'Total Shares', 'Total Value (USD)', 
                              'Total Value (INR)']
     
-    # Calculate aggregated portfolio value by date (in INR)
-    portfolio_value = final_df.groupby('Transaction Date')['Total value (INR)'].sum().reset_index()
+    # Aggregated portfolio value by date (in INR), accumulated as each symbol was valued
+    portfolio_value = portfolio_total.series().rename_axis('Transaction Date').reset_index()
     portfolio_value.columns = ['Transaction Date', 'Portfolio Value (INR)']
+    if expand_calendar_days:
+        portfolio_value = expand_to_calendar_days(portfolio_value, end_date=end_date)
     
-    # Save outputs to CSV files
-    final_df.to_csv('/Users/in22417145/PycharmProjects/portfolio/data/per_symbol_values.csv', index=False)
-    portfolio_value.to_csv(output_csv_path, index=False)
-    last_positions.to_csv('/Users/in22417145/PycharmProjects/portfolio/data/last_day_values.csv', index=False)
-    
-    print(f"Per-symbol daily values saved to 'per_symbol_daily_values.csv'")
-    print(f"Aggregated portfolio values saved to '{output_csv_path}'")
-    print(f"Last positions report saved to 'last_positions_report.csv'")
+    # Save outputs under this asset class and publish them once all are written
+    print(f"Aggregated portfolio values saved to '{outputs.write_csv(portfolio_value, 'portfolio_values')}'")
+    print(f"Last positions report saved to '{outputs.write_csv(last_positions, 'last_day_values')}'")
+    outputs.commit()
 
 # Example usage
 input_csv_path = '/Users/in22417145/PycharmProjects/portfolio/data/us-stocks.csv'
-output_csv_path = '/Users/in22417145/PycharmProjects/portfolio/data/ind-stocks-output.csv'
-get_portfolio_values(input_csv_path, output_csv_path)
\ No newline at end of file
+get_portfolio_values(input_csv_path, 'us-stocks')
\ No newline at end of file
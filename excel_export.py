@@ -0,0 +1,256 @@
+'''
+Export all portfolio outputs into one Excel workbook
+
+One sheet per output CSV (per asset class for namespaced outputs) plus a
+Summary sheet. Rows are streamed from the
+CSVs into xlsxwriter's constant-memory mode, so large sheets never sit in
+RAM. Only the Summary and the sheets whose source CSV changed since the last
+export are regenerated. Every other sheet is written as an empty placeholder,
+and its worksheet XML is then copied byte for byte from the previous
+workbook. Constant-memory sheets hold their strings inline and share only
+the header style, so a copied sheet needs nothing else from the old file.
+
+    python excel_export.py
+'''
+
+import csv
+import json
+import os
+import shutil
+import sys
+import zipfile
+from xml.etree import ElementTree
+
+from output_manager import latest_paths
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+EXPORT_XLSX = os.path.join(DATA_DIR, 'portfolio-export.xlsx')
+MANIFEST_JSON = os.path.join(DATA_DIR, 'portfolio-export.json')
+EXCEL_MAX_ROWS = 1048576
+COPY_CHUNK_BYTES = 1 << 20
+XLSX_NS = {'m': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+           'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'}
+
+# Per-run artifacts (see output_manager), one sheet per asset class that published them
+ARTIFACT_SHEETS = {
+    'per_symbol_values': 'Per-Symbol',
+    'last_day_values': 'Last Positions',
+    'portfolio_values': 'Portfolio',
+    'dividend_calendar': 'Dividends',
+}
+
+# Sheet name -> source CSV (relative to DATA_DIR) for single-file outputs
+FILE_SHEETS = {
+    'NPS': 'nps-total.csv',
+    'Bank SBI': 'cleaned_output.csv',
+    'Bank HDFC': 'output_filled.csv',
+    'Credit Card': 'credit_output.csv',
+    'Strategy Sell': 'strategy-sell-booking.csv',
+    'Strategy Breakout': 'strategy-breakout-output.csv',
+    'Strategy Volume': 'strategy-volume-output.csv',
+}
+
+# Summary rows: asset class -> (source CSV, value column); credit is a liability.
+# Equity rows come from every published portfolio_values artifact.
+SUMMARY_SOURCES = {
+    'NPS': ('nps-total.csv', 'Total_Value'),
+    'Bank SBI': ('cleaned_output.csv', 'Balance'),
+    'Bank HDFC': ('output_filled.csv', 'Closing Balance'),
+    'Credit Card': ('credit_output.csv', 'cumulative_amount'),
+}
+LIABILITIES = {'Credit Card'}
+
+
+def sheet_sources():
+    """Ordered {sheet name: source path} for everything that currently exists."""
+    sources = {}
+    for artifact, label in ARTIFACT_SHEETS.items():
+        for asset_class, path in latest_paths(artifact).items():
+            name = label if asset_class == 'legacy' else f"{label} {asset_class}"
+            sources[name[:31]] = path
+    for sheet, file_name in FILE_SHEETS.items():
+        sources[sheet] = os.path.join(DATA_DIR, file_name)
+    return {sheet: path for sheet, path in sources.items() if os.path.exists(path)}
+
+
+def fingerprint(path):
+    """Cheap change marker for a source file: size and modification time."""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def iter_csv_rows(path):
+    """Streams rows from a CSV, converting numeric cells to floats."""
+    with open(path, newline='', encoding='utf-8-sig', errors='replace') as f:
+        for row in csv.reader(f):
+            yield [_cell(value) for value in row]
+
+
+def _cell(value):
+    try:
+        return float(value.replace(',', '')) if value.strip() else None
+    except ValueError:
+        return value
+
+
+def last_row(path, column=None):
+    """
+    Date and value of the last row with a value in `column` (default: the second
+    column), read in one streaming pass.
+    """
+    with open(path, newline='', encoding='utf-8-sig', errors='replace') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        idx = header.index(column) if column else 1
+        last = None
+        for row in reader:
+            if len(row) > idx and row[idx].strip():
+                last = row
+    if last is None:
+        return None, None
+    return last[0], _cell(last[idx])
+
+
+def write_rows(workbook, sheet_name, rows, header_format):
+    """
+    Writes rows in order, spilling into '<name> (2)', ... beyond Excel's row
+    limit. Returns the row count and the names of the sheets written.
+    """
+    part, worksheet, row_idx, header, count, names = 1, None, EXCEL_MAX_ROWS, None, 0, []
+    for row in rows:
+        if header is None:
+            header = row
+            continue
+        if row_idx >= EXCEL_MAX_ROWS:
+            name = sheet_name if part == 1 else f'{sheet_name[:27]} ({part})'
+            worksheet = workbook.add_worksheet(name)
+            names.append(name)
+            worksheet.write_row(0, 0, header, header_format)
+            worksheet.freeze_panes(1, 0)
+            part, row_idx = part + 1, 1
+        worksheet.write_row(row_idx, 0, row)
+        row_idx += 1
+        count += 1
+    if worksheet is None:
+        worksheet = workbook.add_worksheet(sheet_name)
+        names.append(sheet_name)
+        worksheet.write_row(0, 0, header or [], header_format)
+    return count, names
+
+
+# ------------------------------
+# SHEET COPIES
+# ------------------------------
+def sheet_parts(book):
+    """{sheet name: worksheet XML part} of an open xlsx zip."""
+    rels = ElementTree.fromstring(book.read('xl/_rels/workbook.xml.rels'))
+    targets = {rel.get('Id'): rel.get('Target') for rel in rels}
+    sheets = ElementTree.fromstring(book.read('xl/workbook.xml')).find('m:sheets', XLSX_NS)
+    parts = {}
+    for sheet in sheets:
+        target = targets[sheet.get(f"{{{XLSX_NS['r']}}}id")]
+        parts[sheet.get('name')] = target.lstrip('/') if target.startswith('/') else f"xl/{target}"
+    return parts
+
+
+def copyable_sheets(previous, unchanged, output_path):
+    """{sheet: its sheet names} for unchanged sheets whose parts are all in the previous workbook."""
+    try:
+        with zipfile.ZipFile(output_path) as book:
+            available = sheet_parts(book)
+    except (OSError, KeyError, zipfile.BadZipFile, ElementTree.ParseError):
+        return {}
+    return {sheet: previous[sheet]['sheets'] for sheet in unchanged
+            if all(name in available for name in previous[sheet]['sheets'])}
+
+
+def copy_sheets(built_path, previous_path, names, output_path):
+    """Writes built_path to output_path with the named sheets' XML taken from previous_path."""
+    with zipfile.ZipFile(built_path) as built, zipfile.ZipFile(previous_path) as previous, \
+            zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as out:
+        built_parts, previous_parts = sheet_parts(built), sheet_parts(previous)
+        replaced = {built_parts[name]: previous_parts[name] for name in names}
+        for info in built.infolist():
+            source, part = (previous, replaced[info.filename]) if info.filename in replaced else (built, info.filename)
+            target = zipfile.ZipInfo(info.filename, info.date_time)
+            target.compress_type = zipfile.ZIP_DEFLATED
+            with source.open(part) as src, out.open(target, 'w', force_zip64=True) as dst:
+                shutil.copyfileobj(src, dst, COPY_CHUNK_BYTES)
+
+
+def summary_rows():
+    yield ['Asset Class', 'As of Date', 'Value']
+    net_worth = 0.0
+    sources = {('Equity' if asset_class == 'legacy' else f"Equity {asset_class}"): (path, None)
+               for asset_class, path in latest_paths('portfolio_values').items()}
+    sources.update({asset_class: (os.path.join(DATA_DIR, file_name), column)
+                    for asset_class, (file_name, column) in SUMMARY_SOURCES.items()})
+    for asset_class, (path, column) in sources.items():
+        if not os.path.exists(path):
+            continue
+        as_of, value = last_row(path, column)
+        if not isinstance(value, float):
+            continue
+        if asset_class in LIABILITIES:
+            value = -value
+        net_worth += value
+        yield [asset_class, as_of, value]
+    yield ['Net Worth', None, net_worth]
+
+
+def export_workbook(output_path=EXPORT_XLSX, manifest_path=MANIFEST_JSON, force=False):
+    import xlsxwriter
+
+    sources = sheet_sources()
+    current = {sheet: fingerprint(path) for sheet, path in sources.items()}
+
+    previous = {}
+    if os.path.exists(manifest_path) and os.path.exists(output_path):
+        with open(manifest_path) as f:
+            # Manifests from before sheet copies held bare fingerprints; their sheets are rebuilt
+            previous = {sheet: entry for sheet, entry in json.load(f).items() if isinstance(entry, dict)}
+    changed = [sheet for sheet in current
+               if force or previous.get(sheet, {}).get('source') != current[sheet]]
+
+    if not changed and set(previous) == set(current):
+        print(f"✅ No source changed since the last export, {output_path} is current.")
+        return []
+
+    copied = copyable_sheets(previous, [s for s in current if s not in changed], output_path)
+    manifest = {}
+    built_path, tmp_path = output_path + '.build.tmp', output_path + '.tmp'
+    try:
+        workbook = xlsxwriter.Workbook(built_path if copied else tmp_path, {'constant_memory': True})
+        header_format = workbook.add_format({'bold': True})
+        try:
+            write_rows(workbook, 'Summary', summary_rows(), header_format)
+            for sheet, path in sources.items():
+                if sheet in copied:
+                    for name in copied[sheet]:
+                        workbook.add_worksheet(name)
+                    names = copied[sheet]
+                else:
+                    rows, names = write_rows(workbook, sheet, iter_csv_rows(path), header_format)
+                    print(f"  -> Rebuilt '{sheet}' ({rows} rows)")
+                manifest[sheet] = {'source': current[sheet], 'sheets': names}
+        finally:
+            workbook.close()
+        if copied:
+            copy_sheets(built_path, output_path, [n for names in copied.values() for n in names], tmp_path)
+        os.replace(tmp_path, output_path)
+    finally:
+        # A failed export leaves the previous workbook as it was
+        for path in (built_path, tmp_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"✅ Workbook written to {output_path} ({len(current) - len(copied)} sheets rebuilt, "
+          f"{len(copied)} copied from the previous export)")
+    return changed
+
+
+if __name__ == "__main__":
+    export_workbook(force='--force' in sys.argv[1:])
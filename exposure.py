@@ -0,0 +1,240 @@
+'''
+Sector and market-cap exposure rollups
+
+data/symbol-metadata.csv maps each symbol to a sector and market-cap bucket
+(seeded from the strategy inputs, editable by hand). The rollup cube holds
+daily value per asset class x sector x market cap, one file per asset class
+under data/exposure/. Updating it only re-aggregates the days of the latest
+valuation output whose per-symbol values differ from the stored ones (new
+days, same-day reruns, back-dated corrections); other days stay as stored. Queries over any date range
+are a searchsorted row slice of the dates x buckets matrix.
+
+    python exposure.py [--start 2025-01-01] [--end 2025-06-30] [--by Sector]
+'''
+
+import argparse
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from output_manager import atomic_write, latest_path
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+METADATA_CSV = os.path.join(DATA_DIR, 'symbol-metadata.csv')
+CUBE_DIR = os.path.join(DATA_DIR, 'exposure')
+STRATEGY_INPUTS = [os.path.join(DATA_DIR, 'strategy-breakout-input.csv'),
+                   os.path.join(DATA_DIR, 'strategy-volume-input.csv')]
+ASSET_CLASSES = ['ind-stocks', 'us-stocks', 'ind-mf']
+UNCLASSIFIED = 'Unclassified'
+# Buckets for symbols the strategy inputs do not cover
+ASSET_CLASS_DEFAULTS = {
+    'us-stocks': {'Sector': 'US Equity', 'Market Cap': 'Largecap'},
+    'ind-mf': {'Sector': 'Mutual Fund', 'Market Cap': 'Multicap'},
+}
+BUCKETS = ['Asset Class', 'Sector', 'Market Cap']
+
+
+# ------------------------------
+# METADATA
+# ------------------------------
+def build_metadata(per_symbol_paths, metadata_csv=METADATA_CSV, strategy_inputs=STRATEGY_INPUTS):
+    """
+    Adds every valued symbol to the metadata table. Rows already in the file
+    are kept as they are, so hand edits survive; new symbols take the latest
+    sector and market cap from the strategy inputs, else the asset-class default.
+    """
+    existing = pd.read_csv(metadata_csv) if os.path.exists(metadata_csv) else pd.DataFrame(columns=BUCKETS + ['Symbol'])
+
+    frames = [pd.read_csv(p, usecols=['date', 'symbol', 'marketcapname', 'sector'])
+              for p in strategy_inputs if os.path.exists(p)]
+    if frames:
+        signals = pd.concat(frames, ignore_index=True)
+        signals['date'] = pd.to_datetime(signals['date'], dayfirst=True)
+        known = (signals.sort_values('date').groupby('symbol').last()
+                 .rename(columns={'sector': 'Sector', 'marketcapname': 'Market Cap'})[['Sector', 'Market Cap']])
+    else:
+        print("ℹ️ No strategy inputs found, new symbols take their asset-class defaults")
+        known = pd.DataFrame(columns=['Sector', 'Market Cap'])
+
+    rows = []
+    seen = set(zip(existing['Symbol'], existing['Asset Class']))
+    for asset_class, path in per_symbol_paths.items():
+        for symbol in pd.read_csv(path, usecols=['Symbol'])['Symbol'].unique():
+            if (symbol, asset_class) in seen:
+                continue
+            default = ASSET_CLASS_DEFAULTS.get(asset_class, {'Sector': UNCLASSIFIED, 'Market Cap': UNCLASSIFIED})
+            info = known.loc[symbol] if symbol in known.index else default
+            rows.append({'Symbol': symbol, 'Asset Class': asset_class,
+                         'Sector': info['Sector'], 'Market Cap': info['Market Cap']})
+
+    metadata = pd.concat([existing, pd.DataFrame(rows)], ignore_index=True)[['Symbol'] + BUCKETS]
+    if rows:
+        atomic_write(lambda tmp: metadata.to_csv(tmp, index=False), metadata_csv)
+        print(f"✅ {len(rows)} symbols added to {metadata_csv}")
+    return metadata
+
+
+def metadata_hash(metadata, asset_class):
+    rows = metadata[metadata['Asset Class'] == asset_class].sort_values('Symbol')
+    return hashlib.sha1(rows.to_csv(index=False).encode()).hexdigest()
+
+
+# ------------------------------
+# CUBE MAINTENANCE
+# ------------------------------
+def valued_rows(per_symbol_csv):
+    """(Symbol, Date, Value) rows from a per-symbol valuation output; US values in INR."""
+    per_symbol = pd.read_csv(per_symbol_csv, parse_dates=['Transaction Date'])
+    value_col = 'Total value (INR)' if 'Total value (INR)' in per_symbol.columns else 'Total value'
+    return per_symbol[['Symbol', 'Transaction Date', value_col]].rename(
+        columns={'Transaction Date': 'Date', value_col: 'Value'})
+
+
+def rollup(rows, metadata, asset_class):
+    """Long (Date, Asset Class, Sector, Market Cap, Value) rollup of valued rows."""
+    rows = rows.merge(metadata[metadata['Asset Class'] == asset_class], on='Symbol', how='left')
+    rows['Asset Class'] = asset_class
+    rows[['Sector', 'Market Cap']] = rows[['Sector', 'Market Cap']].fillna(UNCLASSIFIED)
+    return rows.groupby(['Date'] + BUCKETS, as_index=False)['Value'].sum()
+
+
+def cube_path(asset_class, cube_dir=CUBE_DIR):
+    return os.path.join(cube_dir, f"{asset_class}.csv")
+
+
+def history_path(asset_class, cube_dir=CUBE_DIR):
+    return os.path.join(cube_dir, f"{asset_class}-symbols.csv")
+
+
+def _read_stored(path):
+    return pd.read_csv(path, parse_dates=['Date']) if os.path.exists(path) else None
+
+
+def changed_dates(fresh, stored):
+    """Dates of `fresh` whose (Symbol, Value) rows differ from the stored rows for that date."""
+    if stored is None:
+        return pd.DatetimeIndex(fresh['Date'].unique())
+    stored = stored[stored['Date'] >= fresh['Date'].min()]
+    both = fresh.merge(stored, on=['Date', 'Symbol'], how='outer', suffixes=('', ' stored'), indicator=True)
+    differs = (both['_merge'] != 'both') | ((both['Value'] != both['Value stored'])
+                                            & ~(both['Value'].isna() & both['Value stored'].isna()))
+    return pd.DatetimeIndex(both.loc[differs, 'Date'].unique()).intersection(pd.DatetimeIndex(fresh['Date'].unique()))
+
+
+def update_cube(asset_class, per_symbol_csv, metadata, cube_dir=CUBE_DIR):
+    """
+    Brings one asset class's cube up to date with its latest valuation output
+    and returns the number of dates re-aggregated. The output replaces the
+    stored rows from its first date on, and only its dates whose per-symbol
+    rows changed are grouped again. The valued rows are kept beside the cube (<asset class>-symbols.csv)
+    so a metadata edit can re-bucket the whole history.
+    """
+    state_path = os.path.join(cube_dir, 'state.json')
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+    source = {'path': os.path.relpath(per_symbol_csv, DATA_DIR), 'mtime_ns': os.stat(per_symbol_csv).st_mtime_ns,
+              'metadata': metadata_hash(metadata, asset_class)}
+    previous = state.get(asset_class, {})
+    if previous == source:
+        return 0
+
+    fresh = valued_rows(per_symbol_csv).sort_values(['Date', 'Symbol'])
+    if fresh.empty:
+        return 0
+    first_fresh = fresh['Date'].min()
+    stored = _read_stored(history_path(asset_class, cube_dir))
+    stored_cube = _read_stored(cube_path(asset_class, cube_dir))
+    history = fresh if stored is None else pd.concat([stored[stored['Date'] < first_fresh], fresh],
+                                                     ignore_index=True)
+
+    if previous.get('metadata') == source['metadata'] and stored_cube is not None:
+        changed = changed_dates(fresh, stored)
+        # Stored days before the output, and its days that did not change, are kept
+        keep = (stored_cube['Date'] < first_fresh) | (stored_cube['Date'].isin(fresh['Date'])
+                                                      & ~stored_cube['Date'].isin(changed))
+        cube = pd.concat([stored_cube[keep], rollup(fresh[fresh['Date'].isin(changed)], metadata, asset_class)],
+                         ignore_index=True).sort_values(['Date'] + BUCKETS)
+        dates = len(changed)
+    else:
+        cube = rollup(history, metadata, asset_class).sort_values(['Date'] + BUCKETS)
+        dates = history['Date'].nunique()
+
+    os.makedirs(cube_dir, exist_ok=True)
+    atomic_write(lambda tmp: history.to_csv(tmp, index=False, date_format='%Y-%m-%d'),
+                 history_path(asset_class, cube_dir))
+    atomic_write(lambda tmp: cube.to_csv(tmp, index=False, date_format='%Y-%m-%d'), cube_path(asset_class, cube_dir))
+    state[asset_class] = source
+    atomic_write(lambda tmp: _dump_json(state, tmp), state_path)
+    return dates
+
+
+# ------------------------------
+# QUERIES
+# ------------------------------
+class ExposureCube:
+    """Dates x buckets value matrix across asset classes, loaded from the stored cubes."""
+
+    def __init__(self, cube_dir=CUBE_DIR):
+        frames = [pd.read_csv(cube_path(a, cube_dir), parse_dates=['Date'])
+                  for a in ASSET_CLASSES if os.path.exists(cube_path(a, cube_dir))]
+        if not frames:
+            raise FileNotFoundError(f"No exposure cubes in {cube_dir}; run exposure.py first")
+        # A bucket missing on one of its asset class's own dates is worth 0 that day; asset
+        # classes value on different calendars, so each is carried onto the others' dates
+        wides = [f.pivot_table(index='Date', columns=BUCKETS, values='Value', aggfunc='sum').fillna(0.0)
+                 for f in frames]
+        dates = pd.DatetimeIndex(sorted(set().union(*(w.index for w in wides))))
+        wide = pd.concat([w.reindex(dates, method='ffill') for w in wides], axis=1).fillna(0.0)
+        self.dates = wide.index
+        self.buckets = wide.columns
+        self.values = wide.to_numpy(float)
+
+    def slice(self, start=None, end=None, by=('Sector',)):
+        """Daily value for dates in [start, end], summed to the `by` bucket levels."""
+        lo = self.dates.searchsorted(pd.Timestamp(start)) if start is not None else 0
+        hi = self.dates.searchsorted(pd.Timestamp(end), side='right') if end is not None else len(self.dates)
+        frame = pd.DataFrame(self.values[lo:hi], index=self.dates[lo:hi], columns=self.buckets)
+        return frame.T.groupby(level=list(by)).sum().T
+
+    def weights(self, as_of=None, by=('Sector',)):
+        """Exposure (% of total value) on the last date at or before `as_of`."""
+        row = self.dates.searchsorted(pd.Timestamp(as_of), side='right') - 1 if as_of is not None else len(self.dates) - 1
+        values = pd.Series(self.values[max(row, 0)], index=self.buckets).groupby(level=list(by)).sum()
+        total = values.sum()
+        return (values / total * 100 if total else values).sort_values(ascending=False)
+
+
+def refresh(cube_dir=CUBE_DIR, metadata_csv=METADATA_CSV):
+    """Updates metadata and every asset class's cube from the latest published valuations."""
+    paths = {a: latest_path(a, 'per_symbol_values') for a in ASSET_CLASSES}
+    paths = {a: p for a, p in paths.items() if p is not None}
+    metadata = build_metadata(paths, metadata_csv)
+    for asset_class, path in paths.items():
+        dates = update_cube(asset_class, path, metadata, cube_dir)
+        print(f"  -> {asset_class}: {dates} dates re-aggregated" if dates else f"  -> {asset_class}: up to date")
+
+
+def _dump_json(data, path):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sector / market-cap exposure from the valuation outputs.")
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--by', default='Sector', help="Comma-separated: Asset Class, Sector, Market Cap")
+    args = parser.parse_args()
+
+    refresh()
+    cube = ExposureCube()
+    by = [b.strip() for b in args.by.split(',')]
+    window = cube.slice(args.start, args.end, by)
+    print(f"\nExposure by {', '.join(by)} as of {window.index.max().date()} (% of value):")
+    print(cube.weights(args.end, by).round(2).to_string())
+    print(f"\nAverage daily value {window.index.min().date()} to {window.index.max().date()}:")
+    print(window.mean().sort_values(ascending=False).round(2).to_string())
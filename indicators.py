@@ -0,0 +1,83 @@
+'''
+Indicator kernels over dates x symbols arrays
+
+Each kernel takes a 2-D float array (one column per symbol) and computes the
+indicator for every symbol in one call. Columns may start with NaN (history
+shorter than the panel); pack_valid() moves each column's observations to the
+bottom first, so gaps from aligning different calendars do not change the
+result compared with computing on the symbol's own rows.
+'''
+
+import numpy as np
+
+
+def pack_valid(values):
+    """
+    Moves each column's non-NaN values to the end of the column, keeping their
+    order. Returns (packed, rows) where rows[i, j] is the source row of packed[i, j].
+    """
+    values = np.asarray(values, float)
+    rows = np.argsort(~np.isnan(values), axis=0, kind='stable')
+    return np.take_along_axis(values, rows, axis=0), rows
+
+
+def ema(values, span):
+    """Exponential moving average, like pandas ewm(span=span, adjust=False).mean()."""
+    values = np.asarray(values, float)
+    alpha = 2.0 / (span + 1)
+    out = np.full_like(values, np.nan)
+    prev = np.full(values.shape[1:], np.nan)
+    for t in range(len(values)):
+        x = values[t]
+        step = np.where(np.isnan(prev), x, alpha * x + (1 - alpha) * prev)
+        prev = np.where(np.isnan(x), prev, step)
+        out[t] = prev
+    return np.where(np.isnan(values), np.nan, out)
+
+
+def sma(values, window):
+    """Rolling mean, NaN until `window` non-NaN values are in the window (min_periods=window)."""
+    values = np.asarray(values, float)
+    valid = ~np.isnan(values)
+    sums = np.cumsum(np.where(valid, values, 0.0), axis=0)
+    counts = np.cumsum(valid, axis=0)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts[window:] = counts[window:] - counts[:-window]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts >= window, sums / window, np.nan)
+
+
+def rsi(values, period):
+    """RSI from simple rolling averages of gains and losses, as strategy-sell has always computed it."""
+    values = np.asarray(values, float)
+    valid = ~np.isnan(values)
+    delta = np.diff(values, axis=0, prepend=np.nan)
+    # A symbol's first row has no change; it counts as a zero gain and loss
+    gain = np.where(valid, np.where(delta > 0, delta, 0.0), np.nan)
+    loss = np.where(valid, np.where(delta < 0, -delta, 0.0), np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 100 - 100 / (1 + sma(gain, period) / sma(loss, period))
+
+
+def crossovers(values, line):
+    """True where values cross above line: previous value <= line, current value > line."""
+    values, line = np.asarray(values, float), np.asarray(line, float)
+    crossed = np.zeros(values.shape, bool)
+    with np.errstate(invalid='ignore'):
+        crossed[1:] = (values[:-1] <= line[:-1]) & (values[1:] > line[1:])
+    return crossed
+
+
+def last_true(mask):
+    """Row of the last True in each column, -1 where there is none."""
+    mask = np.asarray(mask, bool)
+    last = len(mask) - 1 - np.argmax(mask[::-1], axis=0)
+    return np.where(mask.any(axis=0), last, -1)
+
+
+def max_since(values, start_rows):
+    """Max of each column from its start row to the end; NaN where start_rows is -1."""
+    values = np.asarray(values, float)
+    after = np.arange(len(values))[:, None] >= np.asarray(start_rows)[None, :]
+    highs = np.where(after, values, -np.inf).max(axis=0, initial=-np.inf)
+    return np.where(np.asarray(start_rows) >= 0, highs, np.nan)
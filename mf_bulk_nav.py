@@ -0,0 +1,191 @@
+'''
+Bulk mutual-fund NAV ingestion
+
+AMFI publishes every scheme's NAV in one semicolon-separated text file
+(NAVAll.txt). This reads that file line by line, keeps only the schemes in
+data/mf-scheme-map.csv and appends new NAVs to data/mf-nav-history.csv,
+which the 'amfi' price provider serves to equity-mf.py. One file read
+replaces a yfinance call per fund.
+
+    python mf_bulk_nav.py                       # today's NAVAll.txt from AMFI
+    python mf_bulk_nav.py --file NAVAll.txt     # a local copy
+    python mf_bulk_nav.py --backfill 2022-01-01 # AMFI NAV history reports
+    python mf_bulk_nav.py --match               # fill missing scheme codes by name
+
+The scheme map ships with names only; until --match (or a hand edit) fills
+its Scheme Code column, equity-mf.py falls back to yfinance for every fund.
+'''
+
+import argparse
+import csv
+import os
+import re
+from datetime import datetime, timedelta
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+SCHEME_MAP_CSV = os.path.join(DATA_DIR, 'mf-scheme-map.csv')
+NAV_HISTORY_CSV = os.path.join(DATA_DIR, 'mf-nav-history.csv')
+NAVALL_URL = 'https://www.amfiindia.com/spages/NAVAll.txt'
+NAV_HISTORY_URL = 'https://portal.amfiindia.com/DownloadNAVHistoryReport_Po.aspx?frmdt={start}&todt={end}'
+BACKFILL_CHUNK_DAYS = 90
+
+# Abbreviations used in the README's fund names
+ABBREVIATIONS = {
+    'bsl': 'birla sun life', 'pru': 'prudential', 'dir': 'direct', 'gr': 'growth', 'fd': 'fund',
+    'opps': 'opportunities', 'opp': 'opportunities', 'eq': 'equity', 'ind': 'india', 'frank': 'franklin',
+    'bns': 'bonus', 'sec': 'securities',
+}
+NOISE_WORDS = {'fund', 'plan', 'option', 'scheme', 'the', 'of', 'formerly', 'known', 'as'}
+
+
+def parse_nav_lines(lines, scheme_codes=None):
+    """
+    Streams (scheme code, scheme name, date, NAV) from AMFI's semicolon format.
+    Column positions come from the header line, so both NAVAll.txt and the NAV
+    history report parse. Section titles, blank lines and "N.A." NAVs are skipped;
+    rows for schemes outside `scheme_codes` are dropped before being split.
+    """
+    columns = None
+    for line in lines:
+        line = line.strip()
+        if ';' not in line:
+            continue
+        if columns is None:
+            header = [c.strip() for c in line.split(';')]
+            columns = (header.index('Scheme Code'), header.index('Scheme Name'),
+                       header.index('Net Asset Value'), header.index('Date'))
+            continue
+        if scheme_codes is not None and line.split(';', 1)[0] not in scheme_codes:
+            continue
+        fields = line.split(';')
+        code_idx, name_idx, nav_idx, date_idx = columns
+        try:
+            nav = float(fields[nav_idx])
+            nav_date = datetime.strptime(fields[date_idx].strip(), '%d-%b-%Y').date()
+        except (ValueError, IndexError):
+            continue
+        yield fields[code_idx], fields[name_idx].strip(), nav_date, nav
+
+
+def read_lines(source):
+    """Lines of a local file, or of a URL streamed with requests."""
+    if not source.startswith(('http://', 'https://')):
+        with open(source, encoding='utf-8', errors='replace') as f:
+            yield from f
+        return
+
+    import requests
+
+    with requests.get(source, stream=True, timeout=120) as response:
+        response.raise_for_status()
+        response.encoding = response.encoding or 'utf-8'
+        yield from response.iter_lines(decode_unicode=True)
+
+
+def load_scheme_map(map_csv=SCHEME_MAP_CSV):
+    """{symbol: AMFI scheme code} for the mapped schemes."""
+    with open(map_csv, newline='', encoding='utf-8-sig') as f:
+        return {r['Symbol']: r['Scheme Code'] for r in csv.DictReader(f) if r['Scheme Code']}
+
+
+def last_nav_dates(history_csv=NAV_HISTORY_CSV):
+    """{scheme code: latest stored date} from one pass over the history file."""
+    latest = {}
+    if os.path.exists(history_csv):
+        with open(history_csv, newline='') as f:
+            for row in csv.DictReader(f):
+                latest[row['Scheme Code']] = max(latest.get(row['Scheme Code'], ''), row['Date'])
+    return latest
+
+
+def append_nav_history(navs, history_csv=NAV_HISTORY_CSV):
+    """Appends (code, name, date, NAV) rows newer than what is stored for each scheme."""
+    latest = last_nav_dates(history_csv)
+    navs = sorted(navs, key=lambda r: (r[0], r[2]))   # read fully first, so a failed download writes nothing
+    new_file = not os.path.exists(history_csv)
+    added = 0
+    with open(history_csv, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(['Scheme Code', 'Date', 'NAV'])
+        for code, _, nav_date, nav in navs:
+            if nav_date.isoformat() > latest.get(code, ''):
+                writer.writerow([code, nav_date.isoformat(), nav])
+                latest[code] = nav_date.isoformat()
+                added += 1
+    return added
+
+
+def ingest(source=NAVALL_URL, map_csv=SCHEME_MAP_CSV, history_csv=NAV_HISTORY_CSV):
+    codes = set(load_scheme_map(map_csv).values())
+    added = append_nav_history(parse_nav_lines(read_lines(source), codes), history_csv)
+    print(f"✅ {added} new NAVs for {len(codes)} schemes appended to {history_csv}")
+    return added
+
+
+def backfill(start_date, end_date=None, map_csv=SCHEME_MAP_CSV, history_csv=NAV_HISTORY_CSV):
+    """
+    Loads AMFI's NAV history reports in BACKFILL_CHUNK_DAYS windows. Rows are
+    appended per scheme in date order, so backfill into an empty history first.
+    """
+    start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else datetime.today().date()
+    codes = set(load_scheme_map(map_csv).values())
+    while start <= end:
+        chunk_end = min(start + timedelta(days=BACKFILL_CHUNK_DAYS - 1), end)
+        url = NAV_HISTORY_URL.format(start=start.strftime('%d-%b-%Y'), end=chunk_end.strftime('%d-%b-%Y'))
+        added = append_nav_history(parse_nav_lines(read_lines(url), codes), history_csv)
+        print(f"  -> {start} to {chunk_end}: {added} NAVs")
+        start = chunk_end + timedelta(days=1)
+
+
+# ------------------------------
+# SCHEME CODE MATCHING
+# ------------------------------
+def name_tokens(name):
+    name = re.sub(r'\b(mid|small|large|multi|flexi)[ -]cap\b', r'\1cap', name.lower())
+    words = re.sub(r'[^a-z0-9& ]', ' ', name).split()
+    words = ' '.join(ABBREVIATIONS.get(w, w) for w in words).split()
+    return frozenset(w for w in words if w not in NOISE_WORDS)
+
+
+def match_scheme_codes(source=NAVALL_URL, map_csv=SCHEME_MAP_CSV):
+    """
+    Fills blank Scheme Code entries in the map with the AMFI scheme whose name
+    contains every word of the map's name and the fewest others. Matches are
+    printed so they can be checked; edit the CSV to correct one.
+    """
+    with open(map_csv, newline='', encoding='utf-8-sig') as f:
+        rows = list(csv.DictReader(f))
+    schemes = [(code, name, name_tokens(name)) for code, name, _, _ in parse_nav_lines(read_lines(source))]
+
+    for row in rows:
+        if row['Scheme Code']:
+            continue
+        wanted = name_tokens(row['Scheme Name'])
+        candidates = [(len(tokens - wanted), code, name) for code, name, tokens in schemes if wanted <= tokens]
+        if not candidates:
+            print(f"❌ No AMFI scheme found for {row['Symbol']} ({row['Scheme Name']})")
+            continue
+        _, row['Scheme Code'], amfi_name = min(candidates)
+        print(f"  -> {row['Symbol']} ({row['Scheme Name']}) -> {row['Scheme Code']} {amfi_name}")
+
+    with open(map_csv, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['Symbol', 'Scheme Name', 'Scheme Code'])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest AMFI bulk NAV files into the local NAV history.")
+    parser.add_argument('--file', default=NAVALL_URL, help="NAVAll.txt path or URL (default: AMFI)")
+    parser.add_argument('--backfill', metavar='YYYY-MM-DD', help="Load NAV history reports from this date")
+    parser.add_argument('--match', action='store_true', help="Fill missing scheme codes in the map by name")
+    args = parser.parse_args()
+
+    if args.match:
+        match_scheme_codes(args.file)
+    elif args.backfill:
+        backfill(args.backfill)
+    else:
+        ingest(args.file)
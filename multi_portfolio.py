@@ -0,0 +1,253 @@
+'''
+Valuation of several family accounts against one shared price fetch
+
+Each account is a directory holding any of the usual ledgers (ind-stocks.csv,
+us-stocks.csv, ind-mf.csv, nps.csv). The symbols of all accounts are pooled
+per asset class and every symbol is fetched once; holdings are stacked into
+an accounts x dates x symbols array and valued against the shared dates x
+symbols price matrix in one step. Outputs are published per account under
+data/outputs/accounts/<account>/ and for the household under
+data/outputs/household/, with the same artifacts as the single-account scripts.
+
+    python multi_portfolio.py data/accounts/self data/accounts/spouse data/accounts/parents
+'''
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from mf_bulk_nav import NAV_HISTORY_CSV, SCHEME_MAP_CSV
+from corporate_actions import to_traded_prices
+from nav_store import get_nav_series
+from nps import NAV_PROVIDER, SCHEME_TO_CODE
+from output_manager import OUTPUT_ROOT, OutputManager
+from price_cache import CachedProvider
+from price_providers import BulkNavProvider, ManualCsvProvider, ProviderChain, YahooProvider
+from trading_calendar import valuation_dates
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+ACCOUNTS_ROOT = os.path.join(OUTPUT_ROOT, 'accounts')
+HOUSEHOLD_ROOT = os.path.join(OUTPUT_ROOT, 'household')
+HOUSEHOLD = 'Household'
+LEDGERS = {'ind-stocks': 'ind-stocks.csv', 'us-stocks': 'us-stocks.csv', 'ind-mf': 'ind-mf.csv', 'nps': 'nps.csv'}
+EXCHANGES = {'ind-stocks': 'NSE', 'us-stocks': 'NYSE', 'ind-mf': 'NSE', 'nps': 'NSE'}
+USDINR = 'INR=X'
+
+
+# ------------------------------
+# LEDGERS
+# ------------------------------
+def read_ledger(path, asset_class):
+    """(Symbol, Transaction Date, Total Shares) holdings after each trade day, as the equity scripts read them."""
+    if asset_class == 'nps':
+        ledger = pd.read_csv(path, usecols=['Date', 'Scheme', 'Units'])
+        ledger = ledger.rename(columns={'Date': 'Transaction Date', 'Scheme': 'Symbol', 'Units': 'Total Shares'})
+        ledger['Transaction Date'] = pd.to_datetime(ledger['Transaction Date'].str.strip(), dayfirst=True)
+        # nps.py sums units booked on the same day
+        return ledger.groupby(['Symbol', 'Transaction Date'], as_index=False)['Total Shares'].sum()
+
+    ledger = pd.read_csv(path, encoding='utf-8-sig')
+    ledger['Symbol'] = ledger['Symbol'].astype(str)
+    ledger['Transaction Date'] = pd.to_datetime(ledger['Transaction Date'], dayfirst=True)
+    # Keep the last row per symbol and day, in file order
+    return (ledger.reset_index()
+            .sort_values(['Symbol', 'Transaction Date', 'index'], kind='mergesort')
+            .drop_duplicates(['Symbol', 'Transaction Date'], keep='last')
+            .drop(columns='index'))
+
+
+def load_accounts(account_dirs):
+    """{account: {asset class: ledger}} for every ledger found in each account directory."""
+    accounts = {}
+    for account_dir in account_dirs:
+        account = os.path.basename(os.path.normpath(account_dir))
+        accounts[account] = {asset_class: read_ledger(os.path.join(account_dir, file_name), asset_class)
+                             for asset_class, file_name in LEDGERS.items()
+                             if os.path.exists(os.path.join(account_dir, file_name))}
+    return accounts
+
+
+# ------------------------------
+# SHARED PRICE FETCH
+# ------------------------------
+def build_price_chains(manual_data_dir=DATA_DIR):
+    """Provider chains per asset class, in the same fallback order as the single-account scripts."""
+    return {
+        'ind-stocks': ProviderChain([CachedProvider('NSE'), YahooProvider(suffixes=('.NS', '.BO')),
+                                     ManualCsvProvider(manual_data_dir)],
+                                    order=['cache', 'yfinance', 'manual']),
+        'us-stocks': ProviderChain([CachedProvider('NYSE', kind='prices-us'), YahooProvider(suffixes=('',))],
+                                   order=['cache', 'yfinance']),
+        'ind-mf': ProviderChain([CachedProvider('NSE'), BulkNavProvider(NAV_HISTORY_CSV, SCHEME_MAP_CSV),
+                                 YahooProvider(suffixes=('',), auto_adjust=True)],
+                                order=['cache', 'amfi', 'yfinance']),
+    }
+
+
+def fetch_histories(asset_class, symbols, start_date, end_date, price_chains):
+    """{symbol: price Series (date index)} for the pooled symbols of one asset class, fetched once each."""
+    if asset_class == 'nps':
+        known = [s for s in symbols if s in SCHEME_TO_CODE]
+        with ThreadPoolExecutor(max_workers=NAV_PROVIDER.max_concurrency) as executor:
+            futures = {s: executor.submit(get_nav_series, SCHEME_TO_CODE[s], NAV_PROVIDER) for s in known}
+            return {s: f.result() for s, f in futures.items() if f.result() is not None}
+
+    histories = price_chains[asset_class].history_many(symbols, start_date, end_date)
+    if asset_class == 'ind-stocks':
+        # Share counts are as held on each day, like equity-ind.py's
+        histories = to_traded_prices(histories, start_date)
+    return {s: df.set_index('Transaction Date')['Price'] for s, df in histories.items()
+            if df is not None and not df.empty}
+
+
+def price_matrix(histories, symbols, dates):
+    """Dates x symbols prices; the last price on or before each date carries forward."""
+    prices = pd.DataFrame({s: histories[s][~histories[s].index.duplicated(keep='last')] for s in symbols})
+    prices = prices.reindex(prices.index.union(dates)).sort_index().ffill()
+    return prices.reindex(dates).to_numpy(float)
+
+
+# ------------------------------
+# BATCHED VALUATION
+# ------------------------------
+def holdings_tensor(ledgers, symbols, dates, per_day_units=False):
+    """
+    Accounts x dates x symbols shares held, and a mask of the cells on or after
+    each account's first trade in the symbol (the rows a single-account run writes).
+    per_day_units follows nps.py: a day's units table has 0 for schemes not traded that day.
+    """
+    shares = np.zeros((len(ledgers), len(dates), len(symbols)))
+    started = np.zeros(shares.shape, bool)
+    for i, ledger in enumerate(ledgers):
+        if ledger is None:
+            continue
+        table = ledger.pivot(index='Transaction Date', columns='Symbol', values='Total Shares').reindex(columns=symbols)
+        held = table.fillna(0) if per_day_units else table.ffill()
+        started[i] = table.notna().cummax().reindex(dates, method='ffill').fillna(False).to_numpy(bool)
+        shares[i] = held.reindex(dates, method='ffill').fillna(0).to_numpy()
+    return shares, started
+
+
+def value_asset_class(asset_class, ledgers, price_chains, valuation_mode='business', end_date=None):
+    """
+    Values one asset class for every account at once. Returns (symbols, dates,
+    shares, started, prices, fx), where fx is the USD/INR rate per date for
+    us-stocks and None otherwise; values in INR are shares * (prices * fx).
+    """
+    end_date = end_date or datetime.today()
+    present = [ledger for ledger in ledgers if ledger is not None]
+    pooled = pd.concat(present, ignore_index=True)
+    symbols = list(pooled['Symbol'].unique())
+    start_date = pooled['Transaction Date'].min() - timedelta(days=1)
+    fetch = symbols + [USDINR] if asset_class == 'us-stocks' else symbols
+
+    histories = fetch_histories(asset_class, fetch, start_date, end_date, price_chains)
+    fx = histories.pop(USDINR, None)
+    missing = [s for s in symbols if s not in histories]
+    if missing:
+        print(f"⚠️ {asset_class}: no prices for {', '.join(missing)}, skipped in every account.")
+    symbols = [s for s in symbols if s in histories]
+
+    dates = valuation_dates(pooled['Transaction Date'].min(), end_date, EXCHANGES[asset_class], valuation_mode)
+    prices = price_matrix(histories, symbols, dates)
+    if asset_class == 'us-stocks':
+        fx = price_matrix({USDINR: fx}, [USDINR], dates)[:, 0] if fx is not None else np.full(len(dates), np.nan)
+    shares, started = holdings_tensor(ledgers, symbols, dates, per_day_units=asset_class == 'nps')
+    return symbols, dates, shares, started, prices, fx
+
+
+def per_symbol_frame(symbols, dates, shares, started, prices, fx):
+    """Long per-symbol daily values in the single-account column layout, for one account's slice."""
+    rows, cols = np.nonzero(started)
+    frame = pd.DataFrame({'Symbol': np.asarray(symbols, object)[cols], 'Transaction Date': dates[rows],
+                          'Total Shares': shares[rows, cols], 'Price': prices[rows, cols]})
+    if fx is None:
+        frame['Total value'] = frame['Total Shares'] * frame['Price']
+        return frame.sort_values(['Symbol', 'Transaction Date'], kind='mergesort').reset_index(drop=True)
+    frame['USDINR'] = fx[rows]
+    frame['Total value (USD)'] = frame['Total Shares'] * frame['Price']
+    frame['Total value (INR)'] = frame['Total value (USD)'] * frame['USDINR']
+    return frame.sort_values(['Symbol', 'Transaction Date'], kind='mergesort').reset_index(drop=True)
+
+
+def last_day_frame(per_symbol):
+    last = per_symbol.groupby('Symbol', sort=False).tail(1)
+    if 'USDINR' in last.columns:
+        last = last[['Symbol', 'Transaction Date', 'Price', 'USDINR', 'Total Shares',
+                     'Total value (USD)', 'Total value (INR)']]
+        last.columns = ['Symbol', 'As of Date', 'Last Price (USD)', 'USD/INR Rate', 'Total Shares',
+                        'Total Value (USD)', 'Total Value (INR)']
+        return last
+    last = last[['Symbol', 'Transaction Date', 'Price', 'Total Shares', 'Total value']]
+    last.columns = ['Symbol', 'As of Date', 'Last Price', 'Total Shares', 'Total Value']
+    return last
+
+
+def publish(asset_class, per_symbol, totals, output_root):
+    value_col = 'Portfolio Value (INR)' if 'USDINR' in per_symbol.columns else 'Portfolio Value'
+    portfolio_value = totals.rename(value_col).rename_axis('Transaction Date').reset_index()
+    outputs = OutputManager(asset_class, output_root=output_root)
+    outputs.write_csv(per_symbol, 'per_symbol_values')
+    outputs.write_csv(portfolio_value, 'portfolio_values')
+    outputs.write_csv(last_day_frame(per_symbol), 'last_day_values')
+    outputs.commit()
+
+
+def value_accounts(accounts, valuation_mode='business', price_chains=None, end_date=None,
+                   accounts_root=ACCOUNTS_ROOT, household_root=HOUSEHOLD_ROOT):
+    """
+    Values every account's ledgers and publishes per-account and household
+    outputs. Returns the dates x accounts total value (INR) with a Household column.
+    """
+    price_chains = price_chains or build_price_chains()
+    names = list(accounts)
+    totals = []
+    for asset_class in LEDGERS:
+        ledgers = [accounts[name].get(asset_class) for name in names]
+        if all(ledger is None for ledger in ledgers):
+            continue
+        symbols, dates, shares, started, prices, fx = value_asset_class(
+            asset_class, ledgers, price_chains, valuation_mode, end_date)
+        inr_prices = prices * fx[:, None] if fx is not None else prices
+        # One contraction values every account on every date; held-but-unpriced days stay out as 0
+        by_account = np.einsum('ads,ds->da', shares, np.nan_to_num(inr_prices))
+        print(f"✅ {asset_class}: {len(symbols)} unique symbols valued for {len(names)} accounts "
+              f"over {len(dates)} dates")
+
+        for i, name in enumerate(names):
+            if ledgers[i] is None:
+                continue
+            per_symbol = per_symbol_frame(symbols, dates, shares[i], started[i], prices, fx)
+            account_dates = started[i].any(axis=1)
+            publish(asset_class, per_symbol, pd.Series(by_account[account_dates, i], index=dates[account_dates]),
+                    os.path.join(accounts_root, name))
+
+        household = per_symbol_frame(symbols, dates, shares.sum(axis=0), started.any(axis=0), prices, fx)
+        publish(asset_class, household, pd.Series(by_account.sum(axis=1), index=dates), household_root)
+        totals.append(pd.DataFrame(by_account, index=dates, columns=names))
+
+    # Asset classes value on different calendars; each carries onto the others' dates
+    all_dates = pd.DatetimeIndex(sorted(set().union(*(t.index for t in totals))))
+    total = sum(t.reindex(all_dates, method='ffill').fillna(0.0) for t in totals)
+    total[HOUSEHOLD] = total.sum(axis=1)
+
+    outputs = OutputManager('total', output_root=household_root)
+    print(f"✅ Account and household totals saved to "
+          f"{outputs.write_csv(total.rename_axis('Transaction Date'), 'portfolio_values', index=True)}")
+    outputs.commit()
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Value several accounts against one shared price fetch.")
+    parser.add_argument('accounts', nargs='+', help="Account directories holding the ledger CSVs")
+    parser.add_argument('--mode', default='business', choices=['business', 'calendar'])
+    args = parser.parse_args()
+
+    total = value_accounts(load_accounts(args.accounts), args.mode)
+    print(f"\nLatest values ({total.index[-1].date()}):")
+    print(total.iloc[-1].round(2).to_string())
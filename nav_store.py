@@ -0,0 +1,98 @@
+'''
+Local NAV store for NPS schemes
+
+One CSV per scheme code under data/nav-store/ holding date,nav. A refresh
+only asks npsnav.in for what is missing since the last stored date and
+appends those rows; when the store is already current no request is made.
+'''
+
+import os
+from datetime import date, timedelta
+
+import pandas as pd
+
+from price_providers import NpsNavProvider
+from trading_calendar import trading_days
+
+NAV_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'nav-store')
+
+
+def store_path(scheme_code, store_dir=NAV_STORE_DIR):
+    return os.path.join(store_dir, f"{scheme_code}.csv")
+
+
+def load_nav_store(scheme_code, store_dir=NAV_STORE_DIR):
+    """NAV series (date index) held on disk for a scheme, or None if nothing is stored yet."""
+    path = store_path(scheme_code, store_dir)
+    if not os.path.exists(path):
+        return None
+    navs = pd.read_csv(path, parse_dates=['date'])
+    if navs.empty:
+        return None
+    return navs.set_index('date')['nav'].sort_index()
+
+
+def expected_latest_nav_date(today=None):
+    """NAVs are published after the close, so the newest NAV to expect is the previous trading day's."""
+    today = today or date.today()
+    days = trading_days(today - timedelta(days=15), today - timedelta(days=1), 'NSE')
+    return days[-1]
+
+
+def _append(scheme_code, new_navs, store_dir):
+    os.makedirs(store_dir, exist_ok=True)
+    path = store_path(scheme_code, store_dir)
+    new_navs = new_navs.rename('nav').rename_axis('date').reset_index()
+    new_navs['date'] = new_navs['date'].dt.strftime('%Y-%m-%d')
+    new_navs.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+
+def refresh_nav_store(scheme_code, provider=None, store_dir=NAV_STORE_DIR, offline=False):
+    """
+    Brings the store for one scheme up to date and returns the number of NAVs added.
+    A gap of up to two trading days uses the latest-NAV endpoint, and returns 0
+    while the missing NAV is not yet published; longer gaps pull the history
+    and keep only the records newer than the last stored date.
+    """
+    held = load_nav_store(scheme_code, store_dir)
+    last_held = held.index.max() if held is not None else None
+    expected = expected_latest_nav_date()
+
+    if offline or (last_held is not None and last_held >= expected):
+        return 0
+
+    provider = provider or NpsNavProvider()
+    new_navs = None
+    missing = trading_days(last_held + timedelta(days=1), expected, 'NSE') if last_held is not None else None
+    if missing is not None and len(missing) <= 2:
+        latest = provider.latest(scheme_code)
+        if latest is None or latest.index.max() <= last_held:
+            return 0   # not published yet; a later run picks it up
+        if latest.index.max() <= missing[0]:
+            new_navs = latest
+        # else the latest NAV would skip a day, so the history fills both
+
+    if new_navs is None:
+        history = provider.fetch(scheme_code, None, None)
+        if history is None or history.empty:
+            return 0
+        new_navs = history.set_index('Transaction Date')['Price']
+
+    if last_held is not None:
+        new_navs = new_navs[new_navs.index > last_held]
+    if new_navs.empty:
+        return 0
+
+    _append(scheme_code, new_navs.sort_index(), store_dir)
+    return len(new_navs)
+
+
+def get_nav_series(scheme_code, provider=None, store_dir=NAV_STORE_DIR, offline=False):
+    """The nav_series used for valuation, refreshed if needed and read straight from disk."""
+    try:
+        added = refresh_nav_store(scheme_code, provider, store_dir, offline)
+        if added:
+            print(f"  -> Added {added} new NAV records for {scheme_code}.")
+    except Exception as e:
+        print(f"  -> Could not refresh NAVs for {scheme_code}, using local store: {e}")
+    return load_nav_store(scheme_code, store_dir)
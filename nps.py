@@ -1,10 +1,16 @@
 import pandas as pd
-import requests
 from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from trading_calendar import valuation_dates, expand_to_calendar_days
+from price_providers import NpsNavProvider
+from nav_store import get_nav_series
 
 # --- Configuration ---
 CSV_FILE_PATH = '/Users/in22417145/PycharmProjects/portfolio/data/nps.csv'
 OUTPUT_CSV_FILE = '/Users/in22417145/PycharmProjects/portfolio/data/nps-total.csv'
+VALUATION_MODE = 'business'     # 'business' = NSE trading days only, 'calendar' = every day
+EXPAND_CALENDAR_DAYS = False    # Forward-fill the report onto every calendar day before saving
+OFFLINE = False                 # Value from the local NAV store only, without any request
 
 SCHEME_TO_CODE = {
     "SBI PENSION FUND SCHEME E - TIER I Units": "SM001003",
@@ -20,32 +26,18 @@ SCHEME_TO_CODE = {
     "LIC PENSION FUND SCHEME G - TIER I Units": "SM003007"
 }
 
-def get_historical_navs(scheme_code, scheme_name):
-    api_url = f"https://npsnav.in/api/historical/{scheme_code}"
-    print(f"Fetching full NAV history for '{scheme_name}'...")
-    try:
-        response = requests.get(api_url)
-        response.raise_for_status()
-        data = response.json().get('data', [])
-        if not data:
-            print(f"  -> No historical data found for {scheme_name}.")
-            return None
-        
-        nav_df = pd.DataFrame(data)
-        nav_df['date'] = pd.to_datetime(nav_df['date'], format='%d-%m-%Y')
-        nav_df['nav'] = pd.to_numeric(nav_df['nav'])
-        nav_df = nav_df.set_index('date')['nav'].sort_index()
-        
-        print(f"  -> Success! Fetched {len(nav_df)} NAV records.")
-        return nav_df
-        
-    except requests.exceptions.RequestException as e:
-        print(f"  -> API Error for {scheme_name}: {e}")
-        return None
-    except (ValueError, KeyError) as e:
-        print(f"  -> Data Parsing Error for {scheme_name}: {e}")
+NAV_PROVIDER = NpsNavProvider()
+
+def get_historical_navs(scheme_code, scheme_name, provider=NAV_PROVIDER):
+    print(f"Loading NAV history for '{scheme_name}'...")
+    nav_df = get_nav_series(scheme_code, provider, offline=OFFLINE)
+    if nav_df is None or nav_df.empty:
+        print(f"  -> No historical data found for {scheme_name}.")
         return None
 
+    print(f"  -> {len(nav_df)} NAV records up to {nav_df.index.max().date()}.")
+    return nav_df
+
 if __name__ == "__main__":
     try:
         # 1. Load and prepare transaction data
@@ -56,16 +48,21 @@ if __name__ == "__main__":
         print("  -> Data loaded and sorted by date.")
 
         # 2. Fetch all historical NAVs for schemes present in the transaction file
-        print("\nStep 2: Fetching all required NAV histories...")
+        print("\nStep 2: Refreshing the local NAV store for all required schemes...")
         unique_schemes_in_csv = transactions_df['Scheme'].unique()
-        all_nav_data = {}
+        known_schemes = []
         for scheme_name in unique_schemes_in_csv:
-            scheme_code = SCHEME_TO_CODE.get(scheme_name)
-            if scheme_code:
-                all_nav_data[scheme_name] = get_historical_navs(scheme_code, scheme_name)
+            if scheme_name in SCHEME_TO_CODE:
+                known_schemes.append(scheme_name)
             else:
                 print(f"  -> Warning: Scheme code not found for '{scheme_name}'. It will be skipped.")
 
+        # Fetch the schemes in parallel, bounded by the provider's concurrency limit
+        with ThreadPoolExecutor(max_workers=NAV_PROVIDER.max_concurrency) as executor:
+            futures = {name: executor.submit(get_historical_navs, SCHEME_TO_CODE[name], name)
+                       for name in known_schemes}
+            all_nav_data = {name: future.result() for name, future in futures.items()}
+
         # 3. Create pivot table of actual units (without cumulative sum)
         print("\nStep 3: Creating units table (without cumulative sum)...")
         daily_units = transactions_df.pivot_table(
@@ -73,14 +70,14 @@ if __name__ == "__main__":
         ).fillna(0)
         print("  -> Units table created.")
 
-        # 4. Create a complete date range and forward-fill the units
+        # 4. Create the valuation date range and forward-fill the units
         start_date = daily_units.index.min()
         end_date = date.today()
-        full_date_range = pd.date_range(start=start_date, end=end_date, freq='D')
+        full_date_range = valuation_dates(start_date, end_date, 'NSE', VALUATION_MODE)
         
-        # Reindex to the full date range and forward-fill the units
-        daily_units_held = daily_units.reindex(full_date_range).ffill().fillna(0)
-        print("  -> Created full date range with forward-filled units.")
+        # Reindex to the valuation dates, carrying units bought on non-trading days forward
+        daily_units_held = daily_units.reindex(full_date_range, method='ffill').fillna(0)
+        print(f"  -> Created {VALUATION_MODE} date range with forward-filled units.")
 
         # 5. Calculate portfolio value with detailed breakdown
         print("\nStep 4: Calculating portfolio value with detailed breakdown...")
@@ -117,6 +114,11 @@ if __name__ == "__main__":
         # Round all numeric values to 2 decimal places
         final_report = final_report.round(2)
 
+        # Optional output step: one row per calendar day
+        if EXPAND_CALENDAR_DAYS:
+            final_report = expand_to_calendar_days(final_report.reset_index(), date_col='Date',
+                                                   end_date=end_date).set_index('Date')
+
         final_report.to_csv(OUTPUT_CSV_FILE)
         
         print("\n--- Process Complete! ---")
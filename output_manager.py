@@ -0,0 +1,170 @@
+'''
+Namespaced, atomic output files
+
+Each script writes its artifacts under data/outputs/<asset class>/<run id>/
+through a temp file and rename, then commits the run to a manifest. Readers
+resolve "the latest complete output" through the manifest, so scripts for
+different asset classes can run concurrently without clobbering each other.
+
+Standard library only, so fast-start readers (query.py) can use it.
+'''
+
+import datetime
+import json
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # Windows: manifest updates are not locked
+    fcntl = None
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+OUTPUT_ROOT = os.path.join(DATA_DIR, 'outputs')
+MANIFEST_JSON = os.path.join(OUTPUT_ROOT, 'manifest.json')
+KEEP_RUNS = 5   # completed runs kept per asset class
+
+# Shared files written before outputs were namespaced; used when the manifest has no entry
+LEGACY_FILES = {
+    'per_symbol_values': 'per_symbol_values.csv',
+    'last_day_values': 'last_day_values.csv',
+    'portfolio_values': 'ind-stocks-output.csv',
+    'dividend_calendar': 'dividend-calendar.csv',
+}
+
+
+def read_manifest(manifest_path=MANIFEST_JSON):
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def latest_path(asset_class, artifact, manifest_path=MANIFEST_JSON):
+    """Path of an artifact from the asset class's latest complete run, or None."""
+    entry = read_manifest(manifest_path).get(asset_class)
+    if entry and artifact in entry['artifacts']:
+        return os.path.join(OUTPUT_ROOT, entry['artifacts'][artifact])
+    return None
+
+
+def latest_paths(artifact, manifest_path=MANIFEST_JSON):
+    """
+    {asset class: path} for every asset class that has published the artifact;
+    falls back to the legacy shared file when none has.
+    """
+    paths = {asset_class: os.path.join(OUTPUT_ROOT, entry['artifacts'][artifact])
+             for asset_class, entry in sorted(read_manifest(manifest_path).items())
+             if artifact in entry['artifacts']}
+    if not paths and artifact in LEGACY_FILES:
+        legacy = os.path.join(DATA_DIR, LEGACY_FILES[artifact])
+        if os.path.exists(legacy):
+            paths['legacy'] = legacy
+    return paths
+
+
+def atomic_write(write, path):
+    """Calls write(tmp_path) and renames the result over `path` once it is complete."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+class OutputManager:
+    """Artifacts of one run of one asset class."""
+
+    def __init__(self, asset_class, run_id=None, output_root=OUTPUT_ROOT):
+        self.asset_class = asset_class
+        self.run_id = run_id or f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        self.output_root = output_root
+        self.run_dir = os.path.join(output_root, asset_class, self.run_id)
+        self.artifacts = {}
+        os.makedirs(self.run_dir, exist_ok=True)
+
+    def path(self, artifact):
+        return os.path.join(self.run_dir, f"{artifact}.csv")
+
+    def write_csv(self, df, artifact, **to_csv_kwargs):
+        to_csv_kwargs.setdefault('index', False)
+        path = atomic_write(lambda tmp: df.to_csv(tmp, **to_csv_kwargs), self.path(artifact))
+        self.artifacts[artifact] = os.path.relpath(path, self.output_root)
+        return path
+
+    def stream_csv(self, artifact, **to_csv_kwargs):
+        """
+        Sink for an artifact written a frame at a time: each write(df) appends to
+        a temp file, and close() renames it into place. Use it as a context
+        manager so a failed run leaves no partial artifact behind.
+        """
+        to_csv_kwargs.setdefault('index', False)
+        return CsvSink(self, artifact, to_csv_kwargs)
+
+    def commit(self, manifest_path=None):
+        """Publishes this run as the latest complete output of its asset class."""
+        manifest_path = manifest_path or os.path.join(self.output_root, 'manifest.json')
+        with open(manifest_path + '.lock', 'w') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            manifest = read_manifest(manifest_path)
+            current = manifest.get(self.asset_class)
+            if current and current['run_id'] > self.run_id:
+                print(f"ℹ️ A newer {self.asset_class} run is already published, keeping it.")
+                shutil.rmtree(self.run_dir, ignore_errors=True)
+                return
+            manifest[self.asset_class] = {
+                'run_id': self.run_id,
+                'completed_at': datetime.datetime.now().isoformat(timespec='seconds'),
+                'artifacts': self.artifacts,
+            }
+            atomic_write(lambda tmp: _dump_json(manifest, tmp), manifest_path)
+        self._prune()
+
+    def _prune(self):
+        class_dir = os.path.join(self.output_root, self.asset_class)
+        # Only older runs: a newer one may still be writing
+        runs = sorted(r for r in os.listdir(class_dir) if r < self.run_id)
+        for old_run in runs[:max(0, len(runs) - (KEEP_RUNS - 1))]:
+            shutil.rmtree(os.path.join(class_dir, old_run), ignore_errors=True)
+
+
+class CsvSink:
+    """Appends frames to one artifact of an OutputManager run; see OutputManager.stream_csv."""
+
+    def __init__(self, outputs, artifact, to_csv_kwargs):
+        self.outputs = outputs
+        self.artifact = artifact
+        self.path = outputs.path(artifact)
+        self.to_csv_kwargs = to_csv_kwargs
+        self.tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        self.file = open(self.tmp_path, 'w', newline='')
+        self.rows = 0
+
+    def write(self, df):
+        df.to_csv(self.file, header=self.file.tell() == 0, **self.to_csv_kwargs)
+        self.rows += len(df)
+
+    def close(self):
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+        self.outputs.artifacts[self.artifact] = os.path.relpath(self.path, self.outputs.output_root)
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+            os.remove(self.tmp_path)
+
+
+def _dump_json(data, path):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
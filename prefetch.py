@@ -0,0 +1,334 @@
+'''
+Prefetch market data after the close so morning runs start warm
+
+Builds one task per (kind, symbol) for everything the valuation, dividend,
+NPS and strategy scripts fetch: closes for the equity and MF ledgers, USD/INR,
+NPS NAVs, OHLC history for strategy-sell and the strategy inputs, and
+dividends. Tasks go through a priority queue (held positions first, then
+dividends, then watchlist names) into a bounded worker pool; each provider's
+own semaphore still caps its concurrency. Results land in price_cache.py's
+cache (NPS NAVs in nav_store.py's), and every finished or failed task is
+recorded in data/prefetch-state.json, so a rerun for the same session only
+does what is left.
+
+    python prefetch.py            # warm everything now
+    python prefetch.py --wait     # sleep until each exchange has closed, then warm its data
+'''
+
+import argparse
+import heapq
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import mf_bulk_nav
+from corporate_actions import cache_history_actions
+from nav_store import refresh_nav_store
+from output_manager import atomic_write
+from price_cache import write_cache
+from price_providers import BulkNavProvider, ProviderChain, YahooProvider
+from trading_calendar import last_close, next_close
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+STATE_JSON = os.path.join(DATA_DIR, 'prefetch-state.json')
+LEDGERS = {
+    'ind-stocks': os.path.join(DATA_DIR, 'ind-stocks.csv'),
+    'us-stocks': os.path.join(DATA_DIR, 'us-stocks.csv'),
+    'ind-mf': os.path.join(DATA_DIR, 'ind-mf.csv'),
+}
+NPS_CSV = os.path.join(DATA_DIR, 'nps.csv')
+WATCHLIST_CSVS = [os.path.join(DATA_DIR, 'strategy-breakout-input.csv'),
+                  os.path.join(DATA_DIR, 'strategy-volume-input.csv')]
+FX_SYMBOL = 'INR=X'
+BENCHMARK = '^NSEI'             # risk.py's beta benchmark
+OHLC_PERIOD_DAYS = 400          # strategy-sell reads a 1y history
+MAX_WORKERS = 16
+STATE_FLUSH_SECONDS = 5         # state is saved at most this often while tasks complete, and at the end
+PREFETCH_DELAY = timedelta(minutes=30)   # let closing prices settle before fetching
+
+# Lower runs first
+HELD, HELD_HISTORY, HELD_DIVIDENDS, WATCHLIST = 0, 1, 2, 3
+
+Task = namedtuple('Task', ['priority', 'kind', 'symbol', 'exchange', 'start'])
+
+
+# ------------------------------
+# TASKS
+# ------------------------------
+def read_ledger(path):
+    df = pd.read_csv(path, encoding='utf-8-sig')
+    df['Symbol'] = df['Symbol'].astype(str)
+    df['Transaction Date'] = pd.to_datetime(df['Transaction Date'], dayfirst=True)
+    return df
+
+
+def held_symbols(ledger):
+    latest = ledger.sort_values('Transaction Date').groupby('Symbol')['Total Shares'].last()
+    return set(latest[latest > 0].index)
+
+
+def build_tasks(today=None):
+    today = pd.Timestamp(today or datetime.today()).normalize()
+    tasks = []
+
+    if os.path.exists(LEDGERS['ind-stocks']):
+        ledger = read_ledger(LEDGERS['ind-stocks'])
+        held = held_symbols(ledger)
+        first = ledger.groupby('Symbol')['Transaction Date'].min()
+        for symbol in sorted(first.index):
+            tasks.append(Task(HELD, 'prices', symbol, 'NSE', first[symbol] - timedelta(days=1)))
+        for symbol in sorted(held):
+            tasks.append(Task(HELD_HISTORY, 'ohlc', symbol, 'NSE', today - timedelta(days=OHLC_PERIOD_DAYS)))
+            tasks.append(Task(HELD_DIVIDENDS, 'dividends', symbol, 'NSE', None))
+    else:
+        held = set()
+
+    if os.path.exists(LEDGERS['us-stocks']):
+        ledger = read_ledger(LEDGERS['us-stocks'])
+        first = ledger.groupby('Symbol')['Transaction Date'].min()
+        tasks.append(Task(HELD, 'fx', FX_SYMBOL, 'NYSE', first.min() - timedelta(days=1)))
+        for symbol in sorted(first.index):
+            tasks.append(Task(HELD, 'prices-us', symbol, 'NYSE', first[symbol] - timedelta(days=1)))
+        for symbol in sorted(held_symbols(ledger)):
+            tasks.append(Task(HELD_DIVIDENDS, 'dividends-us', symbol, 'NYSE', None))
+
+    if os.path.exists(LEDGERS['ind-mf']):
+        ledger = read_ledger(LEDGERS['ind-mf'])
+        start = ledger['Transaction Date'].min() - timedelta(days=1)
+        for symbol in sorted(ledger['Symbol'].unique()):
+            tasks.append(Task(HELD, 'nav', symbol, 'NSE', start))
+
+    if os.path.exists(NPS_CSV):
+        from nps import SCHEME_TO_CODE
+
+        schemes = pd.read_csv(NPS_CSV)['Scheme'].unique()
+        for code in sorted({SCHEME_TO_CODE[s] for s in schemes if s in SCHEME_TO_CODE}):
+            tasks.append(Task(HELD, 'nps', code, 'NSE', None))
+
+    starts = [t.start for t in tasks if t.start is not None]
+    if starts:
+        # risk.py's beta benchmark, over the same span as the held closes
+        tasks.append(Task(HELD_HISTORY, 'index', BENCHMARK, 'NSE', min(starts)))
+
+    for path in WATCHLIST_CSVS:
+        if not os.path.exists(path):
+            continue
+        signals = pd.read_csv(path, usecols=['date', 'symbol'])
+        start = pd.to_datetime(signals['date'], dayfirst=True).min() - timedelta(days=5)
+        for symbol in sorted(set(signals['symbol']) - held):
+            tasks.append(Task(WATCHLIST, 'ohlc', symbol, 'NSE', min(start, today - timedelta(days=OHLC_PERIOD_DAYS))))
+
+    # One task per (kind, symbol), at its most urgent priority and earliest start
+    unique = {}
+    for task in sorted(tasks, key=lambda t: (t.priority, t.start or today)):
+        unique.setdefault((task.kind, task.symbol), task)
+    return list(unique.values())
+
+
+# ------------------------------
+# FETCHERS
+# ------------------------------
+class Fetchers:
+    """One fetch function per task kind; providers are shared so their semaphores bound concurrency."""
+
+    def __init__(self):
+        self.nse = YahooProvider(suffixes=('.NS', '.BO'))
+        self.plain = YahooProvider(suffixes=('',))
+        self.mf_chain = None
+
+    def run(self, task):
+        return getattr(self, task.kind.replace('-', '_'))(task)
+
+    def prices(self, task):
+        return self._store_prices(task, self.nse)
+
+    def prices_us(self, task):
+        return self._store_prices(task, self.plain, 'prices-us')
+
+    def fx(self, task):
+        return self._store_prices(task, self.plain, 'prices-us')
+
+    def index(self, task):
+        return self._store_prices(task, self.plain)
+
+    def nav(self, task):
+        if self.mf_chain is None:
+            self.mf_chain = ProviderChain([BulkNavProvider(mf_bulk_nav.NAV_HISTORY_CSV, mf_bulk_nav.SCHEME_MAP_CSV),
+                                           YahooProvider(suffixes=('',), auto_adjust=True)],
+                                          order=['amfi', 'yfinance'])
+        price_df = self.mf_chain.history(task.symbol, task.start, datetime.today())
+        return self._write_prices(task, price_df)
+
+    def nps(self, task):
+        refresh_nav_store(task.symbol)
+        return task.symbol
+
+    def ohlc(self, task):
+        import yfinance as yf
+
+        # Unadjusted bars: split-adjusted Close plus the day's Dividends and Stock Splits,
+        # from which corporate_actions.py derives raw and total-return closes
+        for suffix in ['.NS', '.BO']:
+            with self.nse.slots:
+                hist = yf.Ticker(task.symbol + suffix).history(start=task.start, auto_adjust=False)
+            if not hist.empty:
+                hist.index = pd.DatetimeIndex(hist.index).tz_localize(None).normalize()
+                cache_history_actions(task.symbol + suffix, hist, task.start)
+                return write_cache('ohlc', task.symbol + suffix, hist.rename_axis('Date').reset_index(), task.start)
+        raise LookupError(f"no Yahoo history for {task.symbol}.NS or .BO")
+
+    def dividends(self, task):
+        return self._store_dividends(task, ['.NS', '.BO'], self.nse)
+
+    def dividends_us(self, task):
+        return self._store_dividends(task, [''], self.plain)
+
+    def _store_prices(self, task, provider, cache_kind='prices'):
+        return self._write_prices(task, provider.fetch(task.symbol, task.start, datetime.today()), cache_kind)
+
+    def _write_prices(self, task, price_df, cache_kind='prices'):
+        if price_df is None or price_df.empty:
+            raise LookupError(f"no price history for {task.symbol}")
+        return write_cache(cache_kind, task.symbol, price_df, task.start)
+
+    def _store_dividends(self, task, suffixes, provider):
+        import yfinance as yf
+
+        # Cache every variant tried, empty ones too, so readers know "no dividends" is current
+        for suffix in suffixes:
+            with provider.slots:
+                dividends = yf.Ticker(task.symbol + suffix).dividends
+            dividends.index = pd.DatetimeIndex(dividends.index).tz_localize(None)
+            path = write_cache('dividends', task.symbol + suffix,
+                               dividends.rename('Dividends').rename_axis('Date').reset_index())
+            if not dividends.empty:
+                return path
+        return path
+
+
+# ------------------------------
+# STATE
+# ------------------------------
+def read_state(state_path=STATE_JSON):
+    if not os.path.exists(state_path):
+        return {'tasks': {}}
+    with open(state_path) as f:
+        return json.load(f)
+
+
+def task_key(task):
+    return f"{task.kind}/{task.symbol}"
+
+
+def session_of(exchange, now=None):
+    return last_close(exchange, now).date().isoformat()
+
+
+def pending_tasks(tasks, state, now=None):
+    """Tasks not yet done for their exchange's current session."""
+    sessions = {}
+    pending = []
+    for task in tasks:
+        session = sessions.setdefault(task.exchange, session_of(task.exchange, now))
+        entry = state['tasks'].get(task_key(task))
+        if not (entry and entry['status'] == 'done' and entry['session'] == session):
+            pending.append(task)
+    return pending, sessions
+
+
+def prefetch(tasks, state_path=STATE_JSON, max_workers=MAX_WORKERS, fetchers=None, now=None):
+    """Runs pending tasks in priority order and records each outcome as it completes."""
+    fetchers = fetchers or Fetchers()
+    state = read_state(state_path)
+    pending, sessions = pending_tasks(tasks, state, now)
+    print(f"🔄 {len(pending)} of {len(tasks)} prefetch tasks pending "
+          f"(sessions: {', '.join(f'{e} {d}' for e, d in sorted(sessions.items()))})")
+
+    # The bulk AMFI file feeds every fund's NAV task, so load it before the queue starts
+    if any(t.kind == 'nav' for t in pending) and os.path.exists(mf_bulk_nav.SCHEME_MAP_CSV):
+        try:
+            mf_bulk_nav.ingest()
+        except Exception as e:
+            print(f"⚠️ AMFI bulk NAV ingest failed, funds fall back to yfinance: {e}")
+
+    heap = [(t.priority, i, t) for i, t in enumerate(pending)]
+    heapq.heapify(heap)
+    lock = threading.Lock()
+    counts = {'done': 0, 'failed': 0}
+    flushed = [time.monotonic()]
+
+    def save_state():
+        atomic_write(lambda tmp: _dump_json(state, tmp), state_path)
+        flushed[0] = time.monotonic()
+
+    def record(task, error=None):
+        with lock:
+            state['tasks'][task_key(task)] = {
+                'session': sessions[task.exchange],
+                'status': 'failed' if error else 'done',
+                'at': datetime.now().isoformat(timespec='seconds'),
+                'error': str(error) if error else None,
+            }
+            counts['failed' if error else 'done'] += 1
+            # A crash loses at most the last few seconds of records; those tasks just run again
+            if time.monotonic() - flushed[0] >= STATE_FLUSH_SECONDS:
+                save_state()
+
+    # The executor runs submissions first-in first-out, so submitting in heap order keeps priorities
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            while heap:
+                _, _, task = heapq.heappop(heap)
+                futures[executor.submit(fetchers.run, task)] = task
+            for future in as_completed(futures):
+                task = futures[future]
+                try:
+                    future.result()
+                    record(task)
+                except Exception as e:
+                    print(f"❌ {task_key(task)}: {e}")
+                    record(task, e)
+    finally:
+        with lock:
+            save_state()
+
+    print(f"✅ Prefetch finished: {counts['done']} done, {counts['failed']} failed, "
+          f"{len(tasks) - len(pending)} already warm. State in {state_path}")
+    return counts
+
+
+def wait_and_prefetch(tasks, **kwargs):
+    """Sleeps until each exchange's next close (plus PREFETCH_DELAY), then warms that exchange's tasks."""
+    closes = sorted((next_close(e), e) for e in {t.exchange for t in tasks})
+    for close, exchange in closes:
+        wake = close + PREFETCH_DELAY
+        delay = (wake - datetime.now(wake.tzinfo)).total_seconds()
+        if delay > 0:
+            print(f"⏳ Waiting until {wake:%Y-%m-%d %H:%M %Z} for the {exchange} close...")
+            time.sleep(delay)
+        prefetch([t for t in tasks if t.exchange == exchange], **kwargs)
+
+
+def _dump_json(data, path):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm the local price cache after market close.")
+    parser.add_argument('--wait', action='store_true', help="Wait for each exchange's next close before fetching")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    args = parser.parse_args()
+
+    all_tasks = build_tasks()
+    if args.wait:
+        wait_and_prefetch(all_tasks, max_workers=args.workers)
+    else:
+        prefetch(all_tasks, max_workers=args.workers)
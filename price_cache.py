@@ -0,0 +1,143 @@
+'''
+Local cache of market data warmed by prefetch.py
+
+One CSV per (kind, symbol) under data/price-cache/<kind>/, written through
+temp-file + rename:
+
+    prices     Transaction Date,Price      (provider-shaped NSE/BSE closes and MF NAVs)
+    prices-us  Transaction Date,Price      (US closes and USD/INR)
+    ohlc       Date,Open,High,Low,Close,Adj Close,Volume,...   (unadjusted yfinance history, by ticker)
+    dividends  Date,Dividends              (by ticker)
+    actions    Date,Dividends,Stock Splits (by ticker, see corporate_actions.py)
+
+index.json records when and from which start date each entry was fetched.
+An entry is warm when it was written after the exchange's most recent close,
+so a morning run reads it instead of going to the network.
+'''
+
+import json
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: index updates are only locked within a process
+    fcntl = None
+
+from output_manager import atomic_write
+from price_providers import PriceProvider
+from trading_calendar import last_close
+
+PRICE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'price-cache')
+INDEX_JSON = 'index.json'
+
+_index_lock = threading.Lock()
+
+
+def cache_path(kind, symbol, cache_dir=PRICE_CACHE_DIR):
+    return os.path.join(cache_dir, kind, f"{symbol.replace('/', '_')}.csv")
+
+
+def read_index(cache_dir=PRICE_CACHE_DIR):
+    path = os.path.join(cache_dir, INDEX_JSON)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_cache(kind, symbol, df, start_date=None, cache_dir=PRICE_CACHE_DIR):
+    """Stores a frame for (kind, symbol) and records it in the index."""
+    path = cache_path(kind, symbol, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write(lambda tmp: df.to_csv(tmp, index=False), path)
+    # The thread lock covers prefetch's workers, the file lock other processes writing the cache
+    with _index_lock, open(os.path.join(cache_dir, INDEX_JSON + '.lock'), 'w') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        index = read_index(cache_dir)
+        index[f"{kind}/{symbol}"] = {
+            'written': datetime.now().astimezone().isoformat(timespec='seconds'),
+            'from': pd.Timestamp(start_date).strftime('%Y-%m-%d') if start_date is not None else None,
+        }
+        atomic_write(lambda tmp: _dump_json(index, tmp), os.path.join(cache_dir, INDEX_JSON))
+    return path
+
+
+def is_warm(entry, exchange, start_date=None, now=None):
+    """True when an index entry was written after the last close and covers `start_date`."""
+    if not entry:
+        return False
+    if datetime.fromisoformat(entry['written']) < last_close(exchange, now):
+        return False
+    if start_date is not None and entry['from'] is not None:
+        return pd.Timestamp(entry['from']) <= pd.Timestamp(start_date).normalize()
+    return True
+
+
+def read_cache(kind, symbol, exchange, start_date=None, cache_dir=PRICE_CACHE_DIR):
+    """The cached frame when it is warm, else None. The first column is parsed as dates."""
+    if not is_warm(read_index(cache_dir).get(f"{kind}/{symbol}"), exchange, start_date):
+        return None
+    df = pd.read_csv(cache_path(kind, symbol, cache_dir))
+    df[df.columns[0]] = pd.to_datetime(df[df.columns[0]])
+    return df
+
+
+def cached_yf_history(ticker, exchange, period=None, start_date=None):
+    """
+    Warm 'ohlc' history for a yfinance ticker, shaped like Ticker.history()
+    (Date index), trimmed to a yfinance period ('5d', '6mo', '1y') or start date.
+    None when the cache is cold or was fetched from after start_date.
+    """
+    df = read_cache('ohlc', ticker, exchange, start_date)
+    if df is None or 'Adj Close' not in df.columns:
+        return None   # entries without Adj Close were fetched auto-adjusted
+    df = df.set_index('Date')
+    if start_date is not None:
+        return df[df.index >= pd.Timestamp(start_date)]
+    if period is None or period == 'max':
+        return df
+    if period.endswith('d'):
+        return df.tail(int(period[:-1]))
+    offset = pd.DateOffset(months=int(period[:-2])) if period.endswith('mo') else pd.DateOffset(years=int(period[:-1]))
+    return df[df.index >= df.index.max() - offset]
+
+
+def cached_dividends(ticker, exchange):
+    """Warm dividend Series (Date index) for a yfinance ticker; empty when it pays none, None when cold."""
+    df = read_cache('dividends', ticker, exchange)
+    if df is None:
+        return None
+    return df.set_index('Date')['Dividends']
+
+
+class CachedProvider(PriceProvider):
+    """
+    Serves price entries prefetch.py wrote after the exchange's last close;
+    anything cold or fetched from a later start is left to the next provider.
+    """
+    name = 'cache'
+    max_concurrency = 64
+
+    def __init__(self, exchange, kind='prices', cache_dir=PRICE_CACHE_DIR, max_concurrency=None):
+        super().__init__(max_concurrency)
+        self.exchange = exchange
+        self.kind = kind
+        self.cache_dir = cache_dir
+        self.index = read_index(cache_dir)
+
+    def history(self, symbol, start_date, end_date):
+        if not is_warm(self.index.get(f"{self.kind}/{symbol}"), self.exchange, start_date):
+            return None
+        df = pd.read_csv(cache_path(self.kind, symbol, self.cache_dir), parse_dates=['Transaction Date'])
+        start, end = pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date)
+        return df[(df['Transaction Date'] >= start) & (df['Transaction Date'] <= end)].reset_index(drop=True)
+
+
+def _dump_json(data, path):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
@@ -0,0 +1,309 @@
+'''
+Pluggable price providers with a configurable fallback chain
+'''
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from trading_calendar import next_trading_day
+
+# Default fallback order, by provider name
+PROVIDER_ORDER = ['cache', 'yfinance', 'manual']
+
+
+class PriceProvider:
+    """
+    Base provider. history() returns a DataFrame with 'Transaction Date' and 'Price'
+    columns (the shape get_portfolio_values merges on), or None when it has no data.
+    Each provider carries its own concurrency limit so a slow one cannot starve the rest.
+    """
+    name = 'base'
+    max_concurrency = 4
+
+    def __init__(self, max_concurrency=None):
+        if max_concurrency is not None:
+            self.max_concurrency = max_concurrency
+        self.slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    def history(self, symbol, start_date, end_date):
+        raise NotImplementedError
+
+    def fetch(self, symbol, start_date, end_date):
+        with self.slots:
+            return self.history(symbol, start_date, end_date)
+
+
+class YahooProvider(PriceProvider):
+    """
+    Fetches closes from yfinance for every suffix variant of a symbol
+    (.NS and .BO by default) and keeps the highest close per day. The splits
+    and dividends in the same response are cached for corporate_actions.py
+    and attached to the result as attrs['actions'] ({ticker: table}).
+    Closes are split-adjusted only unless auto_adjust=True (dividends too).
+    """
+    name = 'yfinance'
+    max_concurrency = 8
+
+    def __init__(self, suffixes=('.NS', '.BO'), max_concurrency=None, auto_adjust=False):
+        super().__init__(max_concurrency)
+        self.suffixes = suffixes
+        self.auto_adjust = auto_adjust
+
+    def history(self, symbol, start_date, end_date):
+        import yfinance as yf
+
+        from corporate_actions import cache_history_actions
+
+        data_frames, actions = [], {}
+        for suffix in self.suffixes:
+            variant = symbol + suffix
+            try:
+                hist = yf.Ticker(variant).history(start=start_date, end=end_date, auto_adjust=self.auto_adjust)
+                if hist.empty:
+                    print(f"No data for {variant}")
+                    continue
+                actions[variant] = cache_history_actions(variant, hist, start_date)
+                hist = hist.reset_index()
+                hist['Transaction Date'] = pd.to_datetime(hist['Date']).dt.tz_localize(None).dt.normalize()
+                hist = hist[['Transaction Date', 'Close']].rename(columns={'Close': f'Price{suffix}'})
+                data_frames.append(hist)
+            except Exception as e:
+                print(f"Error fetching {variant}: {str(e)}")
+                continue
+
+        if not data_frames:
+            return None
+
+        merged = data_frames[0]
+        for df in data_frames[1:]:
+            merged = pd.merge(merged, df, on='Transaction Date', how='outer')
+
+        price_cols = [col for col in merged.columns if col.startswith('Price')]
+        merged['Price'] = merged[price_cols].max(axis=1, skipna=True)
+
+        final = merged[['Transaction Date', 'Price']].sort_values('Transaction Date')
+        final['Price'] = final['Price'].ffill()
+        final = final.reset_index(drop=True)
+        final.attrs['actions'] = actions
+        return final
+
+
+class NpsNavProvider(PriceProvider):
+    """NAV history from npsnav.in; the symbol is the PFRDA scheme code (e.g. SM001003)."""
+    name = 'npsnav'
+    max_concurrency = 4
+    api_url = 'https://npsnav.in/api/historical/{code}'
+    latest_url = 'https://npsnav.in/api/detailed/{code}'
+
+    def history(self, symbol, start_date=None, end_date=None):
+        import requests
+
+        try:
+            response = requests.get(self.api_url.format(code=symbol), timeout=30)
+            response.raise_for_status()
+            data = response.json().get('data', [])
+            if not data:
+                return None
+
+            nav_df = pd.DataFrame(data)
+            nav_df['Transaction Date'] = pd.to_datetime(nav_df['date'], format='%d-%m-%Y')
+            nav_df['Price'] = pd.to_numeric(nav_df['nav'])
+        except requests.exceptions.RequestException as e:
+            print(f"  -> API Error for {symbol}: {e}")
+            return None
+        except (ValueError, KeyError) as e:
+            print(f"  -> Data Parsing Error for {symbol}: {e}")
+            return None
+
+        nav_df = nav_df[['Transaction Date', 'Price']].sort_values('Transaction Date')
+        if start_date is not None:
+            nav_df = nav_df[nav_df['Transaction Date'] >= pd.Timestamp(start_date).normalize()]
+        if end_date is not None:
+            nav_df = nav_df[nav_df['Transaction Date'] <= pd.Timestamp(end_date)]
+        return nav_df.reset_index(drop=True)
+
+    def latest(self, symbol):
+        """Only the latest published NAV, as a one-row Series indexed by date; None on failure."""
+        import requests
+
+        try:
+            with self.slots:
+                response = requests.get(self.latest_url.format(code=symbol), timeout=30)
+            response.raise_for_status()
+            data = response.json()
+            nav_date = pd.to_datetime(data['Last Updated'], format='%d-%m-%Y')
+            return pd.Series([float(data['NAV'])], index=pd.DatetimeIndex([nav_date]))
+        except (requests.exceptions.RequestException, ValueError, KeyError, TypeError) as e:
+            print(f"  -> Latest NAV unavailable for {symbol}: {e}")
+            return None
+
+
+class ArrayStoreProvider(PriceProvider):
+    """
+    In-memory store of sorted (dates, prices) arrays per symbol. Lookups are a
+    searchsorted slice, so falling back to it costs nothing extra.
+    A window starting outside a symbol's known range (e.g. after delisting)
+    gets price 0; a range that ends inside the window keeps its last price.
+    The carried price is dated on the window's start and on the first trading
+    day after it, so business-day valuations, which skip a non-trading start,
+    still pick it up.
+    """
+    name = 'local'
+    max_concurrency = 64
+    exchange = 'NSE'     # calendar for the first trading day of a window
+
+    def __init__(self, series=None, max_concurrency=None):
+        super().__init__(max_concurrency)
+        self.store = {}
+        for symbol, prices in (series or {}).items():
+            self.add(symbol, prices.index, prices.values)
+
+    def add(self, symbol, dates, prices):
+        dates = pd.DatetimeIndex(dates).normalize().values.astype('datetime64[D]')
+        order = np.argsort(dates, kind='mergesort')
+        self.store[symbol] = (dates[order], np.asarray(prices, dtype=float)[order])
+
+    def carry_dates(self, start, end, before=None):
+        """The window's start and first trading day, up to `end` and before `before` (the next stored date)."""
+        first_trading = np.datetime64(next_trading_day([pd.Timestamp(start)], self.exchange)[0].date(), 'D')
+        days = np.unique(np.array([start, first_trading]))
+        days = days[days <= end]
+        return days[days < before] if before is not None else days
+
+    def history(self, symbol, start_date, end_date):
+        if symbol not in self.store:
+            return None
+        dates, prices = self.store[symbol]
+        start = np.datetime64(pd.Timestamp(start_date).date(), 'D')
+        end = np.datetime64(pd.Timestamp(end_date).date(), 'D')
+
+        lo, hi = np.searchsorted(dates, start, 'left'), np.searchsorted(dates, end, 'right')
+        out_dates, out_prices = [dates[lo:hi]], [prices[lo:hi]]
+        # Carry the last known price into the window, or 0 when the window starts outside
+        # the known range; a range ending inside the window carries forward from its last price
+        if lo == hi or dates[lo] > start:
+            carried = prices[lo - 1] if 0 < lo < len(dates) else 0.0
+            carry = self.carry_dates(start, end, dates[lo] if lo < hi else None)
+            out_dates.insert(0, carry)
+            out_prices.insert(0, np.full(len(carry), carried))
+
+        return pd.DataFrame({
+            'Transaction Date': pd.to_datetime(np.concatenate(out_dates)),
+            'Price': np.concatenate(out_prices),
+        })
+
+
+class ManualCsvProvider(ArrayStoreProvider):
+    """
+    Manual price files (<symbol>.csv with Date,Price columns, e.g. TATAMTRDVR.csv),
+    read and indexed once when the provider is created. Other CSVs in the
+    directory are ignored.
+    """
+    name = 'manual'
+
+    def __init__(self, manual_data_dir, max_concurrency=None):
+        super().__init__(max_concurrency=max_concurrency)
+        if not os.path.isdir(manual_data_dir):
+            print(f"ℹ️ Manual price directory {manual_data_dir} not found, no manual fallback.")
+            return
+        for file_name in sorted(os.listdir(manual_data_dir)):
+            if not file_name.endswith('.csv'):
+                continue
+            file_path = os.path.join(manual_data_dir, file_name)
+            try:
+                with open(file_path, encoding='utf-8-sig', errors='replace') as f:
+                    header = f.readline().strip().split(',')
+                if header != ['Date', 'Price']:
+                    continue
+                df = pd.read_csv(file_path, encoding='utf-8-sig')
+                self.add(file_name[:-4], pd.to_datetime(df['Date']), df['Price'])
+            except Exception as e:
+                print(f"❌ Failed to load manual CSV {file_name}: {str(e)}")
+
+
+class BulkNavProvider(ArrayStoreProvider):
+    """
+    Mutual-fund NAVs from the local history mf_bulk_nav.py builds out of AMFI's
+    bulk NAV files, keyed by the symbols in the scheme map. A fund whose stored
+    history does not reach back to the requested start is left to the next provider.
+    """
+    name = 'amfi'
+
+    def __init__(self, history_csv, scheme_map_csv, max_concurrency=None):
+        super().__init__(max_concurrency=max_concurrency)
+        if not (os.path.exists(history_csv) and os.path.exists(scheme_map_csv)):
+            return
+        scheme_map = pd.read_csv(scheme_map_csv, dtype=str).dropna(subset=['Scheme Code'])
+        if scheme_map.empty:
+            print(f"ℹ️ No scheme codes in {scheme_map_csv}; run `python mf_bulk_nav.py --match` to use AMFI NAVs")
+            return
+        navs = pd.read_csv(history_csv, dtype={'Scheme Code': str}, parse_dates=['Date'])
+        by_code = dict(tuple(navs.groupby('Scheme Code')))
+        for symbol, code in zip(scheme_map['Symbol'], scheme_map['Scheme Code']):
+            if code in by_code:
+                self.add(symbol, by_code[code]['Date'], by_code[code]['NAV'])
+
+    def history(self, symbol, start_date, end_date):
+        if symbol not in self.store:
+            return None
+        dates, navs = self.store[symbol]
+        start = np.datetime64(pd.Timestamp(start_date).date(), 'D')
+        end = np.datetime64(pd.Timestamp(end_date).date(), 'D')
+        if dates[0] > start:
+            return None
+
+        # Last NAV on or before the start carries into the window; NAVs never drop to 0
+        lo, hi = np.searchsorted(dates, start, 'right') - 1, np.searchsorted(dates, end, 'right')
+        carry = self.carry_dates(start, end, dates[lo + 1] if lo + 1 < hi else None)
+        return pd.DataFrame({'Transaction Date': pd.to_datetime(np.concatenate([carry, dates[lo + 1:hi]])),
+                             'Price': np.concatenate([np.full(len(carry), navs[lo]), navs[lo + 1:hi]])})
+
+
+class ProviderChain:
+    """
+    Tries providers in fallback order until one returns data. history_many()
+    fetches many symbols in parallel; each provider's own semaphore bounds its
+    concurrency, so a slow provider never serializes lookups against the others.
+    """
+
+    def __init__(self, providers, order=None):
+        self.providers = {p.name: p for p in providers}
+        self.order = [name for name in (order or PROVIDER_ORDER) if name in self.providers]
+        self.order += [name for name in self.providers if name not in self.order]
+
+    def history(self, symbol, start_date, end_date):
+        for name in self.order:
+            price_df = self.providers[name].fetch(symbol, start_date, end_date)
+            if price_df is not None and not price_df.empty:
+                price_df.attrs['provider'] = name
+                return price_df
+            print(f"ℹ️ {name} has no data for {symbol}, trying next provider...")
+        return None
+
+    def history_many(self, symbols, start_date, end_date, on_result=None):
+        """
+        {symbol: history}; on_result(symbol, history) is called as each symbol completes.
+        start_date may be a {symbol: start} mapping to fetch each symbol from its own start.
+        """
+        starts = start_date if isinstance(start_date, dict) else dict.fromkeys(symbols, start_date)
+        workers = max(1, sum(p.max_concurrency for p in self.providers.values()))
+        with ThreadPoolExecutor(max_workers=min(workers, max(1, len(symbols)))) as executor:
+            futures = {executor.submit(self.history, s, starts[s], end_date): s for s in symbols}
+            results, error = {}, None
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    results[symbol] = future.result()
+                except Exception as e:
+                    # Let the other symbols finish (and reach on_result) before failing
+                    error = error or e
+                    continue
+                if on_result:
+                    on_result(symbol, results[symbol])
+            if error:
+                raise error
+            return {s: results[s] for s in symbols}
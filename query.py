@@ -0,0 +1,116 @@
+'''
+Quick answers from the cached outputs
+
+Reads the CSVs the other scripts already wrote, using only the standard
+library, so a question like "what are my holdings worth?" starts in
+milliseconds. Nothing here imports pandas or yfinance unless --refresh asks
+for a fresh run.
+
+    python query.py holdings
+    python query.py positions
+    python query.py networth
+    python query.py alerts [--refresh]
+'''
+
+import argparse
+import csv
+import datetime
+import os
+import sys
+
+from output_manager import latest_paths
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+SELL_BOOKING_CSV = os.path.join(DATA_DIR, 'strategy-sell-booking.csv')
+
+
+def read_rows(path):
+    with open(path, newline='', encoding='utf-8-sig', errors='replace') as f:
+        return list(csv.DictReader(f))
+
+
+def to_float(value):
+    try:
+        return float(str(value).replace(',', ''))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def print_table(header, rows):
+    widths = [max(len(str(c)) for c in col) for col in zip(header, *rows)]
+    for i, row in enumerate([header] + rows):
+        print("  ".join(str(c).rjust(w) if i and isinstance(c, str) and c[:1].isdigit() else str(c).ljust(w)
+                        for c, w in zip(row, widths)))
+        if i == 0:
+            print("  ".join("-" * w for w in widths))
+
+
+def value_column(row):
+    return 'Total Value (INR)' if 'Total Value (INR)' in row else 'Total Value'
+
+
+def cached_on(path):
+    return datetime.datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y-%m-%d %H:%M')
+
+
+def holdings():
+    rows, cached = [], []
+    for asset_class, path in latest_paths('last_day_values').items():
+        rows += [dict(r, asset_class=asset_class) for r in read_rows(path) if to_float(r['Total Shares']) > 0]
+        cached.append(f"{asset_class} {cached_on(path)}")
+    rows.sort(key=lambda r: -to_float(r[value_column(r)]))
+    total = sum(to_float(r[value_column(r)]) for r in rows)
+    print_table(['Symbol', 'Class', 'Shares', 'Value', 'Weight %'],
+                [[r['Symbol'], r['asset_class'], f"{to_float(r['Total Shares']):,.2f}",
+                  f"{to_float(r[value_column(r)]):,.2f}",
+                  f"{to_float(r[value_column(r)]) / total * 100:.2f}" if total else "0.00"] for r in rows])
+    print(f"\nTotal holding value: {total:,.2f}  (cached {', '.join(cached)})")
+
+
+def positions():
+    for asset_class, path in latest_paths('last_day_values').items():
+        rows = read_rows(path)
+        header = list(rows[0].keys()) if rows else []
+        print(f"\n[{asset_class}]")
+        print_table(header, [[r[h] for h in header] for r in rows])
+
+
+def networth():
+    # excel_export only imports the standard library at module level
+    from excel_export import summary_rows
+
+    rows = list(summary_rows())
+    print_table(rows[0], [[c, d or '', f"{v:,.2f}"] for c, d, v in rows[1:]])
+
+
+def alerts(refresh=False):
+    if refresh:
+        import runpy
+        # Loaded under its own name so its command line is not parsed; run() does the work
+        runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'strategy-sell.py'))['run']()
+
+    rows = [r for r in read_rows(SELL_BOOKING_CSV)
+            if r.get('sell') == 'YES' or r.get('alert') == 'YES' or r.get('Xpct_condition_met') == 'True']
+    print_table(['Symbol', 'Price', 'Alert', 'Sell', 'X% met', '% below high'],
+                [[r['symbol'], r.get('current_price', ''), r.get('alert', ''), r.get('sell', ''),
+                  r.get('Xpct_condition_met', ''), r.get('pct_below_high', '')] for r in rows])
+    print(f"\n{len(rows)} flagged positions  (cached {cached_on(SELL_BOOKING_CSV)})")
+
+
+COMMANDS = {'holdings': holdings, 'positions': positions, 'networth': networth, 'alerts': alerts}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query cached portfolio outputs.")
+    parser.add_argument('command', choices=sorted(COMMANDS))
+    parser.add_argument('--refresh', action='store_true', help="Re-run strategy-sell before listing alerts")
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'alerts':
+            alerts(args.refresh)
+        else:
+            COMMANDS[args.command]()
+    except FileNotFoundError as e:
+        print(f"❌ Cached output not found: {e.filename}. Run the script that produces it first.")
+        sys.exit(1)
@@ -0,0 +1,240 @@
+'''
+XIRR and time-weighted returns from the valuation outputs
+
+Cash flows are derived from changes in held shares valued at that day's
+price (a buy is money in, a sell money out), with the last day's holding
+value as the terminal flow. XIRR is solved for every symbol and the whole
+portfolio at once with a batched Newton iteration and bisection fallback.
+A share change on a day with no known price (e.g. a buy older than the
+valuation's price window) has no flow value, so that symbol, and the
+portfolio, are reported as not computable rather than booked at zero cost.
+
+    python returns.py
+'''
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from output_manager import latest_paths
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+PER_SYMBOL_CSV = os.path.join(DATA_DIR, 'per_symbol_values.csv')   # legacy shared output
+NPS_TOTAL_CSV = os.path.join(DATA_DIR, 'nps-total.csv')
+XIRR_OUTPUT_CSV = os.path.join(DATA_DIR, 'returns-xirr.csv')
+TWR_OUTPUT_CSV = os.path.join(DATA_DIR, 'returns-twr.csv')
+
+PORTFOLIO = 'PORTFOLIO'
+NEWTON_ITERATIONS = 50
+BISECTION_ITERATIONS = 100
+TOLERANCE = 1e-9
+RATE_BOUNDS = (-0.9999, 100.0)
+
+
+# ------------------------------
+# MATRICES
+# ------------------------------
+def load_valuation_matrix(per_symbol_csv=PER_SYMBOL_CSV, value_col=None):
+    """
+    Pivots the per-symbol valuation output into dates x symbols share and price
+    matrices. Price is taken from the value column so US holdings come out in INR;
+    it is NaN until a symbol's first valued day.
+    """
+    df = pd.read_csv(per_symbol_csv)
+    if value_col is None:
+        value_col = 'Total value (INR)' if 'Total value (INR)' in df.columns else 'Total value'
+    df['Transaction Date'] = pd.to_datetime(df['Transaction Date'])
+
+    shares = df.pivot_table(index='Transaction Date', columns='Symbol', values='Total Shares', aggfunc='last')
+    values = df.pivot_table(index='Transaction Date', columns='Symbol', values=value_col, aggfunc='last')
+    return _to_matrices(shares, values.reindex_like(shares))
+
+
+def load_nps_matrix(nps_total_csv=NPS_TOTAL_CSV):
+    """Units and NAV matrices (dates x schemes) from the nps.py report."""
+    df = pd.read_csv(nps_total_csv, index_col='Date', parse_dates=['Date'])
+    units = df.filter(regex='_Units$')
+    units.columns = units.columns.str.replace('_Units$', '', regex=True)
+    values = df.filter(regex='_Value$')
+    values.columns = values.columns.str.replace('_Value$', '', regex=True)
+    return _to_matrices(units, values.reindex_like(units))
+
+
+def _to_matrices(shares, values):
+    shares = shares.sort_index().ffill().fillna(0.0)
+    values = values.sort_index()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prices = (values / shares.where(shares != 0)).ffill()
+    return shares.index, list(shares.columns), shares.to_numpy(float), prices.to_numpy(float)
+
+
+def held_value(shares, prices):
+    """shares × price, 0 where nothing is held (an unknown price there does not matter)."""
+    with np.errstate(invalid='ignore'):
+        return np.where(shares != 0, shares * prices, 0.0)
+
+
+def cash_flow_matrix(shares, prices):
+    """
+    Investor cash flows (dates x symbols): -Δshares × price, plus the terminal
+    holding value. NaN where shares changed, or are held at the end, without a price.
+    """
+    delta = np.diff(shares, axis=0, prepend=0.0)
+    flows = -held_value(delta, prices)
+    flows[-1] += held_value(shares[-1], prices[-1])
+    return flows
+
+
+# ------------------------------
+# XIRR
+# ------------------------------
+def _pack_flows(flows, years):
+    """Compresses the (mostly zero) flow matrix to K x N, K = most flows in any column."""
+    nonzero = flows != 0
+    counts = nonzero.sum(axis=0)
+    k = max(int(counts.max()) if counts.size else 0, 1)
+    packed_flows = np.zeros((k, flows.shape[1]))
+    packed_years = np.zeros((k, flows.shape[1]))
+    rows, cols = np.nonzero(nonzero.T)
+    slot = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    packed_flows[slot, rows] = flows.T[rows, cols]
+    packed_years[slot, rows] = years.ravel()[cols]
+    return packed_flows, packed_years
+
+
+def _npv(rates, flows, years):
+    return (flows * (1.0 + rates) ** -years).sum(axis=0)
+
+
+def xirr_batch(flows, dates):
+    """
+    XIRR of every column of a dates x N flow matrix, solved together.
+    Columns without both an inflow and an outflow get NaN.
+    """
+    years = ((pd.DatetimeIndex(dates) - pd.Timestamp(dates[0])).days.to_numpy() / 365.0)[:, None]
+    flows, years = _pack_flows(np.asarray(flows, float), years)
+    # Measure time from each column's first flow so discount factors stay well scaled
+    years = years - years[0]
+    years[flows == 0] = 0.0
+
+    solvable = (flows > 0).any(axis=0) & (flows < 0).any(axis=0)
+    rates = np.full(flows.shape[1], 0.1)
+    done = ~solvable
+
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        for _ in range(NEWTON_ITERATIONS):
+            active = ~done
+            if not active.any():
+                break
+            f, t, r = flows[:, active], years[:, active], rates[active]
+            discount = (1.0 + r) ** -t
+            npv = (f * discount).sum(axis=0)
+            slope = (-t * f * discount / (1.0 + r)).sum(axis=0)
+            step = npv / slope
+            new_rates = r - step
+            bad = ~np.isfinite(new_rates) | (new_rates <= RATE_BOUNDS[0])
+            new_rates[bad] = np.nan
+            rates[active] = new_rates
+            converged = np.isfinite(new_rates) & (np.abs(step) < TOLERANCE)
+            idx = np.flatnonzero(active)
+            done[idx[converged | bad]] = True
+
+        # Bisection for columns where Newton diverged or did not settle
+        retry = solvable & ~(np.isfinite(rates) & (np.abs(_npv(rates, flows, years)) < 1e-6 * np.abs(flows).sum(axis=0)))
+        if retry.any():
+            f, t = flows[:, retry], years[:, retry]
+            lo = np.full(f.shape[1], RATE_BOUNDS[0])
+            hi = np.full(f.shape[1], RATE_BOUNDS[1])
+            f_lo = _npv(lo, f, t)
+            bracketed = np.sign(f_lo) != np.sign(_npv(hi, f, t))
+            for _ in range(BISECTION_ITERATIONS):
+                mid = (lo + hi) / 2
+                f_mid = _npv(mid, f, t)
+                left = np.sign(f_mid) == np.sign(f_lo)
+                lo = np.where(left, mid, lo)
+                f_lo = np.where(left, f_mid, f_lo)
+                hi = np.where(left, hi, mid)
+            rates[retry] = np.where(bracketed, (lo + hi) / 2, np.nan)
+
+    rates[~solvable] = np.nan
+    return rates
+
+
+# ------------------------------
+# TIME-WEIGHTED RETURNS
+# ------------------------------
+def daily_twr(shares, prices):
+    """
+    Daily time-weighted returns (dates x symbols) and the portfolio column:
+    r_t = (V_t - net flow_t) / V_{t-1} - 1, with flows valued at day t prices.
+    Days touching a held but unpriced holding come out NaN.
+    """
+    values = held_value(shares, prices)
+    inflow = held_value(np.diff(shares, axis=0, prepend=0.0), prices)
+
+    def _returns(v, cf):
+        prev = np.full_like(v, np.nan)
+        prev[1:] = v[:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = (v - cf) / prev - 1.0
+        return np.where((prev > 0) & np.isfinite(r), r, np.nan)
+
+    return _returns(values, inflow), _returns(values.sum(axis=1), inflow.sum(axis=1))
+
+
+def compute_returns(dates, symbols, shares, prices):
+    """
+    XIRR per symbol and portfolio, and the daily/cumulative portfolio TWR frame.
+    Symbols with an unpriced flow, and then the portfolio, get NaN XIRR and
+    Computable = False.
+    """
+    flows = cash_flow_matrix(shares, prices)
+    unpriced = np.isnan(flows).any(axis=0)
+    flows[:, unpriced] = 0.0
+    # The portfolio column has a flow on most days, so solve it on its own to keep
+    # the packed per-symbol batch small
+    rates = np.append(xirr_batch(flows, dates), xirr_batch(flows.sum(axis=1)[:, None], dates))
+    computable = np.append(~unpriced, not unpriced.any())
+    rates[~computable] = np.nan
+    if unpriced.any():
+        print(f"⚠️ XIRR not computable for {', '.join(np.asarray(symbols)[unpriced])} "
+              f"(share changes without a price), nor for the portfolio.")
+
+    current = held_value(shares[-1], prices[-1])
+    xirr_df = pd.DataFrame({
+        'Symbol': symbols + [PORTFOLIO],
+        'XIRR %': np.round(rates * 100, 2),
+        'Current Value': np.append(current, current.sum()),
+        'Computable': computable,
+    })
+
+    symbol_twr, portfolio_twr = daily_twr(shares, prices)
+    twr_df = pd.DataFrame({
+        'Date': dates,
+        'Daily TWR %': np.round(portfolio_twr * 100, 4),
+        'Cumulative TWR %': np.round((np.nancumprod(1 + portfolio_twr) - 1) * 100, 4),
+    })
+    return xirr_df, twr_df, symbol_twr
+
+
+if __name__ == "__main__":
+    results = []
+    sources = [('Equity' if asset_class == 'legacy' else f"Equity {asset_class}", load_valuation_matrix, path)
+               for asset_class, path in latest_paths('per_symbol_values').items()]
+    for label, loader, path in sources + [('NPS', load_nps_matrix, NPS_TOTAL_CSV)]:
+        if not os.path.exists(path):
+            print(f"⚠️ {path} not found, skipping {label}.")
+            continue
+        dates, symbols, shares, prices = loader(path)
+        xirr_df, twr_df, _ = compute_returns(dates, symbols, shares, prices)
+        xirr_df.insert(0, 'Asset Class', label)
+        twr_df.insert(0, 'Asset Class', label)
+        results.append((xirr_df, twr_df))
+        print(f"✅ {label}: XIRR for {len(symbols)} holdings, portfolio {xirr_df['XIRR %'].iloc[-1]}%")
+
+    if results:
+        pd.concat([r[0] for r in results]).to_csv(XIRR_OUTPUT_CSV, index=False)
+        pd.concat([r[1] for r in results]).to_csv(TWR_OUTPUT_CSV, index=False)
+        print(f"✅ XIRR saved to {XIRR_OUTPUT_CSV}")
+        print(f"✅ Time-weighted returns saved to {TWR_OUTPUT_CSV}")
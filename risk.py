@@ -0,0 +1,278 @@
+'''
+Rolling risk over the holdings price matrix
+
+Builds one dates x holdings share and price book (INR) from the same inputs
+returns.py values: the latest per-symbol valuation outputs and the nps.py
+report. For every holding and for the portfolio it reports annualised
+rolling volatility, max drawdown, beta to the benchmark index, historical
+VaR, and a correlation matrix across holdings.
+
+Rolling windows are running sums over all holdings at once: each day adds
+the entering row and subtracts the one leaving the window, so a day costs
+O(holdings) whatever the window length. The folded state is kept in
+data/risk-state.npz, and a daily run only folds the days since the last one:
+the summary and correlations come from the state, and the portfolio's rolling
+series gets one row per folded day appended to data/risk-rolling.csv. The
+book itself is still read in full from the valuation outputs each run.
+
+    python risk.py          # fold the new days into the stored state
+    python risk.py --full   # rebuild the state from the first valuation date
+'''
+
+import argparse
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from output_manager import latest_paths
+from price_cache import read_cache
+from returns import NPS_TOTAL_CSV, PORTFOLIO, daily_twr, load_nps_matrix, load_valuation_matrix
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+STATE_NPZ = os.path.join(DATA_DIR, 'risk-state.npz')
+SUMMARY_CSV = os.path.join(DATA_DIR, 'risk-summary.csv')
+CORRELATION_CSV = os.path.join(DATA_DIR, 'risk-correlation.csv')
+ROLLING_CSV = os.path.join(DATA_DIR, 'risk-rolling.csv')
+
+BENCHMARK = '^NSEI'         # Nifty 50
+WINDOW = 63                 # ~3 months of trading days, for volatility, beta, correlation and VaR
+MIN_OBSERVATIONS = 20       # fewer returns in the window report NaN
+TRADING_DAYS = 252
+VAR_CONFIDENCE = 0.95
+
+
+# ------------------------------
+# BOOK
+# ------------------------------
+def load_book():
+    """Dates, holding names, and dates x holdings shares and INR prices across every valued asset class."""
+    sources = [(load_valuation_matrix, path) for path in latest_paths('per_symbol_values').values()]
+    if os.path.exists(NPS_TOTAL_CSV):
+        sources.append((load_nps_matrix, NPS_TOTAL_CSV))
+
+    shares, prices = [], []
+    for loader, path in sources:
+        dates, symbols, s, p = loader(path)
+        shares.append(pd.DataFrame(s, index=dates, columns=symbols))
+        prices.append(pd.DataFrame(p, index=dates, columns=symbols))
+    if not shares:
+        raise FileNotFoundError("No valuation outputs found; run the equity scripts or nps.py first")
+
+    # NSE and NYSE holdings value on different days; each carries onto the other's dates
+    shares = pd.concat(shares, axis=1).sort_index().ffill().fillna(0.0)
+    prices = pd.concat(prices, axis=1).sort_index().ffill().fillna(0.0)
+    return shares.index, list(shares.columns), shares.to_numpy(float), prices.to_numpy(float)
+
+
+def load_benchmark(dates, ticker=BENCHMARK):
+    """Daily benchmark returns on `dates`; prefetch.py's cache first, then yfinance. NaN if unavailable."""
+    closes = read_cache('prices', ticker, 'NSE', dates[0])
+    if closes is None:
+        from price_providers import YahooProvider
+
+        closes = YahooProvider(suffixes=('',)).fetch(ticker, dates[0], datetime.today())
+    if closes is None or closes.empty:
+        print(f"⚠️ No {ticker} history, beta will be NaN.")
+        return np.full(len(dates), np.nan)
+    closes = closes.set_index('Transaction Date')['Price']
+    closes = closes.reindex(closes.index.union(dates)).ffill().reindex(dates).to_numpy(float)
+    returns = np.full(len(dates), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = closes[1:] / closes[:-1] - 1
+    return returns
+
+
+# ------------------------------
+# INCREMENTAL STATE
+# ------------------------------
+class RollingRisk:
+    """
+    Window sums, drawdown peaks and the last WINDOW rows of returns for a fixed
+    set of columns. update() folds in one day in O(columns): the entering row
+    is added to the sums and the row leaving the window subtracted.
+    """
+    SUMS = ('n', 's1', 's2', 'nb', 'sx', 'sy', 'sxy', 'syy')
+
+    def __init__(self, columns, window=WINDOW):
+        self.columns = list(columns)
+        self.window = window
+        k = len(self.columns)
+        for name in self.SUMS:
+            setattr(self, name, np.zeros(k))
+        self.growth, self.peak, self.max_drawdown = np.ones(k), np.ones(k), np.zeros(k)
+        self.rows = np.full((window, k), np.nan)      # ring buffer of returns
+        self.bench = np.full(window, np.nan)
+        self.pos = 0
+        self.last_date = None
+
+    def _fold(self, returns, bench, sign):
+        valid = ~np.isnan(returns)
+        x = np.where(valid, returns, 0.0)
+        self.n += sign * valid
+        self.s1 += sign * x
+        self.s2 += sign * x * x
+        if np.isnan(bench):
+            return
+        self.nb += sign * valid
+        self.sx += sign * x
+        self.sy += sign * bench * valid
+        self.sxy += sign * x * bench
+        self.syy += sign * bench * bench * valid
+
+    def update(self, date, returns, bench):
+        self._fold(self.rows[self.pos], self.bench[self.pos], -1)
+        self._fold(returns, bench, 1)
+        self.rows[self.pos], self.bench[self.pos] = returns, bench
+        self.pos = (self.pos + 1) % self.window
+
+        self.growth *= 1 + np.nan_to_num(returns)
+        self.peak = np.maximum(self.peak, self.growth)
+        self.max_drawdown = np.minimum(self.max_drawdown, self.growth / self.peak - 1)
+        self.last_date = pd.Timestamp(date)
+
+    def drawdown(self):
+        return self.growth / self.peak - 1
+
+    def volatility(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var = (self.s2 - self.s1 ** 2 / self.n) / (self.n - 1)
+        return np.where(self.n >= MIN_OBSERVATIONS, np.sqrt(np.maximum(var, 0.0) * TRADING_DAYS), np.nan)
+
+    def beta(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            beta = (self.sxy - self.sx * self.sy / self.nb) / (self.syy - self.sy ** 2 / self.nb)
+        return np.where(self.nb >= MIN_OBSERVATIONS, beta, np.nan)
+
+    def value_at_risk(self, confidence=VAR_CONFIDENCE):
+        """Historical one-day VaR as a positive fraction: the loss at the (1 - confidence) quantile."""
+        enough = (~np.isnan(self.rows)).sum(axis=0) >= MIN_OBSERVATIONS
+        with np.errstate(invalid='ignore'):
+            quantile = np.nanquantile(np.where(enough, self.rows, 0.0), 1 - confidence, axis=0)
+        return np.where(enough, -quantile, np.nan)
+
+    def correlation(self):
+        """Pairwise-complete correlation of the window's returns, from three matrix products."""
+        valid = (~np.isnan(self.rows)).astype(float)
+        x = np.nan_to_num(self.rows)
+        n = valid.T @ valid
+        sx = x.T @ valid                       # sx[i, j]: sum of column i where both i and j have a return
+        sxx = (x * x).T @ valid
+        sxy = x.T @ x
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = sxy - sx * sx.T / n
+            var_i = sxx - sx * sx / n
+            corr = cov / np.sqrt(var_i * var_i.T)
+        return np.where(n >= MIN_OBSERVATIONS, corr, np.nan)
+
+    def copy(self):
+        other = RollingRisk.__new__(RollingRisk)
+        other.__dict__ = {k: v.copy() if isinstance(v, np.ndarray) else v for k, v in self.__dict__.items()}
+        return other
+
+    def save(self, path=STATE_NPZ):
+        arrays = {k: v for k, v in self.__dict__.items() if isinstance(v, np.ndarray)}
+        np.savez(path, columns=np.array(self.columns, dtype=str), window=self.window, pos=self.pos,
+                 last_date=str(self.last_date.date()), **arrays)
+
+    @classmethod
+    def load(cls, path=STATE_NPZ):
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as stored:
+            state = cls(stored['columns'].tolist(), int(stored['window']))
+            for name in state.__dict__:
+                if isinstance(getattr(state, name), np.ndarray):
+                    setattr(state, name, stored[name])
+            state.pos = int(stored['pos'])
+            state.last_date = pd.Timestamp(str(stored['last_date']))
+        return state
+
+
+def _rolling_row(state, date, column=-1):
+    return {'Date': date, 'Volatility %': state.volatility()[column] * 100, 'Beta': state.beta()[column],
+            'Drawdown %': state.drawdown()[column] * 100}
+
+
+def fold_book(dates, columns, returns, bench, state=None):
+    """
+    Folds every settled day (all but the latest) into `state`, starting over
+    when the holdings or window changed. Returns the settled state, a copy with
+    the latest day folded too, and the portfolio's rolling row for every day
+    folded. The latest day is refolded each run, since intraday reruns revise it.
+    """
+    if state is None or state.columns != columns or state.window != WINDOW or state.last_date not in dates:
+        state, start = RollingRisk(columns), 0
+    else:
+        start = dates.get_loc(state.last_date) + 1
+    rows = []
+    for t in range(start, len(dates) - 1):
+        state.update(dates[t], returns[t], bench[t])
+        rows.append(_rolling_row(state, dates[t]))
+    current = state.copy()
+    current.update(dates[-1], returns[-1], bench[-1])
+    rows.append(_rolling_row(current, dates[-1]))
+    return state, current, pd.DataFrame(rows)
+
+
+# ------------------------------
+# REPORTS
+# ------------------------------
+def summary_frame(state, values):
+    total = values.sum()
+    var = state.value_at_risk()
+    return pd.DataFrame({
+        'Symbol': state.columns,
+        'Current Value': np.round(np.append(values, total), 2),
+        'Weight %': np.round(np.append(values, total) / total * 100, 2) if total else np.nan,
+        'Volatility %': np.round(state.volatility() * 100, 2),
+        'Max Drawdown %': np.round(state.max_drawdown * 100, 2),
+        'Beta': np.round(state.beta(), 3),
+        f"VaR {VAR_CONFIDENCE:.0%} 1d %": np.round(var * 100, 2),
+        f"VaR {VAR_CONFIDENCE:.0%} 1d (INR)": np.round(var * np.append(values, total), 2),
+    })
+
+
+def append_rolling(rows, rebuilt, path=ROLLING_CSV):
+    """Stored rolling rows before the first folded day, followed by the folded ones."""
+    rows = rows.round({'Volatility %': 2, 'Beta': 3, 'Drawdown %': 2})
+    if not rebuilt and os.path.exists(path):
+        stored = pd.read_csv(path, parse_dates=['Date'])
+        rows = pd.concat([stored[stored['Date'] < rows['Date'].iloc[0]], rows], ignore_index=True)
+    rows.to_csv(path, index=False, date_format='%Y-%m-%d')
+    return rows
+
+
+def refresh(full=False):
+    dates, symbols, shares, prices = load_book()
+    symbol_returns, portfolio_returns = daily_twr(shares, prices)
+    returns = np.column_stack([symbol_returns, portfolio_returns])
+    bench = load_benchmark(dates)
+
+    columns = symbols + [PORTFOLIO]
+    state, current, rolling = fold_book(dates, columns, returns, bench, None if full else RollingRisk.load())
+    state.save()
+
+    values = shares[-1] * prices[-1]
+    held = np.append(values > 0, True)
+    summary = summary_frame(current, values)[held]
+    summary.to_csv(SUMMARY_CSV, index=False)
+    correlation = pd.DataFrame(current.correlation(), index=columns, columns=columns).loc[held, held]
+    correlation.round(3).to_csv(CORRELATION_CSV)
+    append_rolling(rolling, rebuilt=rolling['Date'].iloc[0] == dates[0])
+
+    print(f"✅ Risk for {int(held.sum()) - 1} holdings as of {dates[-1].date()} ({len(rolling)} days folded)")
+    print(f"✅ Summary saved to {SUMMARY_CSV}")
+    print(f"✅ Correlation matrix saved to {CORRELATION_CSV}")
+    print(f"✅ Rolling portfolio risk saved to {ROLLING_CSV}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rolling volatility, drawdown, beta, VaR and correlations.")
+    parser.add_argument('--full', action='store_true', help="Rebuild the rolling state from the first date")
+    args = parser.parse_args()
+
+    summary = refresh(args.full)
+    print(summary[summary['Symbol'] == PORTFOLIO].to_string(index=False))
@@ -0,0 +1,75 @@
+'''
+Sell-booking rules shared by strategy-sell.py and the sell watch daemon
+'''
+
+import numpy as np
+
+import indicators as ind
+
+# ------------------------------
+# CONFIG
+# ------------------------------
+X_PERCENT = 25                        # Configurable % above EMA crossover
+ALERT_THRESHOLD = 6.5                 # % drop from high since crossover
+BELOW_EMA50 = 6.5 / 100
+BELOW_RSI9 = 29
+EMA_SPAN = 50
+RSI_PERIOD = 9
+# ------------------------------
+
+
+def get_latest_transaction(group):
+    """Pick ONLY the latest transaction of the symbol.
+
+    If latest row has Total Shares == 0 → ignore symbol completely.
+    """
+    latest = group.sort_values("Transaction Date").iloc[-1]
+
+    if latest["Total Shares"] <= 0:
+        return None
+
+    return latest
+
+
+def sell_signal(current_close, current_ema50, current_rsi9):
+    """SELL when close is BELOW_EMA50 under the 50 EMA and RSI(9) is oversold."""
+    cond1 = current_close < current_ema50 * (1 - BELOW_EMA50)
+    cond2 = current_rsi9 < BELOW_RSI9
+
+    return "YES" if (cond1 and cond2) else "NO"
+
+
+def crossover_signals(current_close, crossover_close, high_since_cross):
+    """Alert on a drop from the high since crossover, and check the X% target."""
+    pct_below_high = (high_since_cross - current_close) / high_since_cross * 100
+    alert = "YES" if pct_below_high > ALERT_THRESHOLD else "NO"
+
+    required_price = crossover_close * (1 + X_PERCENT / 100)
+    meets = current_close > required_price
+
+    return pct_below_high, alert, required_price, meets
+
+
+def sell_indicators(closes):
+    """
+    EMA50, RSI(9), the latest Close > EMA50 crossover and the high since it
+    for every column of a dates x symbols close array. Columns are independent,
+    so any block of them can be computed on its own (see shared_panel.py).
+    crossover_row is the row of closes the crossover happened on.
+    """
+    packed, rows = ind.pack_valid(closes)
+    ema50 = ind.ema(packed, EMA_SPAN)
+    rsi9 = ind.rsi(packed, RSI_PERIOD)
+    cross_row = ind.last_true(ind.crossovers(packed, ema50))
+    cols = np.arange(packed.shape[1])
+    at_cross = np.maximum(cross_row, 0)
+    return {
+        "close": packed[-1],
+        "ema50": ema50[-1],
+        "rsi9": rsi9[-1],
+        "has_crossover": cross_row >= 0,
+        "crossover_row": rows[at_cross, cols],
+        "crossover_close": packed[at_cross, cols],
+        "crossover_ema": ema50[at_cross, cols],
+        "high_since_cross": ind.max_since(packed, cross_row),
+    }
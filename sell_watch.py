@@ -0,0 +1,327 @@
+'''
+Watch mode for sell alerts on held positions
+
+Keeps held symbols and their EMA50 / RSI(9) / crossover state in memory,
+polls the latest quotes and re-evaluates the strategy-sell conditions on
+every tick, printing only the conditions that changed.
+
+    python sell_watch.py --interval 15
+    python sell_watch.py --quotes data/quotes.csv --history-dir data/history   # local stand-in feed
+'''
+
+import argparse
+import asyncio
+import datetime
+import os
+import time
+from collections import deque
+
+import pandas as pd
+
+from sell_rules import (EMA_SPAN, RSI_PERIOD, get_latest_transaction, sell_signal,
+                        crossover_signals)
+from trading_calendar import trading_days
+
+# ------------------------------
+# CONFIG
+# ------------------------------
+INPUT_CSV = "data/ind-stocks.csv"
+POLL_INTERVAL = 15                    # seconds between quote polls
+MAX_SEED_THREADS = 20                 # concurrent history fetches while seeding
+# ------------------------------
+
+
+class SymbolState:
+    """Indicator state as of the last completed daily bar.
+
+    The live quote is evaluated on top of it as a provisional bar, so each
+    tick costs O(1) instead of recomputing a year of history.
+    """
+
+    alpha = 2 / (EMA_SPAN + 1)
+
+    def __init__(self, symbol, ticker, total_shares, closes):
+        self.symbol = symbol
+        self.ticker = ticker
+        self.total_shares = total_shares
+        self.live_date = None
+        self.live_price = None
+
+        ema = closes.ewm(span=EMA_SPAN, adjust=False).mean()
+        self.last_date = pd.Timestamp(closes.index[-1]).normalize()
+        self.last_close = float(closes.iloc[-1])
+        self.ema = float(ema.iloc[-1])
+        self.deltas = deque(closes.diff().dropna().iloc[-RSI_PERIOD:], maxlen=RSI_PERIOD)
+
+        cross = (closes.shift(1) <= ema.shift(1)) & (closes > ema)
+        self.crossover = None
+        if cross.any():
+            crossover_date = cross[cross].index[-1]
+            self.crossover = {
+                "date": crossover_date,
+                "close": float(closes.loc[crossover_date]),
+                "ema": float(ema.loc[crossover_date]),
+                "high": float(closes.loc[crossover_date:].max()),
+            }
+
+    @staticmethod
+    def _rsi(deltas):
+        rsi = float("nan")
+        if len(deltas) == RSI_PERIOD:
+            avg_gain = sum(d for d in deltas if d > 0) / RSI_PERIOD
+            avg_loss = -sum(d for d in deltas if d < 0) / RSI_PERIOD
+            if avg_loss:
+                rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+            elif avg_gain:
+                rsi = 100.0
+        return rsi
+
+    def _step(self, price, date):
+        """Indicators if `price` were the close of the next bar; does not mutate state."""
+        ema = self.ema + self.alpha * (price - self.ema)
+        rsi = self._rsi(list(self.deltas)[-(RSI_PERIOD - 1):] + [price - self.last_close])
+
+        if self.last_close <= self.ema and price > ema:
+            crossover = {"date": date, "close": price, "ema": ema, "high": price}
+        elif self.crossover is not None:
+            crossover = dict(self.crossover, high=max(self.crossover["high"], price))
+        else:
+            crossover = None
+
+        return ema, rsi, crossover
+
+    def roll(self, close, date):
+        """Commit a completed daily bar."""
+        self.ema, _, self.crossover = self._step(close, date)
+        self.deltas.append(close - self.last_close)
+        self.last_close = close
+        self.last_date = date
+
+    def update(self, price, session):
+        """
+        Apply a live quote from the trading session dated `session`. A newer
+        session commits the previous session's last quote as its close. Before
+        the open, on weekends and on holidays the feed repeats the last
+        session, whose close is already a committed bar, so no provisional
+        bar is built on it.
+        """
+        session = pd.Timestamp(session).normalize()
+        if self.live_date is not None and session > self.live_date:
+            self.roll(self.live_price, self.live_date)
+        if session <= self.last_date:
+            self.live_date = None
+        else:
+            self.live_date = session
+        self.live_price = price
+
+    def evaluate(self):
+        """Same conditions as strategy-sell.process_symbol, for the live price."""
+        price = self.live_price
+        if self.live_date is None:
+            ema, rsi, crossover = self.ema, self._rsi(list(self.deltas)), self.crossover
+        else:
+            ema, rsi, crossover = self._step(price, self.live_date)
+        result = {
+            "symbol": self.symbol,
+            "total_shares": self.total_shares,
+            "current_price": round(price, 2),
+            "ema50": round(ema, 2),
+            "rsi9": round(rsi, 2),
+            "sell": sell_signal(price, ema, rsi),
+            "alert": "NO",
+            "Xpct_condition_met": False,
+        }
+        if crossover is not None:
+            pct_below_high, alert, required_price, meets = crossover_signals(
+                price, crossover["close"], crossover["high"]
+            )
+            result.update({
+                "crossover_date": pd.Timestamp(crossover["date"]).date(),
+                "high_since_crossover": round(crossover["high"], 2),
+                "pct_below_high": round(pct_below_high, 2),
+                "alert": alert,
+                "required_price_for_Xpct": round(required_price, 2),
+                "Xpct_condition_met": meets,
+            })
+        return result
+
+
+# ------------------------------
+# QUOTE FEEDS
+# ------------------------------
+def current_session(today=None):
+    """The latest NSE trading day on or before today."""
+    today = pd.Timestamp(today or datetime.date.today())
+    return trading_days(today - pd.Timedelta(days=15), today, "NSE")[-1]
+
+
+class YahooQuoteFeed:
+    """Live feed: 1y daily history for seeding, batched 1m quotes for polling.
+
+    quotes() returns {ticker: (price, session date)}, the date taken from the
+    ticker's own last 1m bar.
+    """
+
+    def history(self, symbol):
+        import yfinance as yf
+
+        for suffix in [".NS", ".BO"]:
+            ticker = symbol + suffix
+            try:
+                data = yf.Ticker(ticker).history(period="1y")
+            except Exception:
+                continue
+            if not data.empty:
+                closes = data["Close"]
+                closes.index = closes.index.tz_localize(None).normalize()
+                return ticker, closes
+        return None, None
+
+    async def quotes(self, tickers):
+        import yfinance as yf
+
+        data = await asyncio.to_thread(
+            yf.download, tickers, period="1d", interval="1m", progress=False
+        )
+        if data.empty:
+            return {}
+        closes = data["Close"]
+        if isinstance(closes, pd.Series):
+            closes = closes.to_frame(tickers[0])
+        closes = closes.dropna(axis=1, how="all")
+        prices = closes.ffill().iloc[-1]
+        sessions = closes.notna().iloc[::-1].idxmax()
+        return {t: (prices[t], pd.Timestamp(sessions[t]).date()) for t in closes.columns}
+
+
+class LocalQuoteFeed:
+    """Local stand-in feed for testing.
+
+    History is read from <history_dir>/<symbol>.csv (Date + Close or Price columns)
+    and quotes from a symbol,price[,date] CSV that is re-read on every poll, so
+    editing the file simulates price moves. Quotes without a date belong to the
+    current NSE session.
+    """
+
+    def __init__(self, quotes_csv, history_dir):
+        self.quotes_csv = quotes_csv
+        self.history_dir = history_dir
+
+    def history(self, symbol):
+        file_path = os.path.join(self.history_dir, f"{symbol}.csv")
+        if not os.path.exists(file_path):
+            return None, None
+        df = pd.read_csv(file_path, encoding="utf-8-sig")
+        price_col = "Close" if "Close" in df.columns else "Price"
+        closes = df.set_index(pd.to_datetime(df["Date"]))[price_col].astype(float).sort_index()
+        return symbol, closes
+
+    async def quotes(self, tickers):
+        df = await asyncio.to_thread(pd.read_csv, self.quotes_csv)
+        df = df[df["symbol"].isin(tickers)]
+        sessions = pd.to_datetime(df["date"]) if "date" in df.columns else [current_session()] * len(df)
+        return {s: (float(p), d) for s, p, d in zip(df["symbol"], df["price"], sessions)}
+
+
+# ------------------------------
+# DAEMON
+# ------------------------------
+def load_holdings(input_csv):
+    """Held symbols and shares, using the same latest-transaction rule as strategy-sell."""
+    df = pd.read_csv(input_csv)
+    df["Transaction Date"] = pd.to_datetime(df["Transaction Date"], dayfirst=True, format="mixed")
+
+    holdings = {}
+    for symbol, group in df.groupby("Symbol"):
+        latest = get_latest_transaction(group)
+        if latest is not None:
+            holdings[symbol] = latest["Total Shares"]
+    return holdings
+
+
+async def seed_states(feed, holdings):
+    """Fetch history once per held symbol and build its in-memory state."""
+    today = pd.Timestamp(datetime.date.today())
+    limit = asyncio.Semaphore(MAX_SEED_THREADS)
+
+    async def seed(symbol, total_shares):
+        async with limit:
+            ticker, closes = await asyncio.to_thread(feed.history, symbol)
+        if closes is None or closes.empty:
+            print(f"⚠️ No price history for {symbol}, not watching it.")
+            return None
+        # Today's partial bar is replaced by live quotes
+        closes = closes[closes.index < today]
+        if len(closes) < 2:
+            print(f"⚠️ Not enough history for {symbol}, not watching it.")
+            return None
+        return SymbolState(symbol, ticker, total_shares, closes)
+
+    seeded = await asyncio.gather(*(seed(s, q) for s, q in holdings.items()))
+    return {state.ticker: state for state in seeded if state is not None}
+
+
+def _signal_key(result):
+    return result["alert"], result["sell"], result["Xpct_condition_met"]
+
+
+def emit(result, previous):
+    stamp = datetime.datetime.now().strftime("%H:%M:%S")
+    changes = []
+    for field, new in zip(("alert", "sell", "Xpct_condition_met"), _signal_key(result)):
+        old = previous[field] if previous else None
+        if old != new:
+            changes.append(f"{field}: {old} → {new}" if previous else f"{field}={new}")
+    print(f"🔔 [{stamp}] {result['symbol']} @ {result['current_price']} "
+          f"(EMA50 {result['ema50']}, RSI9 {result['rsi9']}) — " + ", ".join(changes))
+
+
+async def watch(feed, input_csv=INPUT_CSV, interval=POLL_INTERVAL, cycles=None):
+    holdings = load_holdings(input_csv)
+    print(f"🟢 Seeding indicator state for {len(holdings)} held symbols...")
+    states = await seed_states(feed, holdings)
+    print(f"👀 Watching {len(states)} symbols every {interval}s. Ctrl+C to stop.")
+
+    last_signals = {}
+    cycle = 0
+    while cycles is None or cycle < cycles:
+        started = time.monotonic()
+        try:
+            quotes = await feed.quotes(list(states))
+        except Exception as e:
+            print(f"⚠️ Quote poll failed: {e}")
+            quotes = {}
+
+        for ticker, (price, session) in quotes.items():
+            state = states.get(ticker)
+            if state is None or pd.isna(price):
+                continue
+            state.update(float(price), session)
+            result = state.evaluate()
+
+            previous = last_signals.get(ticker)
+            flagged = "YES" in _signal_key(result) or result["Xpct_condition_met"]
+            if previous is None and flagged or previous is not None and _signal_key(previous) != _signal_key(result):
+                emit(result, previous)
+            last_signals[ticker] = result
+
+        cycle += 1
+        if cycles is None or cycle < cycles:
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+    return last_signals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch held positions for sell alerts.")
+    parser.add_argument("--input", default=INPUT_CSV, help="Holdings ledger CSV")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="Seconds between polls")
+    parser.add_argument("--cycles", type=int, default=None, help="Stop after N polls")
+    parser.add_argument("--quotes", help="Local stand-in quotes CSV (symbol,price)")
+    parser.add_argument("--history-dir", default="data", help="History CSVs for the local feed")
+    args = parser.parse_args()
+
+    feed = LocalQuoteFeed(args.quotes, args.history_dir) if args.quotes else YahooQuoteFeed()
+    try:
+        asyncio.run(watch(feed, args.input, args.interval, args.cycles))
+    except KeyboardInterrupt:
+        print("\nStopped.")
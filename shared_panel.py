@@ -0,0 +1,182 @@
+'''
+Shared-memory price panels for process-pool workers
+
+A SharedPanel copies a dates x symbols frame into multiprocessing.shared_memory
+once. Its handle (segment name, shape, dates and symbol columns) is all a
+worker receives; workers attach to the segment when they start and read their
+block of columns through a numpy view, so no frame is pickled per task and
+adding workers adds no copies of the panel.
+
+map_columns() splits the columns into one contiguous block per worker and
+runs a kernel over the same block of every panel passed to it. Kernels live
+in importable modules (sell_rules.sell_indicators, value_columns below) and
+either return per-column arrays or write into a panel passed to them.
+value_holdings() values a ledger's holdings this way for the valuation
+scripts' get_portfolio_values(workers=...). Workers start with
+the platform's default method, so scripts that call map_columns keep their
+entry code under a __main__ guard.
+'''
+
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+PanelHandle = namedtuple('PanelHandle', ['name', 'shape', 'dates', 'columns'])
+
+
+class SharedPanel:
+    """
+    Owner of one dates x symbols float panel in shared memory. Use as a
+    context manager, or call close(), to release the segment.
+    """
+
+    def __init__(self, frame):
+        values = frame.to_numpy(float)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        self.values = np.ndarray(values.shape, float, buffer=self._shm.buf)
+        self.values[:] = values
+        self.handle = PanelHandle(self._shm.name, values.shape, pd.DatetimeIndex(frame.index).values,
+                                  tuple(frame.columns))
+
+    @classmethod
+    def empty_like(cls, panel):
+        """A zero-filled panel with another panel's dates and columns, for kernels to write into."""
+        return cls(pd.DataFrame(0.0, index=panel.dates, columns=panel.columns))
+
+    @property
+    def dates(self):
+        return pd.DatetimeIndex(self.handle.dates)
+
+    @property
+    def columns(self):
+        return list(self.handle.columns)
+
+    def close(self):
+        self.values = None
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ------------------------------
+# WORKERS
+# ------------------------------
+_attached = []   # (segment, view) per panel, set once in each worker process
+
+
+def _attach(handles):
+    for handle in handles:
+        shm = shared_memory.SharedMemory(name=handle.name)
+        _attached.append((shm, np.ndarray(handle.shape, float, buffer=shm.buf)))
+
+
+def _run_block(func, lo, hi):
+    return func(*(view[:, lo:hi] for _, view in _attached))
+
+
+def column_blocks(n_columns, workers):
+    """(lo, hi) bounds of up to `workers` contiguous, near-equal column blocks."""
+    edges = np.linspace(0, n_columns, min(workers, n_columns) + 1).astype(int)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def map_columns(func, panels, workers=None):
+    """
+    Runs func(*views) on each block of columns across `workers` processes,
+    where views are the block's columns of every panel, in order. Results that
+    are dicts of arrays (last axis = the block's columns) are joined back into
+    one dict in column order; kernels that write into a panel return None.
+    workers=1 runs func on the whole panels in this process.
+    """
+    workers = workers or os.cpu_count()
+    n_columns = panels[0].handle.shape[1]
+    if workers <= 1 or n_columns <= 1:
+        return func(*(p.values for p in panels))
+
+    blocks = column_blocks(n_columns, workers)
+    with ProcessPoolExecutor(len(blocks), initializer=_attach,
+                             initargs=([p.handle for p in panels],)) as executor:
+        results = list(executor.map(_run_block, [func] * len(blocks), *zip(*blocks)))
+    if results[0] is None:
+        return None
+    return {key: np.concatenate([r[key] for r in results], axis=-1) for key in results[0]}
+
+
+# ------------------------------
+# HOLDINGS VALUATION
+# ------------------------------
+def value_columns(prices, shares, values):
+    """
+    Carries each column's last price over days without one (NaN until its
+    first price) and writes shares x price into the output panel's block.
+    """
+    rows = np.where(np.isnan(prices), 0, np.arange(len(prices))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    carried = prices[rows, np.arange(prices.shape[1])]
+    values[:] = shares * carried
+    prices[:] = carried
+
+
+def holdings_panels(df_transactions, symbols, price_histories, dates):
+    """
+    (prices, shares) frames over the valuation dates. A symbol's prices are
+    kept from its first transaction on, so nothing older is carried into its
+    first days; shares are the 'Total Shares' of its last ledger row on or
+    before each day (0 before its first transaction).
+    """
+    ledger = df_transactions[df_transactions['Symbol'].isin(symbols)]
+    ledger = ledger.drop_duplicates(['Symbol', 'Transaction Date'], keep='last')
+    first_trades = ledger.groupby('Symbol')['Transaction Date'].min()
+
+    prices, shares = {}, {}
+    for symbol in symbols:
+        price = (price_histories[symbol].drop_duplicates('Transaction Date', keep='last')
+                 .set_index('Transaction Date')['Price'].reindex(dates))
+        prices[symbol] = price.where(dates >= first_trades[symbol])
+        changes = ledger[ledger['Symbol'] == symbol].set_index('Transaction Date')['Total Shares'].sort_index()
+        shares[symbol] = changes.reindex(dates, method='ffill').fillna(0)
+    return pd.DataFrame(prices, index=dates), pd.DataFrame(shares, index=dates)
+
+
+def value_holdings(df_transactions, symbols, price_histories, dates, workers=None, ignored_symbols=None):
+    """
+    Yields one valued frame per symbol (shares held x price on each valuation
+    day from its first transaction), like the valuation scripts' value_symbols,
+    with prices carried and products computed by workers over shared panels.
+    """
+    priced = []
+    for symbol in symbols:
+        price_df = price_histories.get(symbol)
+        if price_df is None or price_df.empty:
+            print(f"⚠️ Skipping symbol {symbol} — no price history.")
+            if ignored_symbols is not None:
+                ignored_symbols.append(symbol)
+        else:
+            priced.append(symbol)
+    if not priced:
+        return
+
+    prices, shares = holdings_panels(df_transactions, priced, price_histories, dates)
+    first_trades = df_transactions.groupby('Symbol')['Transaction Date'].min()
+    shares_dtype = df_transactions['Total Shares'].dtype
+    with SharedPanel(prices) as price_panel, SharedPanel(shares) as share_panel, \
+            SharedPanel.empty_like(price_panel) as value_panel:
+        map_columns(value_columns, [price_panel, share_panel, value_panel], workers)
+        for j, symbol in enumerate(priced):
+            start = dates.searchsorted(first_trades[symbol])
+            yield pd.DataFrame({
+                'Transaction Date': dates[start:],
+                'Total Shares': share_panel.values[start:, j].astype(shares_dtype),
+                'Symbol': symbol,
+                'Price': price_panel.values[start:, j],
+                'Total value': value_panel.values[start:, j],
+            })
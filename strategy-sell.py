@@ -1,22 +1,24 @@
+import argparse
 import pandas as pd
 import yfinance as yf
-import numpy as np
 import datetime
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from sell_rules import get_latest_transaction, sell_signal, crossover_signals, sell_indicators
+from shared_panel import SharedPanel, map_columns
+from price_cache import cached_yf_history
+from checkpoint import Journal, run_key, series_record, record_series
+from corporate_actions import ACTION_COLUMNS, actions_from_history, price_views
+from trading_calendar import last_close
 
 # ------------------------------
-# CONFIG
+# CONFIG (sell thresholds live in sell_rules.py)
 # ------------------------------
-X_PERCENT = 25                        # Configurable % above EMA crossover
-ALERT_THRESHOLD = 6.5                 # % drop from high since crossover
 INPUT_CSV = "data/ind-stocks.csv"
 OUTPUT_CSV = "data/strategy-sell-booking.csv"
 MAX_THREADS = 20
 RETRY_COUNT = 3
 SLEEP_BETWEEN_BATCH = 0.2
-BELOW_EMA50 = 6.5 / 100           
-BELOW_RSI9 = 29                    
 # ------------------------------
 
 
@@ -24,10 +26,13 @@ BELOW_RSI9 = 29
 # SUPPORT FUNCTIONS
 # ------------------------------
 def safe_history(ticker, period="1y"):
-    """History fetch with retries."""
+    """Unadjusted history fetch with retries; uses prefetch.py's cache when it is warm."""
+    cached = cached_yf_history(ticker, "NSE", period)
+    if cached is not None and not cached.empty:
+        return cached
     for attempt in range(RETRY_COUNT):
         try:
-            data = yf.Ticker(ticker).history(period=period)
+            data = yf.Ticker(ticker).history(period=period, auto_adjust=False)
             if not data.empty:
                 return data
         except Exception:
@@ -46,91 +51,70 @@ def resolve_yahoo_ticker(symbol):
     return None
 
 
-def get_latest_transaction(group):
-    """Pick ONLY the latest transaction of the symbol.
-
-    If latest row has Total Shares == 0 → ignore symbol completely.
-    """
-    latest = group.sort_values("Transaction Date").iloc[-1]
-
-    if latest["Total Shares"] <= 0:
-        return None
-
-    return latest
-
-
-def find_latest_ema_crossover(df):
-    """Find latest Close > EMA50 crossover."""
-    df["EMA50"] = df["Close"].ewm(span=50, adjust=False).mean()
-    df["prev_close"] = df["Close"].shift(1)
-    df["prev_ema"] = df["EMA50"].shift(1)
-
-    cross = df[
-        (df["prev_close"] <= df["prev_ema"]) &
-        (df["Close"] > df["EMA50"])
-    ]
-
-    if cross.empty:
-        return None
+def fetch_symbol(symbol):
+    """Resolve the Yahoo ticker and pull a year of history (I/O only)."""
+    ticker = resolve_yahoo_ticker(symbol)
+    if not ticker:
+        return None, pd.DataFrame()
+    return ticker, safe_history(ticker, "1y")
 
-    return cross.iloc[-1]
 
+def journal_record(ticker, data):
+    """Journal entry for one fetched history: its closes and the dividends / splits beside them."""
+    record = {"ticker": ticker, **series_record(data["Close"])}
+    for column in ACTION_COLUMNS:
+        if column in data:
+            record[column] = series_record(data[column])["values"]
+    return record
 
-def compute_rsi(series, period=9):
-    """Compute RSI using Pandas, correctly aligned with index."""
-    delta = series.diff()
 
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
+def journal_history(record):
+    close = record_series(record)
+    return pd.DataFrame({"Close": close, **{column: pd.Series(record[column], index=close.index)
+                                            for column in ACTION_COLUMNS if column in record}})
 
-    avg_gain = gain.rolling(period, min_periods=period).mean()
-    avg_loss = loss.rolling(period, min_periods=period).mean()
 
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
+def compute_indicators(histories, workers=1):
+    """
+    EMA50, RSI(9), the latest Close > EMA50 crossover and the high since it,
+    for every symbol at once on a dates x symbols close panel, split across
+    `workers` processes that read the panel from shared memory.
+    Returns {symbol: column index} and a dict of per-column arrays.
+    """
+    closes = pd.DataFrame({symbol: data["Close"] for symbol, data in histories.items()})
+    # Indicators run on total-return closes, as with Yahoo's auto-adjusted history
+    actions = {symbol: actions_from_history(data) for symbol, data in histories.items()}
+    closes = price_views(closes, actions)["total_return"]
+    with SharedPanel(closes) as panel:
+        values = map_columns(sell_indicators, [panel], workers)
+    values["crossover_date"] = pd.DatetimeIndex(closes.index.values[values.pop("crossover_row")])
 
-    return rsi
+    columns = {symbol: i for i, symbol in enumerate(closes.columns)}
+    return columns, values
 
 
 # ------------------------------
 # MAIN PER-SYMBOL PROCESSING
 # ------------------------------
-def process_symbol(symbol, latest_txn):
+def process_symbol(symbol, latest_txn, i, values):
+    """Per-symbol report row, sliced from the panel indicators at column i."""
     txn_date = latest_txn["Transaction Date"].date()
     total_shares = latest_txn["Total Shares"]
 
-    ticker = resolve_yahoo_ticker(symbol)
-    if not ticker:
-        return {"symbol": symbol, "reason": "No Yahoo ticker found"}
-
-    data = safe_history(ticker, "1y")
-    if data.empty:
-        return {"symbol": symbol, "yahoo_symbol": ticker, "reason": "No price history"}
-
-    # -----------------------------
-    # COMPUTE EMA50 & RSI(9)
-    # -----------------------------
-    data["EMA50"] = data["Close"].ewm(span=50, adjust=False).mean()
-    data["RSI9"] = compute_rsi(data["Close"], 9)
-
     # Latest values
-    current_close = data["Close"].iloc[-1]
-    current_ema50 = data["EMA50"].iloc[-1]
-    current_rsi9 = data["RSI9"].iloc[-1]
+    current_close = values["close"][i]
+    current_ema50 = values["ema50"][i]
+    current_rsi9 = values["rsi9"][i]
 
     # -----------------------------
     # SELL CONDITIONS
     # -----------------------------
-    cond1 = current_close < current_ema50 * (1 - BELOW_EMA50)  
-    cond2 = current_rsi9 < BELOW_RSI9
-
-    sell = "YES" if (cond1 and cond2) else "NO"
+    sell = sell_signal(current_close, current_ema50, current_rsi9)
 
     # -----------------------------
     # EMA CROSSOVER LOGIC
     # -----------------------------
-    crossover = find_latest_ema_crossover(data)
-    if crossover is None:
+    if not values["has_crossover"][i]:
         return {
             "symbol": symbol,
             #"yahoo_symbol": ticker,
@@ -141,9 +125,9 @@ def process_symbol(symbol, latest_txn):
             "rsi9": current_rsi9
         }
 
-    crossover_date = crossover.name
-    crossover_close = crossover["Close"]
-    crossover_ema = crossover["EMA50"]
+    crossover_date = values["crossover_date"][i]
+    crossover_close = values["crossover_close"][i]
+    crossover_ema = values["crossover_ema"][i]
 
     # -----------------------------
 
@@ -154,18 +138,13 @@ def process_symbol(symbol, latest_txn):
     )
 
     # -----------------------------------------
-    # % DROP FROM HIGH SINCE CROSSOVER (ALERT)
-    # -----------------------------------------
-    after_cross = data.loc[crossover_date:]
-    high_since_cross = after_cross["Close"].max()
-    pct_below_high = (high_since_cross - current_close) / high_since_cross * 100
-    alert = "YES" if pct_below_high > ALERT_THRESHOLD else "NO"
-
-    # -----------------------------------------
+    # % DROP FROM HIGH SINCE CROSSOVER (ALERT) &
     # X% ABOVE CROSSOVER CONDITION
     # -----------------------------------------
-    required_price = crossover_close * (1 + X_PERCENT / 100)
-    meets = current_close > required_price
+    high_since_cross = values["high_since_cross"][i]
+    pct_below_high, alert, required_price, meets = crossover_signals(
+        current_close, crossover_close, high_since_cross
+    )
 
     return {
         "symbol": symbol,
@@ -201,26 +180,58 @@ def process_symbol(symbol, latest_txn):
 # ------------------------------
 # PROGRAM ENTRY
 # ------------------------------
-df = pd.read_csv(INPUT_CSV)
-df["Transaction Date"] = pd.to_datetime(df["Transaction Date"])
-
-groups = df.groupby("Symbol")
+def run(resume=False, workers=1):
+    """Fetches every held symbol's history and writes the sell-booking report to OUTPUT_CSV."""
+    df = pd.read_csv(INPUT_CSV)
+    df["Transaction Date"] = pd.to_datetime(df["Transaction Date"])
 
-tasks = []
-results = []
-
-with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
+    groups = df.groupby("Symbol")
+    latest_txns = {}
     for symbol, group in groups:
         latest = get_latest_transaction(group)
-
-        if latest is None:
-            continue  # skip entire symbol
-
-        tasks.append(executor.submit(process_symbol, symbol, latest))
-        time.sleep(SLEEP_BETWEEN_BATCH)
-
-    for task in as_completed(tasks):
-        results.append(task.result())
-
-pd.DataFrame(results).to_csv(OUTPUT_CSV, index=False)
-print("Done. Output written to:", OUTPUT_CSV)
+        if latest is not None:
+            latest_txns[symbol] = latest  # symbols sold out are skipped entirely
+
+    # Fetch phase: threads only wait on the network. Each fetched history is journaled,
+    # so a rerun with --resume after a failure only fetches the remaining symbols.
+    journal = Journal("strategy-sell", run_key(last_close("NSE").date(), INPUT_CSV), resume)
+    histories = {symbol: journal_history(record)
+                 for symbol, record in journal.done.items() if symbol in latest_txns}
+    results = []
+    with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
+        tasks = {}
+        for symbol in latest_txns:
+            if symbol in histories:
+                continue
+            tasks[executor.submit(fetch_symbol, symbol)] = symbol
+            time.sleep(SLEEP_BETWEEN_BATCH)
+
+        for task in as_completed(tasks):
+            symbol = tasks[task]
+            ticker, data = task.result()
+            if not ticker:
+                results.append({"symbol": symbol, "reason": "No Yahoo ticker found"})
+            elif data.empty:
+                results.append({"symbol": symbol, "yahoo_symbol": ticker, "reason": "No price history"})
+            else:
+                data.index = pd.DatetimeIndex(data.index).tz_localize(None).normalize()
+                histories[symbol] = data
+                journal.record(symbol, journal_record(ticker, data))
+
+    # Compute phase: every symbol's indicators in one pass over the panel
+    if histories:
+        columns, values = compute_indicators(histories, workers)
+        for symbol, i in columns.items():
+            results.append(process_symbol(symbol, latest_txns[symbol], i, values))
+
+    pd.DataFrame(results).to_csv(OUTPUT_CSV, index=False)
+    journal.finish()
+    print("Done. Output written to:", OUTPUT_CSV)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sell signals for the Indian stock holdings.")
+    parser.add_argument("--resume", action="store_true", help="Skip symbols an interrupted run already fetched")
+    parser.add_argument("--workers", type=int, default=1, help="Processes computing indicators over the shared panel")
+    args = parser.parse_args()
+    run(args.resume, args.workers)
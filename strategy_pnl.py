@@ -0,0 +1,158 @@
+'''
+Mark-to-market P&L curves for strategy-buy signals
+
+Each signal row is a trade entered at the next trading day's open with the
+same ₹10,000 sizing as strategy-buy.py. Prices for all signal symbols are
+fetched once into a shared dates x symbols panel, and every trade's daily
+P&L comes from one masked array operation.
+
+    python strategy_pnl.py
+'''
+
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+STRATEGIES = {
+    'breakout': os.path.join(DATA_DIR, 'strategy-breakout-input.csv'),
+    'volume': os.path.join(DATA_DIR, 'strategy-volume-input.csv'),
+}
+TRADES_OUTPUT_CSV = os.path.join(DATA_DIR, 'strategy-pnl-trades.csv')
+CURVES_OUTPUT_CSV = os.path.join(DATA_DIR, 'strategy-pnl-curves.csv')
+SUMMARY_OUTPUT_CSV = os.path.join(DATA_DIR, 'strategy-pnl-summary.csv')
+POSITION_SIZE = 10000
+
+
+def load_signals(strategies=STRATEGIES):
+    frames = []
+    for name, path in strategies.items():
+        df = pd.read_csv(path, usecols=['date', 'symbol'])
+        df['date'] = pd.to_datetime(df['date'], dayfirst=True)
+        df['strategy'] = name
+        frames.append(df)
+    signals = pd.concat(frames, ignore_index=True)
+    # Today's signals have no entry yet
+    return signals[signals['date'].dt.date != datetime.today().date()].reset_index(drop=True)
+
+
+def fetch_panel(symbols, start_date, end_date=None):
+    """
+    Open and Close panels (dates x symbols): warm prefetch.py history where it
+    covers start_date, then one batched yfinance download per suffix for the
+    rest, trying NSE first and BSE for the symbols NSE does not have.
+    """
+    import yfinance as yf
+    from price_cache import cached_yf_history
+
+    end_date = end_date or datetime.today() + timedelta(days=1)
+    cached_opens, cached_closes, remaining = {}, {}, []
+    for symbol in symbols:
+        for suffix in ['.NS', '.BO']:
+            hist = cached_yf_history(symbol + suffix, 'NSE', start_date=start_date)
+            if hist is not None and not hist.empty:
+                cached_opens[symbol], cached_closes[symbol] = hist['Open'], hist['Close']
+                break
+        else:
+            remaining.append(symbol)
+    opens, closes = pd.DataFrame(cached_opens), pd.DataFrame(cached_closes)
+
+    for suffix in ['.NS', '.BO']:
+        if not remaining:
+            break
+        data = yf.download([s + suffix for s in remaining], start=start_date, end=end_date,
+                           auto_adjust=False, progress=False, group_by='column')
+        if data.empty:
+            continue
+        found_open = data['Open'].dropna(axis=1, how='all')
+        found_close = data['Close'].reindex(columns=found_open.columns)
+        found_open.columns = found_close.columns = [c[:-len(suffix)] for c in found_open.columns]
+        found_open.index = found_close.index = pd.DatetimeIndex(found_open.index).tz_localize(None).normalize()
+        opens = pd.concat([opens, found_open], axis=1)
+        closes = pd.concat([closes, found_close], axis=1)
+        remaining = [s for s in remaining if s not in found_open.columns]
+
+    for symbol in remaining:
+        print(f"No ticker found for {symbol}, skipping...")
+    # Cached and downloaded rows can stamp the same day differently; one row per day,
+    # and closes aligned on the opens' dates by label rather than by position
+    opens, closes = (frame.set_axis(pd.DatetimeIndex(frame.index).tz_localize(None).normalize())
+                     .groupby(level=0).last() for frame in (opens, closes))
+    return opens, closes.reindex(index=opens.index, columns=opens.columns)
+
+
+def mark_to_market(signals, opens, closes, position_size=POSITION_SIZE):
+    """
+    Daily P&L matrix (dates x trades) and the per-trade table. A trade is held
+    from its entry row on; before that its P&L is 0.
+    """
+    dates = closes.index
+    closes = closes.ffill()
+    opens = opens.reindex(index=dates, columns=closes.columns)
+    col = closes.columns.get_indexer(signals['symbol'])
+    entry_row = dates.searchsorted(signals['date'], side='right')
+
+    valid = (col >= 0) & (entry_row < len(dates))
+    col, entry_row = np.where(valid, col, 0), np.where(valid, entry_row, 0)
+
+    entry_price = opens.to_numpy(float)[entry_row, col]
+    valid &= np.isfinite(entry_price) & (entry_price > 0)
+    quantity = np.where(valid, np.round(position_size / np.where(valid, entry_price, 1)), 0)
+
+    close_matrix = closes.to_numpy(float)[:, col]                                 # dates x trades
+    holding = (np.arange(len(dates))[:, None] >= entry_row[None, :]) & valid[None, :]
+    pnl = np.where(holding, (close_matrix - entry_price[None, :]) * quantity[None, :], 0.0)
+    pnl = np.nan_to_num(pnl)
+    deployed = np.where(holding, entry_price[None, :] * quantity[None, :], 0.0)
+
+    trades = signals.assign(
+        entry_date=pd.Series(dates[entry_row]).where(valid).values,
+        entry_price=np.where(valid, entry_price, np.nan),
+        quantity=quantity,
+        last_close=np.where(valid, close_matrix[-1], np.nan),
+        pl=np.where(valid, pnl[-1], np.nan),
+        max_pl=np.where(valid, pnl.max(axis=0, initial=0, where=holding), np.nan),
+        min_pl=np.where(valid, pnl.min(axis=0, initial=0, where=holding), np.nan),
+    )
+    return pnl, deployed, trades
+
+
+def strategy_curves(signals, pnl, deployed, dates):
+    """Aggregated equity curve, hit rate and drawdown per strategy."""
+    curves, summary = [], []
+    for name, idx in signals.groupby('strategy').indices.items():
+        curve = pnl[:, idx].sum(axis=1)
+        capital = deployed[:, idx].sum(axis=1)
+        drawdown = np.maximum.accumulate(curve) - curve
+        final = pnl[-1, idx][deployed[-1, idx] > 0]
+        curves.append(pd.DataFrame({'Date': dates, 'strategy': name, 'pl': curve,
+                                    'deployed': capital, 'drawdown': drawdown}))
+        summary.append({
+            'strategy': name,
+            'trades': len(final),
+            'hit_rate_pct': round((final > 0).mean() * 100, 2) if len(final) else np.nan,
+            'total_pl': round(curve[-1], 2),
+            'max_drawdown': round(drawdown.max(), 2),
+            'max_drawdown_pct_of_deployed': round(drawdown.max() / capital.max() * 100, 2) if capital.max() else np.nan,
+        })
+    return pd.concat(curves, ignore_index=True), pd.DataFrame(summary)
+
+
+def run(strategies=STRATEGIES, panel_loader=fetch_panel):
+    signals = load_signals(strategies)
+    opens, closes = panel_loader(sorted(signals['symbol'].unique()), signals['date'].min() - timedelta(days=2))
+    pnl, deployed, trades = mark_to_market(signals, opens, closes)
+    curves, summary = strategy_curves(trades, pnl, deployed, closes.index)
+    return trades, curves, summary
+
+
+if __name__ == "__main__":
+    trades, curves, summary = run()
+    trades.to_csv(TRADES_OUTPUT_CSV, index=False)
+    curves.round(2).to_csv(CURVES_OUTPUT_CSV, index=False)
+    summary.to_csv(SUMMARY_OUTPUT_CSV, index=False)
+    print(summary.to_string(index=False))
+    print(f"\n✅ Per-trade P&L saved to {TRADES_OUTPUT_CSV}")
+    print(f"✅ Strategy equity curves saved to {CURVES_OUTPUT_CSV}")
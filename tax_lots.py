@@ -0,0 +1,231 @@
+'''
+FIFO tax lots and capital gains
+
+The ledgers only record cumulative Total Shares per date, so buys and sells
+are the deltas between snapshots. Lots are rebuilt once from those deltas
+(FIFO, one deque per symbol) at the prices the valuation run already fetched.
+Every as-of, financial-year and harvest query is then a filter over the lot
+and disposal tables, with no revaluation.
+
+A lot bought before the valuation's price window has no cost price. Such
+lots are kept with priced = False, are left out of the gain totals (which
+count them under 'unpriced'), and are never harvest candidates. Mutual
+funds whose scheme name marks them as debt funds (gilt, bond, liquid, ...)
+follow the debt rules; SYMBOL_RULES overrides the rules for any symbol.
+
+    python tax_lots.py [--as-of 2025-03-31] [--fy 2024]
+'''
+
+import argparse
+import os
+import re
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from mf_bulk_nav import SCHEME_MAP_CSV
+from output_manager import latest_path
+from returns import load_valuation_matrix
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+REALIZED_OUTPUT_CSV = os.path.join(DATA_DIR, 'tax-realized.csv')
+OPEN_LOTS_OUTPUT_CSV = os.path.join(DATA_DIR, 'tax-open-lots.csv')
+HARVEST_OUTPUT_CSV = os.path.join(DATA_DIR, 'tax-harvest.csv')
+
+# Long-term after more than `long_term_months` (None: always short-term);
+# the tax year starts in `year_start_month`.
+TAX_RULES = {
+    'IN': {'long_term_months': 12, 'year_start_month': 4},          # listed Indian equity and equity MFs
+    'IN-foreign': {'long_term_months': 24, 'year_start_month': 4},  # foreign shares held by an Indian resident
+    'IN-debt': {'long_term_months': None, 'year_start_month': 4},   # debt MFs, taxed as short-term
+    'US': {'long_term_months': 12, 'year_start_month': 1},
+}
+ASSET_CLASS_RULES = {'ind-stocks': 'IN', 'ind-mf': 'IN', 'us-stocks': 'IN-foreign'}
+# Scheme names in data/mf-scheme-map.csv that mark a debt fund
+DEBT_SCHEME_PATTERN = re.compile(r'\b(?:gilt|debt|bond|liquid|overnight|money market|constant maturity|'
+                                 r'duration|credit risk|corporate|banking & psu|treasury)\b', re.IGNORECASE)
+# Per-symbol rules that win over the asset-class and scheme-name ones, e.g. {'0P0000XW5X.BO': 'IN-debt'}
+SYMBOL_RULES = {}
+EPSILON = 1e-9
+
+
+def match_lots(dates, symbols, shares, prices):
+    """
+    FIFO lots and disposals from dates x symbols share snapshots. Only the
+    days where a holding changes are visited, so this is O(events).
+    Returns (lots, disposals) DataFrames.
+    """
+    delta = np.diff(shares, axis=0, prepend=0.0)
+    rows, cols = np.nonzero(np.abs(delta) > EPSILON)
+    order = np.lexsort((rows, cols))
+    rows, cols = rows[order], cols[order]
+
+    lots, disposals = [], []
+    queues = {}
+    for row, col in zip(rows, cols):
+        qty, price = delta[row, col], prices[row, col]
+        queue = queues.setdefault(col, deque())
+        if qty > 0:
+            lot = [len(lots), qty]        # lot id, remaining quantity
+            lots.append((len(lots), symbols[col], dates[row], qty, price))
+            queue.append(lot)
+            continue
+        to_sell = -qty
+        while to_sell > EPSILON and queue:
+            lot = queue[0]
+            used = min(lot[1], to_sell)
+            disposals.append((lot[0], row, used, price))
+            lot[1] -= used
+            to_sell -= used
+            if lot[1] <= EPSILON:
+                queue.popleft()
+
+    lots = pd.DataFrame(lots, columns=['lot_id', 'symbol', 'buy_date', 'quantity', 'cost_price'])
+    disposals = pd.DataFrame(disposals, columns=['lot_id', 'row', 'quantity', 'sale_price'])
+    disposals.insert(2, 'sell_date', pd.DatetimeIndex(dates)[disposals.pop('row').to_numpy(int)])
+    disposals = lots[['lot_id', 'symbol', 'buy_date', 'cost_price']].merge(disposals, on='lot_id')
+    disposals['gain'] = (disposals['sale_price'] - disposals['cost_price']) * disposals['quantity']
+    return lots, disposals
+
+
+def long_term_from(buy_dates, rules):
+    """First date a lot bought on `buy_dates` counts as long-term (NaT if it never does)."""
+    if rules['long_term_months'] is None:
+        return pd.DatetimeIndex([pd.NaT] * len(buy_dates))
+    return pd.DatetimeIndex(buy_dates) + pd.DateOffset(months=rules['long_term_months'], days=1)
+
+
+def rows_long_term_from(rows, rule_keys):
+    """long_term_from for lot or disposal rows, each under its own symbol's rules."""
+    result = pd.Series(pd.NaT, index=rows.index, dtype='datetime64[ns]')
+    for key, group in rows.groupby(rule_keys):
+        result[group.index] = long_term_from(group['buy_date'], TAX_RULES[key]).as_unit('ns')
+    return result
+
+
+def scheme_rules(scheme_map_csv=SCHEME_MAP_CSV):
+    """{symbol: 'IN-debt'} for the mutual funds whose scheme name marks a debt fund."""
+    if not os.path.exists(scheme_map_csv):
+        return {}
+    schemes = pd.read_csv(scheme_map_csv, usecols=['Symbol', 'Scheme Name'])
+    debt = schemes['Scheme Name'].fillna('').str.contains(DEBT_SCHEME_PATTERN)
+    return dict.fromkeys(schemes.loc[debt, 'Symbol'], 'IN-debt')
+
+
+def tax_year_bounds(year, rules):
+    """Start and end of the tax year beginning in `year` (FY 2024-25 for India is 2024)."""
+    start = pd.Timestamp(year, rules['year_start_month'], 1)
+    return start, start + pd.DateOffset(years=1) - pd.Timedelta(days=1)
+
+
+class LotBook:
+    """
+    Lot and disposal tables for one asset class, with the price matrix for marks.
+    `rules` is the asset class's rule set; `symbol_rules` maps symbols to others.
+    """
+
+    def __init__(self, dates, symbols, shares, prices, rules='IN', symbol_rules=None):
+        self.rules = TAX_RULES[rules]
+        self.dates = pd.DatetimeIndex(dates)
+        self.columns = {s: i for i, s in enumerate(symbols)}
+        self.prices = np.asarray(prices, float)
+        self.lots, self.disposals = match_lots(self.dates, list(symbols), np.asarray(shares, float), self.prices)
+        symbol_rules = symbol_rules or {}
+        for table in (self.lots, self.disposals):
+            table['rules'] = table['symbol'].map(symbol_rules).fillna(rules)
+            table['priced'] = table['cost_price'].notna()
+        self.disposals['priced'] &= self.disposals['sale_price'].notna()
+        self.lots['long_term_from'] = rows_long_term_from(self.lots, self.lots['rules'])
+        self.disposals['term'] = np.where(
+            self.disposals['sell_date'] >= rows_long_term_from(self.disposals, self.disposals['rules']), 'LT', 'ST')
+
+    @classmethod
+    def from_valuation(cls, asset_class='ind-stocks', rules=None, per_symbol_csv=None):
+        rules = rules or ASSET_CLASS_RULES.get(asset_class, 'IN')
+        per_symbol_csv = per_symbol_csv or latest_path(asset_class, 'per_symbol_values')
+        symbol_rules = {**(scheme_rules() if asset_class == 'ind-mf' else {}), **SYMBOL_RULES}
+        return cls(*load_valuation_matrix(per_symbol_csv), rules=rules, symbol_rules=symbol_rules)
+
+    def realized(self, start=None, end=None):
+        """Disposals with sell dates in [start, end]."""
+        sell_date = self.disposals['sell_date']
+        mask = np.ones(len(sell_date), bool)
+        if start is not None:
+            mask &= (sell_date >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (sell_date <= pd.Timestamp(end)).to_numpy()
+        return self.disposals[mask]
+
+    def open_lots(self, as_of=None):
+        """Lots still held at the close of `as_of`, marked at that day's price."""
+        as_of = pd.Timestamp(as_of) if as_of is not None else self.dates[-1]
+        sold = self.realized(end=as_of).groupby('lot_id')['quantity'].sum()
+        lots = self.lots[self.lots['buy_date'] <= as_of]
+        remaining = lots['quantity'] - lots['lot_id'].map(sold).fillna(0.0)
+        lots = lots.assign(quantity=remaining)[remaining > EPSILON]
+
+        row = max(self.dates.searchsorted(as_of, side='right') - 1, 0)
+        market_price = self.prices[row, lots['symbol'].map(self.columns).to_numpy(int)]
+        return lots.assign(
+            market_price=market_price,
+            priced=lots['priced'] & ~np.isnan(market_price),
+            unrealized_gain=(market_price - lots['cost_price']) * lots['quantity'],
+            term=np.where(as_of >= lots['long_term_from'], 'LT', 'ST'),
+        )
+
+    def gains_summary(self, start=None, end=None):
+        """
+        Realized gains in [start, end] and unrealized gains at `end`, split ST/LT,
+        over priced rows; 'unpriced' counts the disposals and open lots left out.
+        """
+        realized, open_lots = self.realized(start, end), self.open_lots(end)
+        unpriced = pd.concat([realized.loc[~realized['priced'], 'term'], open_lots.loc[~open_lots['priced'], 'term']])
+        return pd.DataFrame({
+            'realized': realized[realized['priced']].groupby('term')['gain'].sum(),
+            'unrealized': open_lots[open_lots['priced']].groupby('term')['unrealized_gain'].sum(),
+            'unpriced': unpriced.value_counts(),
+        }).reindex(['ST', 'LT']).fillna(0.0)
+
+    def tax_year_summary(self, year):
+        return self.gains_summary(*tax_year_bounds(year, self.rules))
+
+    def harvest_candidates(self, as_of=None, min_loss=0.0):
+        """Priced open lots sitting on a loss of at least `min_loss`, largest loss first."""
+        lots = self.open_lots(as_of)
+        return lots[lots['priced'] & (lots['unrealized_gain'] < -min_loss)].sort_values('unrealized_gain')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FIFO lots and capital gains from the valuation outputs.")
+    parser.add_argument('--as-of', default=None, help="Date for open lots and harvest candidates (default: last valued day)")
+    parser.add_argument('--fy', type=int, default=None, help="Tax year to summarise, by its starting year")
+    args = parser.parse_args()
+
+    realized, open_lots, harvest = [], [], []
+    for asset_class, rules in ASSET_CLASS_RULES.items():
+        if latest_path(asset_class, 'per_symbol_values') is None:
+            print(f"⚠️ No published per_symbol_values for {asset_class}, skipping.")
+            continue
+        book = LotBook.from_valuation(asset_class)
+        as_of = pd.Timestamp(args.as_of) if args.as_of else book.dates[-1]
+        year = args.fy if args.fy is not None else (
+            as_of.year if as_of.month >= book.rules['year_start_month'] else as_of.year - 1)
+
+        realized.append(book.disposals.assign(asset_class=asset_class))
+        open_lots.append(book.open_lots(as_of).assign(asset_class=asset_class))
+        harvest.append(book.harvest_candidates(as_of).assign(asset_class=asset_class))
+        summary = book.tax_year_summary(year)
+        print(f"\n{asset_class} ({rules}) tax year starting {year} (unrealized at year end):")
+        print(summary.round(2).to_string())
+        if summary['unpriced'].any():
+            print(f"⚠️ {int(summary['unpriced'].sum())} lots have no price in the valuation output "
+                  f"and are left out of the gains; value from their first transaction to include them.")
+
+    if realized:
+        pd.concat(realized).round(4).to_csv(REALIZED_OUTPUT_CSV, index=False)
+        pd.concat(open_lots).round(4).to_csv(OPEN_LOTS_OUTPUT_CSV, index=False)
+        pd.concat(harvest).round(4).to_csv(HARVEST_OUTPUT_CSV, index=False)
+        print(f"\n✅ Realized disposals saved to {REALIZED_OUTPUT_CSV}")
+        print(f"✅ Open lots saved to {OPEN_LOTS_OUTPUT_CSV}")
+        print(f"✅ Loss-harvest candidates saved to {HARVEST_OUTPUT_CSV}")
@@ -0,0 +1,119 @@
+'''
+Exchange trading calendar for valuation
+'''
+
+import os
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+HOLIDAY_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'holidays.csv')
+
+# BSE follows the same trading holidays as NSE
+EXCHANGE_ALIASES = {'BSE': 'NSE'}
+
+# Regular session close, in the exchange's local time
+MARKET_CLOSE = {
+    'NSE': (ZoneInfo('Asia/Kolkata'), time(15, 30)),
+    'NYSE': (ZoneInfo('America/New_York'), time(16, 0)),
+}
+
+# 'business' = value only on trading days, 'calendar' = value every calendar day
+VALUATION_MODES = ('business', 'calendar')
+
+
+@lru_cache(maxsize=None)
+def load_holidays(exchange):
+    """
+    Reads the locally stored holiday list for an exchange (NSE, BSE, NYSE).
+    See holiday_coverage() for the days it can speak for.
+    """
+    exchange = EXCHANGE_ALIASES.get(exchange.upper(), exchange.upper())
+    holidays = pd.read_csv(HOLIDAY_CSV, parse_dates=['Date'])
+    holidays = holidays[holidays['Exchange'] == exchange]
+    if holidays.empty:
+        raise ValueError(f"No holiday calendar stored for exchange '{exchange}'")
+    return tuple(holidays['Date'].dt.date)
+
+
+@lru_cache(maxsize=None)
+def holiday_coverage(exchange):
+    """First and last day of the years the holiday file lists for the exchange."""
+    years = [d.year for d in load_holidays(exchange)]
+    return pd.Timestamp(min(years), 1, 1), pd.Timestamp(max(years), 12, 31)
+
+
+def trading_days(start_date, end_date, exchange):
+    """Trading days between start_date and end_date (inclusive) for the exchange."""
+    return pd.bdate_range(start=pd.Timestamp(start_date).normalize(),
+                          end=pd.Timestamp(end_date).normalize(),
+                          freq='C', holidays=list(load_holidays(exchange)))
+
+
+def valuation_dates(start_date, end_date, exchange, mode='business'):
+    """
+    Date index to value on: trading days only, or every calendar day. Outside
+    the years the holiday file covers, trading days are unknown, so business
+    mode values every calendar day there.
+    """
+    if mode not in VALUATION_MODES:
+        raise ValueError(f"Unknown valuation mode '{mode}', expected one of {VALUATION_MODES}")
+    start, end = pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize()
+    calendar = pd.date_range(start=start, end=end, freq='D')
+    if mode == 'calendar':
+        return calendar
+    first, last = holiday_coverage(exchange)
+    outside = calendar[(calendar < first) | (calendar > last)]
+    return outside.union(trading_days(max(start, first), min(end, last), exchange))
+
+
+def next_trading_day(dates, exchange):
+    """
+    Maps each date to itself if it is a valuation day (see valuation_dates), else
+    to the next trading day.
+    """
+    dates = pd.DatetimeIndex(pd.to_datetime(dates)).normalize()
+    days = valuation_dates(dates.min(), dates.max() + pd.Timedelta(days=15), exchange)
+    return days[days.searchsorted(dates)]
+
+
+def last_close(exchange, now=None):
+    """Time (tz-aware) of the most recent session close at or before `now`."""
+    exchange = EXCHANGE_ALIASES.get(exchange.upper(), exchange.upper())
+    tz, close_time = MARKET_CLOSE[exchange]
+    now = now.astimezone(tz) if now is not None else datetime.now(tz)
+    for day in reversed(trading_days(now.date() - timedelta(days=15), now.date(), exchange)):
+        close = datetime.combine(day.date(), close_time, tz)
+        if close <= now:
+            return close
+    raise ValueError(f"No {exchange} session closed in the 15 days before {now}")
+
+
+def next_close(exchange, now=None):
+    """Time (tz-aware) of the next session close after `now`."""
+    exchange = EXCHANGE_ALIASES.get(exchange.upper(), exchange.upper())
+    tz, close_time = MARKET_CLOSE[exchange]
+    now = now.astimezone(tz) if now is not None else datetime.now(tz)
+    for day in trading_days(now.date(), now.date() + timedelta(days=15), exchange):
+        close = datetime.combine(day.date(), close_time, tz)
+        if close > now:
+            return close
+    raise ValueError(f"No {exchange} session in the 15 days after {now}")
+
+
+def expand_to_calendar_days(df, date_col='Transaction Date', by=None, end_date=None):
+    """
+    Optional output step: forward-fills a trading-day frame onto every calendar day,
+    so downstream sheets that expect one row per day keep working.
+    """
+    def _expand(frame):
+        frame = frame.set_index(date_col).sort_index()
+        end = pd.Timestamp(end_date).normalize() if end_date is not None else frame.index.max()
+        full_range = pd.date_range(start=frame.index.min(), end=end, freq='D', name=date_col)
+        return frame.reindex(full_range, method='ffill')
+
+    if by is None:
+        return _expand(df).reset_index()
+    return pd.concat([_expand(group) for _, group in df.groupby(by, sort=False)]).reset_index()
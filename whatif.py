@@ -0,0 +1,165 @@
+'''
+What-if rebalancing simulator
+
+Keeps the price and holdings matrices from the valuation output in memory
+and evaluates hypothetical trades as deltas: a trade only touches its own
+symbol column and the portfolio total, so a scenario costs O(trades × days)
+instead of a full revaluation.
+
+    python whatif.py
+'''
+
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from output_manager import latest_path
+from returns import load_valuation_matrix, PER_SYMBOL_CSV
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+SELL_BOOKING_CSV = os.path.join(DATA_DIR, 'strategy-sell-booking.csv')
+BREAKOUT_OUTPUT_CSV = os.path.join(DATA_DIR, 'strategy-breakout-output.csv')
+SCENARIO_OUTPUT_CSV = os.path.join(DATA_DIR, 'whatif-scenarios.csv')
+
+Trade = namedtuple('Trade', ['symbol', 'date', 'shares'])   # shares > 0 buys, < 0 sells
+
+
+class PortfolioSimulator:
+    """
+    Base case: dates x symbols share and price matrices. Sales proceeds and
+    purchase costs are carried as cash, so a scenario's value history shows
+    the effect of the trade rather than money leaving the book.
+    """
+
+    def __init__(self, dates, symbols, shares, prices):
+        self.dates = pd.DatetimeIndex(dates)
+        self.symbols = list(symbols)
+        self.columns = {s: i for i, s in enumerate(self.symbols)}
+        self.shares = np.asarray(shares, float)
+        # Unpriced days count as 0, as in the valuation's portfolio totals
+        self.prices = np.nan_to_num(np.asarray(prices, float))
+        self.values = self.shares * self.prices
+        self.total = self.values.sum(axis=1)
+        self.cash = np.zeros(len(self.dates))
+
+    @classmethod
+    def from_valuation(cls, per_symbol_csv=None, asset_class='ind-stocks'):
+        per_symbol_csv = per_symbol_csv or latest_path(asset_class, 'per_symbol_values') or PER_SYMBOL_CSV
+        return cls(*load_valuation_matrix(per_symbol_csv))
+
+    def add_symbol(self, symbol, prices):
+        """Adds a price column (Series indexed by date) for a symbol not currently held."""
+        if symbol in self.columns:
+            return
+        aligned = prices.sort_index().reindex(self.dates, method='ffill').fillna(0.0).to_numpy(float)
+        self.columns[symbol] = len(self.symbols)
+        self.symbols.append(symbol)
+        self.prices = np.column_stack([self.prices, aligned])
+        self.shares = np.column_stack([self.shares, np.zeros(len(self.dates))])
+        self.values = np.column_stack([self.values, np.zeros(len(self.dates))])
+
+    def _locate(self, trade):
+        col = self.columns[trade.symbol]
+        row = min(self.dates.searchsorted(pd.Timestamp(trade.date)), len(self.dates) - 1)
+        return row, col
+
+    def evaluate(self, trades):
+        """
+        Value history and end-of-period concentration for a scenario, without
+        changing the base case.
+        """
+        total = self.total.copy()
+        cash = self.cash.copy()
+        last_values = self.values[-1].copy()
+        for trade in trades:
+            row, col = self._locate(trade)
+            price_path = self.prices[row:, col]
+            total[row:] += trade.shares * price_path
+            cash[row:] -= trade.shares * price_path[0]
+            last_values[col] += trade.shares * price_path[-1]
+        return self._summary(total + cash, last_values, cash[-1])
+
+    def apply(self, trades):
+        """Books trades into the base case, updating only the affected columns."""
+        for trade in trades:
+            row, col = self._locate(trade)
+            self.shares[row:, col] += trade.shares
+            self.values[row:, col] = self.shares[row:, col] * self.prices[row:, col]
+            self.total[row:] += trade.shares * self.prices[row:, col]
+            self.cash[row:] -= trade.shares * self.prices[row, col]
+
+    def _summary(self, value_history, last_values, cash):
+        invested = last_values.clip(min=0)
+        book = invested.sum() + max(cash, 0.0)
+        weights = invested / book if book else invested
+        top = int(np.argmax(weights)) if len(weights) else 0
+        return {
+            'value_history': value_history,
+            'final_value': value_history[-1],
+            'cash': cash,
+            'top_holding': self.symbols[top] if len(weights) else None,
+            'top_weight_pct': weights[top] * 100 if len(weights) else 0.0,
+            'hhi': float((weights ** 2).sum()),
+        }
+
+
+# ------------------------------
+# SCENARIOS
+# ------------------------------
+def sell_flagged_trades(sim, booking_csv=SELL_BOOKING_CSV, date=None):
+    """Sell every position strategy-sell marked sell == YES, on the last valued day."""
+    booking = pd.read_csv(booking_csv)
+    flagged = booking.loc[booking['sell'] == 'YES', 'symbol']
+    date = date or sim.dates[-1]
+    return [Trade(s, date, -sim.shares[-1, sim.columns[s]]) for s in flagged if s in sim.columns]
+
+
+def breakout_trades(sim, breakout_csv=BREAKOUT_OUTPUT_CSV, price_chain=None):
+    """Buy the quantities listed in the breakout output, fetching prices for new symbols."""
+    signals = pd.read_csv(breakout_csv, usecols=['date', 'symbol', 'quantity'])
+    signals['date'] = pd.to_datetime(signals['date'], dayfirst=True)
+    signals = signals[signals['quantity'].fillna(0) > 0]
+
+    missing = sorted(set(signals['symbol']) - set(sim.columns))
+    if missing and price_chain is not None:
+        histories = price_chain.history_many(missing, sim.dates[0], sim.dates[-1])
+        for symbol, price_df in histories.items():
+            if price_df is not None and not price_df.empty:
+                sim.add_symbol(symbol, price_df.set_index('Transaction Date')['Price'])
+
+    return [Trade(r.symbol, r.date, float(r.quantity)) for r in signals.itertuples()
+            if r.symbol in sim.columns]
+
+
+if __name__ == "__main__":
+    sim = PortfolioSimulator.from_valuation()
+    base = sim.evaluate([])
+    scenarios = {'Base': []}
+    if os.path.exists(SELL_BOOKING_CSV):
+        scenarios['Sell flagged'] = sell_flagged_trades(sim)
+    if os.path.exists(BREAKOUT_OUTPUT_CSV):
+        from price_providers import ProviderChain, YahooProvider
+        scenarios['Add breakouts'] = breakout_trades(sim, price_chain=ProviderChain([YahooProvider()]))
+        scenarios['Sell flagged + add breakouts'] = scenarios['Sell flagged'] + scenarios['Add breakouts'] \
+            if 'Sell flagged' in scenarios else scenarios['Add breakouts']
+
+    rows = []
+    for name, trades in scenarios.items():
+        result = sim.evaluate(trades)
+        rows.append({
+            'Scenario': name,
+            'Trades': len(trades),
+            'Final Value': round(result['final_value'], 2),
+            'Change vs Base': round(result['final_value'] - base['final_value'], 2),
+            'Cash': round(result['cash'], 2),
+            'Top Holding': result['top_holding'],
+            'Top Weight %': round(result['top_weight_pct'], 2),
+            'HHI': round(result['hhi'], 4),
+        })
+
+    report = pd.DataFrame(rows)
+    report.to_csv(SCENARIO_OUTPUT_CSV, index=False)
+    print(report.to_string(index=False))
+    print(f"\n✅ Scenario summary saved to {SCENARIO_OUTPUT_CSV}")